@@ -1,10 +1,17 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import async_engine, engine
 from models import Session as DbSession, User
+from session_cache import session_cache
 from datetime import datetime, timezone
 
-async def get_current_user(request: Request, session: Session = Depends(get_session)) -> User:
+def _lookup(statement):
+    with Session(engine) as session:
+        return session.exec(statement).first()
+
+async def get_current_user(request: Request) -> User:
     # Better Auth usually stores the token in a cookie named "better-auth.session_token"
     # or creates a Bearer token. Let's check both for robustness.
     
@@ -30,20 +37,35 @@ async def get_current_user(request: Request, session: Session = Depends(get_sess
             detail="Not authenticated",
         )
 
-    # Validate token against Session table
-    statement = select(DbSession).where(DbSession.token == token)
-    db_session = session.exec(statement).first()
+    # Hot path: a cached, unexpired session needs no queries at all
+    cached_user = session_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    # Resolve token -> session -> user in one indexed join (ix_session_token);
+    # the AsyncSession is only opened on a cache miss
+    statement = (
+        select(DbSession.expiresAt, DbSession.userId, User)
+        .outerjoin(User, User.id == DbSession.userId)
+        .where(DbSession.token == token)
+    )
+    if async_engine is not None:
+        async with AsyncSession(async_engine) as session:
+            row = (await session.exec(statement)).first()
+    else:
+        # No async driver for this database: query the sync engine off the event loop
+        row = await run_in_threadpool(_lookup, statement)
     
-    if not db_session:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid session",
         )
+    expires_at, session_user_id, user = row
         
     # Ensure both are offset-aware UTC
     now = datetime.now(timezone.utc)
-    # If db_session.expiresAt is naive (it shouldn't be with SQLModel + SQLite ISO strings, but just in case)
-    expires_at = db_session.expiresAt
+    # If expiresAt is naive (it shouldn't be with SQLModel + SQLite ISO strings, but just in case)
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
 
@@ -54,15 +76,12 @@ async def get_current_user(request: Request, session: Session = Depends(get_sess
             detail="Session expired",
         )
 
-    # Fetch User
-    statement_user = select(User).where(User.id == db_session.userId)
-    user = session.exec(statement_user).first()
-    
     if not user:
-        print(f"!!! User NOT FOUND for session userId: {db_session.userId} !!!")
+        print(f"!!! User NOT FOUND for session userId: {session_user_id} !!!")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
-        
+
+    session_cache.put(token, user, expires_at)
     return user
@@ -0,0 +1,243 @@
+"""
+Change Stream
+
+Pushes per-user todo change notifications to GET /todos/stream (Server-Sent
+Events), so clients can stop polling /todos and /todos/stats:
+
+- Local writes: task-events committed on this instance reach the hub through
+  outbox.add_commit_listener() and are sent as `task` events right away.
+- Everything else (other replicas, recurrence materialization) is caught by a
+  watcher that compares each connected user's todos_version in
+  user_data_version every STREAM_VERSION_POLL_SECONDS and sends `changed`.
+  One query covers up to STREAM_VERSION_QUERY_BATCH connected users.
+- Every notification carries the user's todos_version after the change, so a
+  client refetching (delta sync token or ETag) is guaranteed to see it.
+- Each connection has a bounded buffer of STREAM_BUFFER_SIZE messages. A client
+  that falls behind gets one `resync` event in place of the dropped messages
+  and should reload; memory per connection stays bounded.
+- Messages are encoded once per user and shared by that user's connections.
+- A stream ends after STREAM_MAX_AGE_SECONDS (minus up to 20% jitter) and the
+  client reconnects. uvicorn waits for open responses on shutdown, so this also
+  bounds how long a rolling deploy waits on a worker's streams.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from sqlmodel import Session, select
+
+from database import engine
+from models import UserDataVersion
+from outbox import add_commit_listener
+
+logger = logging.getLogger(__name__)
+
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "32"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_VERSION_POLL_SECONDS = float(os.getenv("STREAM_VERSION_POLL_SECONDS", "2"))
+STREAM_MAX_AGE_SECONDS = float(os.getenv("STREAM_MAX_AGE_SECONDS", "300"))
+STREAM_VERSION_QUERY_BATCH = 500
+
+KEEP_ALIVE = b": keep-alive\n\n"
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+def encode_sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscription:
+    """One stream connection: a bounded buffer of encoded messages"""
+
+    __slots__ = ("user_id", "buffer", "overflowed", "_waiter")
+
+    def __init__(self, user_id: str, size: int):
+        self.user_id = user_id
+        self.buffer = deque(maxlen=size)
+        self.overflowed = False
+        self._waiter: Optional[asyncio.Future] = None
+
+    def push(self, message: bytes):
+        if not self.overflowed:
+            if len(self.buffer) == self.buffer.maxlen:
+                # Too far behind: everything buffered is superseded by a resync
+                self.overflowed = True
+                self.buffer.clear()
+            else:
+                self.buffer.append(message)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout: float) -> Optional[bytes]:
+        """Next message, or None after timeout seconds without one"""
+        if not self.overflowed and not self.buffer:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+        if self.overflowed:
+            self.overflowed = False
+            return RESYNC
+        return self.buffer.popleft()
+
+
+class ChangeHub:
+    """In-process pub/sub of todo changes, keyed by user id"""
+
+    def __init__(self, buffer_size: int = STREAM_BUFFER_SIZE, poll_interval: float = STREAM_VERSION_POLL_SECONDS):
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._versions: Dict[str, int] = {}  # Last version announced per connected user
+        self._pending: Dict[str, List[dict]] = {}  # Local task-events awaiting their version
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.resyncs = 0
+
+    async def start(self):
+        """Start the version watcher on the running loop; call once from the app lifespan"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Change stream started")
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._loop = None
+        logger.info("Change stream stopped")
+
+    # --- Connections ---
+
+    def subscribe(self, user_id: str, version: int) -> Subscription:
+        """Register a connection; version is what the client was told in its ready event"""
+        subscription = Subscription(user_id, self.buffer_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._versions.setdefault(user_id, version)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+            self._versions.pop(subscription.user_id, None)
+            self._pending.pop(subscription.user_id, None)
+
+    async def stream(self, subscription: Subscription, version: int, heartbeat: float = STREAM_HEARTBEAT_SECONDS,
+                     max_age: float = STREAM_MAX_AGE_SECONDS):
+        """SSE body for one connection: ready, then notifications and keep-alives until max_age"""
+        loop = asyncio.get_running_loop()
+        # Jitter so connections opened together (e.g. after a deploy) don't all reconnect together
+        deadline = loop.time() + max_age * (1 - 0.2 * random.random())
+        try:
+            yield encode_sse("ready", {"version": version})
+            while (remaining := deadline - loop.time()) > 0:
+                message = await subscription.get(min(heartbeat, remaining))
+                if message is RESYNC:
+                    self.resyncs += 1
+                yield KEEP_ALIVE if message is None else message
+        finally:
+            self.unsubscribe(subscription)
+
+    # --- Feeds ---
+
+    def publish_local(self, topic: str, data: dict):
+        """Outbox commit listener; runs in the writer's thread"""
+        if topic != "task-events" or data.get("user_id") not in self._subscribers:
+            return
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._queue_local, data)
+
+    def _queue_local(self, data: dict):
+        if data["user_id"] in self._subscribers:
+            self._pending.setdefault(data["user_id"], []).append(data)
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time() + self.poll_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_poll - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            if loop.time() >= next_poll:
+                user_ids = list(self._subscribers)
+                next_poll = loop.time() + self.poll_interval
+            else:
+                user_ids = list(pending)
+            if not user_ids:
+                continue
+            try:
+                versions = await asyncio.to_thread(self._read_versions, user_ids)
+            except Exception as e:
+                logger.error(f"Change stream version check failed: {e}")
+                for user_id, events in pending.items():
+                    self._pending.setdefault(user_id, [])[:0] = events
+                continue
+            self._dispatch(user_ids, versions, pending)
+
+    @staticmethod
+    def _read_versions(user_ids: List[str]) -> Dict[str, int]:
+        versions = {}
+        with Session(engine) as session:
+            for i in range(0, len(user_ids), STREAM_VERSION_QUERY_BATCH):
+                chunk = user_ids[i:i + STREAM_VERSION_QUERY_BATCH]
+                versions.update(session.exec(
+                    select(UserDataVersion.user_id, UserDataVersion.todos_version)
+                    .where(UserDataVersion.user_id.in_(chunk))
+                ).all())
+        return versions
+
+    def _dispatch(self, user_ids: List[str], versions: Dict[str, int], pending: Dict[str, List[dict]]):
+        for user_id in user_ids:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                continue
+            version = versions.get(user_id, 0)
+            if pending.get(user_id):
+                messages = [encode_sse("task", {**data, "version": version}) for data in pending[user_id]]
+            elif version > self._versions.get(user_id, 0):
+                messages = [encode_sse("changed", {"version": version})]
+            else:
+                continue
+            self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+            for subscription in subscribers:
+                for message in messages:
+                    subscription.push(message)
+            self.sent += len(messages) * len(subscribers)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "users": len(self._subscribers),
+            "sent": self.sent,
+            "resyncs": self.resyncs,
+        }
+
+
+# Singleton instance
+change_hub = ChangeHub()
+add_commit_listener(change_hub.publish_local)
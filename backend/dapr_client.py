@@ -1,25 +1,77 @@
+import asyncio
 import httpx
 import os
 import json
 import logging
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 DAPR_HTTP_PORT = os.getenv("DAPR_HTTP_PORT", "3500")
 DAPR_URL = f"http://localhost:{DAPR_HTTP_PORT}/v1.0"
+DAPR_ALPHA_URL = f"http://localhost:{DAPR_HTTP_PORT}/v1.0-alpha1"
+
+# Connection pool and timeouts for the sidecar client
+DAPR_HTTP_MAX_CONNECTIONS = int(os.getenv("DAPR_HTTP_MAX_CONNECTIONS", "100"))
+DAPR_HTTP_MAX_KEEPALIVE = int(os.getenv("DAPR_HTTP_MAX_KEEPALIVE", "20"))
+DAPR_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DAPR_HTTP_KEEPALIVE_EXPIRY", "30"))
+DAPR_HTTP_TIMEOUT = float(os.getenv("DAPR_HTTP_TIMEOUT", "5"))
+DAPR_HTTP_CONNECT_TIMEOUT = float(os.getenv("DAPR_HTTP_CONNECT_TIMEOUT", "2"))
 
 class DaprClient:
     """
     Abstractions for Dapr HTTP API (Spec C3: No vendor-specific SDK)
+
+    start() opens one pooled, keep-alive httpx client that every call reuses;
+    close() releases it. The pool belongs to the event loop that started it,
+    so calls made from any other loop (e.g. MCP tools running their own loop)
+    or before start() fall back to a short-lived client.
     """
-    
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
     @staticmethod
-    async def publish_event(pubsub_name: str, topic: str, data: Any):
+    def _new_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=DAPR_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=DAPR_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=DAPR_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DAPR_HTTP_TIMEOUT, connect=DAPR_HTTP_CONNECT_TIMEOUT),
+        )
+
+    async def start(self):
+        """Open the pooled client; call once from the app lifespan"""
+        if self._client is None:
+            self._client = self._new_client()
+            self._loop = asyncio.get_running_loop()
+            logger.info("Dapr HTTP client pool started")
+
+    async def close(self):
+        """Close the pooled client and its connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+            logger.info("Dapr HTTP client pool closed")
+
+    @asynccontextmanager
+    async def _http(self):
+        if self._client is not None and asyncio.get_running_loop() is self._loop:
+            yield self._client
+        else:
+            async with self._new_client() as client:
+                yield client
+    
+    async def publish_event(self, pubsub_name: str, topic: str, data: Any):
         """Publish an event via Dapr Pub/Sub"""
         url = f"{DAPR_URL}/publish/{pubsub_name}/{topic}"
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._http() as client:
                 response = await client.post(url, json=data)
                 if response.status_code == 204:
                     logger.info(f"Published event to {topic} via {pubsub_name}")
@@ -28,13 +80,48 @@ class DaprClient:
         except Exception as e:
             logger.error(f"Error publishing event: {str(e)}")
 
-    @staticmethod
-    async def save_state(store_name: str, key: str, value: Any):
+    async def publish_events_bulk(
+        self,
+        pubsub_name: str,
+        topic: str,
+        events: List[Any],
+        entry_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Publish many events in one request via Dapr's bulk publish API.
+
+        Returns the entry IDs that failed (all of them if the request itself failed).
+        """
+        if not events:
+            return []
+        entry_ids = entry_ids or [str(i) for i in range(len(events))]
+        url = f"{DAPR_ALPHA_URL}/publish/bulk/{pubsub_name}/{topic}"
+        entries = [
+            {"entryId": entry_id, "event": event, "contentType": "application/json"}
+            for entry_id, event in zip(entry_ids, events)
+        ]
+        try:
+            async with self._http() as client:
+                response = await client.post(url, json=entries)
+                if response.status_code in (200, 204):
+                    logger.info(f"Published {len(entries)} events to {topic} via {pubsub_name}")
+                    return []
+                logger.error(f"Failed to bulk publish events (Status {response.status_code}): {response.text}")
+                try:
+                    failed = [f["entryId"] for f in response.json().get("failedEntries", [])]
+                except (ValueError, KeyError, AttributeError):
+                    failed = []
+                return failed or entry_ids
+        except Exception as e:
+            logger.error(f"Error bulk publishing events: {str(e)}")
+            return entry_ids
+
+    async def save_state(self, store_name: str, key: str, value: Any):
         """Save state to Dapr State Store"""
         url = f"{DAPR_URL}/state/{store_name}"
         data = [{"key": key, "value": value}]
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._http() as client:
                 response = await client.post(url, json=data)
                 if response.status_code == 204:
                     logger.info(f"Saved state for key {key} in {store_name}")
@@ -43,12 +130,11 @@ class DaprClient:
         except Exception as e:
             logger.error(f"Error saving state: {str(e)}")
 
-    @staticmethod
-    async def invoke_service(app_id: str, method: str, data: Optional[Dict] = None):
+    async def invoke_service(self, app_id: str, method: str, data: Optional[Dict] = None):
         """Invoke another service via Dapr Service Invocation"""
         url = f"{DAPR_URL}/invoke/{app_id}/method/{method}"
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._http() as client:
                 if data:
                     response = await client.post(url, json=data)
                 else:
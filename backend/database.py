@@ -1,11 +1,18 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
-from typing import Generator
+import threading
+import time
+from typing import AsyncGenerator, Callable, Dict, Generator, Optional, TypeVar
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from sqlalchemy import event
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from sqlite_profile import SQLITE_WRITER_QUEUE, configure_sqlite, default_profile
 
 # Helper to fix postgres protocol for SQLAlchemy if needed
 def get_db_url():
@@ -22,20 +29,150 @@ def get_db_url():
 
 DATABASE_URL = get_db_url()
 
-# Configure engine with WAL mode for SQLite
-connect_args = {}
-if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+T = TypeVar("T")
+
+# Async drivers for the same database, used by async def endpoints
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def get_async_db_url(url):
+    """DATABASE_URL with its async driver (aiosqlite / asyncpg), or None if there is none"""
+    if not url:
+        return None
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    query = dict(parsed.query)
+    if backend == "postgresql":
+        # asyncpg takes ssl=<mode> and rejects libpq-only options (e.g. Neon's channel_binding)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            query["ssl"] = sslmode
+    return parsed.set(drivername=ASYNC_DRIVERS[backend], query=query)
+
+ASYNC_DATABASE_URL = get_async_db_url(DATABASE_URL)
+
+# Pool settings for every engine (primary and replica, sync and async)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # Seconds; -1 keeps connections forever
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+
+# Optional read replica; reads fall back to the primary when unset
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+if DATABASE_READ_URL and DATABASE_READ_URL.startswith("postgres://"):
+    DATABASE_READ_URL = DATABASE_READ_URL.replace("postgres://", "postgresql://", 1)
+# How long a user's reads stay on the primary after they write (covers replica lag)
+DB_READ_STICKY_SECONDS = float(os.getenv("DB_READ_STICKY_SECONDS", "5"))
+
+def pool_options(url) -> dict:
+    """Pool keyword arguments for create_engine; in-memory SQLite has a single-connection pool"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _aiosqlite_creator(path):
+    import aiosqlite
+
+    async def connect():
+        connection = aiosqlite.connect(path)
+        # aiosqlite runs each connection on a non-daemon thread; a pooled connection
+        # that was never disposed (scripts, TestClient without lifespan) would keep
+        # the process from exiting. The app's lifespan still disposes them cleanly.
+        connection._thread.daemon = True
+        return await connection
+
+    return connect
+
+def create_engines(url, sqlite_profile: Optional[str] = None, writer_queue: bool = SQLITE_WRITER_QUEUE) -> tuple:
+    """
+    Sync engine and async engine (None without an async driver) for one database
+    URL. SQLite engines get sqlite_profile (default: SQLITE_PROFILE) and, with
+    writer_queue, a writer queue on the sync engine.
+    """
+    options = pool_options(url)
+    sqlite = url.startswith("sqlite")
+    sync_engine = create_engine(url, connect_args={"check_same_thread": False} if sqlite else {}, **options)
+    async_url = get_async_db_url(url)
+    if async_url is None:
+        async_engine = None
+    elif sqlite:
+        async_engine = create_async_engine(async_url, async_creator=_aiosqlite_creator(async_url.database), **options)
+    else:
+        async_engine = create_async_engine(async_url, **options)
+    # In-memory databases are private to one connection: nothing to queue
+    if sqlite and options:
+        configure_sqlite(sync_engine, async_engine, sqlite_profile or default_profile(url), writer_queue)
+    return sync_engine, async_engine
+
+engine, async_engine = create_engines(DATABASE_URL) if DATABASE_URL else (None, None)
+
+
+class ReadRouter:
+    """
+    Picks the engine for a user's read-only queries: the replica, unless the
+    user wrote within the last sticky_seconds (read-your-writes). Writes are
+    marked by models.bump_data_version, which every change to user data goes
+    through. The window is per process, so it should exceed replica lag.
+    """
+
+    def __init__(self, primary: tuple, replica: Optional[tuple] = None, sticky_seconds: float = DB_READ_STICKY_SECONDS):
+        self.primary = primary
+        self.replica = replica
+        self.sticky_seconds = sticky_seconds
+        self._sticky_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def mark_write(self, user_id: str):
+        if self.replica is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._sticky_until[user_id] = now + self.sticky_seconds
+            if len(self._sticky_until) > 10000:
+                # Drop lapsed windows so the map tracks recent writers only
+                self._sticky_until = {u: t for u, t in self._sticky_until.items() if t > now}
+
+    def use_replica(self, user_id: str) -> bool:
+        if self.replica is None:
+            return False
+        with self._lock:
+            sticky = self._sticky_until.get(user_id, 0) > time.monotonic()
+            if sticky:
+                self.primary_reads += 1
+            else:
+                self.replica_reads += 1
+        return not sticky
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args) if DATABASE_URL else None
+    def engine(self, user_id: str):
+        return (self.replica if self.use_replica(user_id) else self.primary)[0]
 
-if engine and DATABASE_URL and DATABASE_URL.startswith("sqlite"):
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        cursor.close()
+    def async_engine(self, user_id: str):
+        return (self.replica if self.use_replica(user_id) else self.primary)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replica": self.replica is not None,
+                "sticky_users": len(self._sticky_until),
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+            }
+
+
+# Singleton instance
+read_router = ReadRouter((engine, async_engine), create_engines(DATABASE_READ_URL) if DATABASE_READ_URL else None)
 
 def get_session() -> Generator[Session, None, None]:
     if not engine:
@@ -43,9 +180,52 @@ def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
 
+async def run_write(work: Callable[..., T], *args) -> T:
+    """
+    Run work(session, *args) in the threadpool with its own sync Session, for
+    write endpoints. One thread hop per request: a sync commit is cheaper than
+    an async driver's per-statement round trips through the event loop, and
+    the session never does I/O on the loop. Objects stay loaded after commit,
+    so the response needs no refresh query.
+    """
+    if not engine:
+        raise RuntimeError("DATABASE_URL is not set")
+
+    def run() -> T:
+        with Session(engine, expire_on_commit=False) as session:
+            return work(session, *args)
+
+    return await run_in_threadpool(run)
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for async def endpoints, so their queries don't block the event loop.
+    Objects stay loaded after commit (no implicit refresh, which would need await).
+    """
+    if not async_engine:
+        raise RuntimeError("DATABASE_URL is not set or has no async driver")
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def read_session(user_id: str) -> Session:
+    """Session for read-only queries on user_id's data (replica when configured)"""
+    if not engine:
+        raise RuntimeError("DATABASE_URL is not set")
+    return Session(read_router.engine(user_id))
+
+async def get_async_read_session(user_id: str) -> AsyncGenerator[AsyncSession, None]:
+    """get_async_session for read-only endpoints with a user_id path parameter"""
+    if not async_engine:
+        raise RuntimeError("DATABASE_URL is not set or has no async driver")
+    async with AsyncSession(read_router.async_engine(user_id), expire_on_commit=False) as session:
+        yield session
+
 def create_db_and_tables():
     if not engine:
         raise RuntimeError("DATABASE_URL is not set")
-    # Import all models to ensure they're registered
-    from models import User, Session as DbSession, Todo, Conversation, Message
-    SQLModel.metadata.create_all(engine)
+    # Creates missing tables and brings existing ones up to date (see migrations.py)
+    from migrations import migration_runner
+    migration_runner.migrate_schema(engine)
+
+    from search import install_search_backend
+    install_search_backend(engine)
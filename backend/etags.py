@@ -0,0 +1,78 @@
+"""
+Conditional GET (ETag / If-None-Match)
+
+Read endpoints derive a weak ETag from the user's counter in user_data_version,
+which every todo or chat change bumps (see bump_data_version in models.py). A
+request whose If-None-Match matches is answered with 304 after one primary-key
+lookup, before the endpoint touches todo, conversation or message rows.
+
+The version is read before the data, so a write landing in between can only
+make the ETag older than the body it is sent with; the next request then sees
+a mismatch and gets a fresh 200, never a stale 304.
+
+data_version_async / conditional_get_async are the same for AsyncSession.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import UserDataVersion, DATA_VERSION_SCOPES
+
+# Bump when a response shape changes, so clients can't keep an old body alive with a 304
+ETAG_REVISION = "1"
+
+
+def _version_statement(user_id: str, scope: str):
+    column = getattr(UserDataVersion, DATA_VERSION_SCOPES[scope])
+    return select(column).where(UserDataVersion.user_id == user_id)
+
+
+def data_version(session: Session, user_id: str, scope: str) -> int:
+    return session.exec(_version_statement(user_id, scope)).first() or 0
+
+
+async def data_version_async(session: AsyncSession, user_id: str, scope: str) -> int:
+    return (await session.exec(_version_statement(user_id, scope))).first() or 0
+
+
+def make_etag(user_id: str, scope: str, version: int, resource: str) -> str:
+    # The user and URL are hashed in so an ETag never matches another user's or resource's body
+    digest = hashlib.sha1(f"{ETAG_REVISION}:{user_id}:{resource}".encode()).hexdigest()[:12]
+    return f'W/"{scope[0]}{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (a list of tags, or *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def conditional_get(request: Request, response: Response, session: Session, user_id: str, scope: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client's copy is current; otherwise set the
+    ETag on the endpoint's response and return None
+    """
+    return _conditional_response(request, response, user_id, scope, data_version(session, user_id, scope))
+
+
+async def conditional_get_async(request: Request, response: Response, session: AsyncSession, user_id: str, scope: str) -> Optional[Response]:
+    version = await data_version_async(session, user_id, scope)
+    return _conditional_response(request, response, user_id, scope, version)
+
+
+def _conditional_response(request: Request, response: Response, user_id: str, scope: str, version: int) -> Optional[Response]:
+    resource = request.url.path + ("?" + request.url.query if request.url.query else "")
+    etag = make_etag(user_id, scope, version, resource)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
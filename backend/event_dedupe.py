@@ -0,0 +1,103 @@
+"""
+Event Deduplication
+
+Dapr delivers task-events at least once (and the outbox relay may republish
+after a crash), so consumers with side effects must ignore events they have
+already handled. Processed event ids are stored in the processed_event table,
+written in the same transaction as the side effect, and expire after
+EVENT_DEDUPE_TTL_HOURS. An in-process LRU of recent ids sits in front of the
+table, so most duplicates are dropped without touching the database.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from database import engine
+from models import ProcessedEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_DEDUPE_LRU_SIZE = int(os.getenv("EVENT_DEDUPE_LRU_SIZE", "100000"))
+# Must exceed the longest redelivery window (outbox retries, Dapr redelivery)
+EVENT_DEDUPE_TTL_HOURS = float(os.getenv("EVENT_DEDUPE_TTL_HOURS", "72"))
+EVENT_DEDUPE_SWEEP_INTERVAL_SECONDS = float(os.getenv("EVENT_DEDUPE_SWEEP_INTERVAL_SECONDS", "600"))
+
+
+class EventDeduplicator:
+    """Thread-safe LRU of seen event ids backed by the processed_event table"""
+
+    def __init__(self, max_entries: int = EVENT_DEDUPE_LRU_SIZE):
+        self.max_entries = max_entries
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.db_duplicates = 0
+
+    def seen(self, event_id: str) -> bool:
+        """True if the event was recently handled by this process (no DB access)"""
+        with self._lock:
+            if event_id in self._recent:
+                self._recent.move_to_end(event_id)
+                self.hits += 1
+                return True
+            return False
+
+    def remember(self, event_id: str):
+        with self._lock:
+            self._recent[event_id] = None
+            self._recent.move_to_end(event_id)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+
+    @staticmethod
+    def record(session: Session, event_id: str):
+        """
+        Stage the event id in the caller's transaction. If another delivery
+        already recorded it, the commit fails with IntegrityError.
+        """
+        session.add(ProcessedEvent(event_id=event_id))
+
+    @staticmethod
+    def is_recorded(session: Session, event_id: str) -> bool:
+        """True if a committed transaction recorded the event id"""
+        return session.get(ProcessedEvent, event_id) is not None
+
+    def duplicate(self, event_id: str):
+        """Count a duplicate detected by the database and remember it"""
+        self.db_duplicates += 1
+        self.remember(event_id)
+
+    def sweep(self) -> int:
+        """Delete ids older than EVENT_DEDUPE_TTL_HOURS"""
+        cutoff = datetime.utcnow() - timedelta(hours=EVENT_DEDUPE_TTL_HOURS)
+        with Session(engine) as session:
+            result = session.execute(delete(ProcessedEvent).where(ProcessedEvent.processed_at < cutoff))
+            session.commit()
+        self._last_sweep = time.monotonic()
+        if result.rowcount:
+            logger.info(f"Event dedupe: deleted {result.rowcount} expired event ids")
+        return result.rowcount
+
+    def maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= EVENT_DEDUPE_SWEEP_INTERVAL_SECONDS:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Event dedupe sweep failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._recent)
+        return {"lru_entries": size, "lru_hits": self.hits, "db_duplicates": self.db_duplicates}
+
+
+# Singleton instance
+event_dedupe = EventDeduplicator()
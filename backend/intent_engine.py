@@ -0,0 +1,208 @@
+"""
+Compiled Intent Engine
+
+Intent detection for MockAI (routers/chat.py), built once at import:
+- One Aho-Corasick automaton holds every keyword of every intent and language
+  (list/complete/delete/system keywords, priority and due date words, status
+  and first/last references, and the literal each title pattern needs).
+  A single pass over the lowercased message yields a bitmask of the keyword
+  groups it contains, replacing the `any(w in text_lower ...)` scans.
+- Title patterns are precompiled, and a pattern only runs when the
+  automaton saw the literal it can't match without (usually one regex
+  search per message, none for most non-add messages).
+
+detect_intent() returns exactly what the pattern-list implementation did,
+including which title pattern wins when several match (the first in list
+order); scripts/test_intents.py checks this against golden outputs
+recorded from that implementation.
+"""
+
+import re
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+_URDU = re.compile(r'[\u0600-\u06FF]')
+
+# Title patterns per language, in priority order, each with a literal it can't match without
+TITLE_PATTERNS = {
+    "english": [
+        (r'add task:?\s*(.+)', "add task"),
+        (r'create task:?\s*(.+)', "create task"),
+        (r'new task:?\s*(.+)', "new task"),
+        (r'add\s+(.+)\s+to\s+(my\s+)?list', "add"),
+        (r'remind me to\s+(.+)', "remind me to"),
+    ],
+    "urdu": [
+        (r'نیا کام:?\s*(.+)', "نیا کام"),
+        (r'کام شامل کرو:?\s*(.+)', "کام شامل کرو"),
+        (r'یاد دہانی:?\s*(.+)', "یاد دہانی"),
+    ],
+}
+
+# Keyword groups (bit flags); a message "contains" a group if it contains any of its keywords.
+# Each title pattern's literal gets a flag of its own, from TITLE_FLAGS up.
+PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_MEDIUM = 1 << 2, 1 << 3, 1 << 4
+DUE_TODAY, DUE_TOMORROW = 1 << 5, 1 << 6
+LIST_EN, LIST_UR = 1 << 7, 1 << 8
+STATUS_PENDING, STATUS_COMPLETED = 1 << 9, 1 << 10
+COMPLETE_EN, COMPLETE_UR = 1 << 11, 1 << 12
+DELETE_EN, DELETE_UR = 1 << 13, 1 << 14
+SYSTEM_EN, SYSTEM_UR = 1 << 15, 1 << 16
+REF_FIRST, REF_LAST = 1 << 17, 1 << 18
+TITLE_FLAGS = 1 << 19
+
+KEYWORDS = {
+    PRIORITY_HIGH: ["high priority", "urgent", "important", "ضروری", "انتہائی"],
+    PRIORITY_LOW: ["low priority", "not urgent", "معمولی"],
+    PRIORITY_MEDIUM: ["medium", "درمیانہ"],
+    DUE_TODAY: ["today", "آج"],
+    DUE_TOMORROW: ["tomorrow", "کل"],
+    LIST_EN: ["show", "list", "display", "view", "my tasks", "what tasks"],
+    LIST_UR: ["دکھاؤ", "فہرست", "کام"],
+    STATUS_PENDING: ["pending", "incomplete", "زیر التواء"],
+    STATUS_COMPLETED: ["completed", "done", "مکمل"],
+    COMPLETE_EN: ["complete", "finish", "done", "mark"],
+    COMPLETE_UR: ["مکمل", "ختم"],
+    DELETE_EN: ["delete", "remove", "cancel"],
+    DELETE_UR: ["حذف", "ہٹاؤ"],
+    SYSTEM_EN: ["cluster", "nodes", "pods", "status", "system", "health", "infrastructure"],
+    SYSTEM_UR: ["کلسٹر", "نوڈز", "پوڈز", "سسٹم", "صحت", "انفراسٹرکچر"],
+    REF_FIRST: ["first", "پہلا"],
+    REF_LAST: ["last", "آخری"],
+}
+
+# Intent keyword groups per language
+_LANGUAGE_GROUPS = {
+    "english": (LIST_EN, COMPLETE_EN, DELETE_EN, SYSTEM_EN),
+    "urdu": (LIST_UR, COMPLETE_UR, DELETE_UR, SYSTEM_UR),
+}
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton mapping keywords to bit flags, compiled to a DFA:
+    one dict lookup per character of the text, overlapping and nested
+    keywords included.
+    """
+
+    def __init__(self, keywords: Dict[int, List[str]]):
+        goto: List[Dict[str, int]] = [{}]
+        flags = [0]
+        for flag, words in keywords.items():
+            for word in words:
+                state = 0
+                for ch in word:
+                    if ch not in goto[state]:
+                        goto.append({})
+                        flags.append(0)
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                flags[state] |= flag
+
+        # Breadth-first: a state's failure state is always complete before the state itself
+        self._delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            flags[state] |= flags[fail[state]]
+            self._delta[state] = {**self._delta[fail[state]], **goto[state]}
+            for ch, child in goto[state].items():
+                fail[child] = self._delta[fail[state]].get(ch, 0)
+                queue.append(child)
+        self._flags = flags
+        self._transitions = [d.get for d in self._delta]
+
+    def scan(self, text: str) -> int:
+        """OR of the flags of every keyword occurring in text"""
+        transitions, flags = self._transitions, self._flags
+        found = state = 0
+        for ch in text:
+            state = transitions[state](ch, 0)
+            if flags[state]:
+                found |= flags[state]
+        return found
+
+
+class IntentEngine:
+    def __init__(self):
+        self.keywords = dict(KEYWORDS)
+        # language -> [(flag, compiled pattern)] in priority order
+        self.title_patterns = {}
+        flag = TITLE_FLAGS
+        for language, patterns in TITLE_PATTERNS.items():
+            self.title_patterns[language] = []
+            for pattern, literal in patterns:
+                self.keywords[flag] = [literal]
+                self.title_patterns[language].append((flag, re.compile(pattern, re.IGNORECASE)))
+                flag <<= 1
+        self.automaton = KeywordAutomaton(self.keywords)
+
+    @staticmethod
+    def detect_language(text: str) -> str:
+        """Detect if text is in Urdu"""
+        return "urdu" if _URDU.search(text) else "english"
+
+    def _title(self, text: str, language: str, found: int) -> Optional[str]:
+        language = "urdu" if language == "urdu" else "english"
+        # Literals were matched in text.lower() and patterns match with IGNORECASE. The two
+        # agree on ASCII and on Urdu (which has no case); other text tries every pattern.
+        exact = language == "urdu" or text.isascii()
+        for flag, pattern in self.title_patterns[language]:
+            if found & flag or not exact:
+                match = pattern.search(text)
+                if match:
+                    return match.group(1).strip()
+        return None
+
+    def extract_task_title(self, text: str, language: str) -> Optional[str]:
+        """Extract task title from natural language"""
+        return self._title(text, language, self.automaton.scan(text.lower()))
+
+    def detect_intent(self, text: str, language: str) -> Tuple[str, dict]:
+        """
+        Detect user intent and extract parameters
+
+        Returns:
+            (intent, params) tuple
+        """
+        found = self.automaton.scan(text.lower())
+        list_group, complete_group, delete_group, system_group = _LANGUAGE_GROUPS["urdu" if language == "urdu" else "english"]
+
+        task_title = self._title(text, language, found)
+        if task_title:
+            params = {"title": task_title}
+            if found & PRIORITY_HIGH:
+                params["priority"] = "high"
+            elif found & PRIORITY_LOW:
+                params["priority"] = "low"
+            elif found & PRIORITY_MEDIUM:
+                params["priority"] = "medium"
+
+            if found & DUE_TODAY:
+                params["due_date"] = datetime.utcnow().date().isoformat()
+            elif found & DUE_TOMORROW:
+                params["due_date"] = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
+            return ("add_task", params)
+
+        if found & list_group:
+            if found & STATUS_PENDING:
+                return ("list_tasks", {"status": "pending"})
+            if found & STATUS_COMPLETED:
+                return ("list_tasks", {"status": "completed"})
+            return ("list_tasks", {"status": "all"})
+
+        for group, intent in ((complete_group, "complete_task"), (delete_group, "delete_task")):
+            if found & group:
+                # Default to first
+                return (intent, {"task_ref": "last" if found & REF_LAST and not found & REF_FIRST else "first"})
+
+        if found & system_group:
+            return ("check_system_status", {})
+
+        return ("unknown", {})
+
+
+# Singleton instance
+intent_engine = IntentEngine()
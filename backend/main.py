@@ -1,14 +1,24 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from database import create_db_and_tables
+from database import create_db_and_tables, engine, async_engine, read_router
 from routers import todos, chat, events
 from system_utils import get_system_status_data
+from session_cache import session_cache
+from dapr_client import dapr
+from outbox import outbox_relay
+from event_dedupe import event_dedupe
+from recurrence import recurrence_sweeper
+from reminders import reminder_scheduler
+from change_stream import change_hub
+from sqlite_profile import sqlite_optimizer, writer_queue_stats
+from migrations import migration_runner
 import os
+import json
 
 import logging
 import traceback
-from fastapi import Request, Response
+from fastapi import Response
 
 # SP-7: Structured Logging
 class JsonFormatter(logging.Formatter):
@@ -32,9 +42,29 @@ logger.setLevel(logging.INFO)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Ensure tables exist
+    # Ensure tables exist and apply schema migrations
     create_db_and_tables()
+    await dapr.start()
+    await outbox_relay.start()
+    await recurrence_sweeper.start(engine)
+    await reminder_scheduler.start()
+    await change_hub.start()
+    await sqlite_optimizer.start(engine)
+    # Index builds and backfills run after startup, so they don't hold up readiness
+    await migration_runner.start(engine)
     yield
+    await migration_runner.close()
+    await sqlite_optimizer.close()
+    await change_hub.close()
+    await reminder_scheduler.close()
+    await recurrence_sweeper.close()
+    # Drain committed events while the Dapr client is still open
+    await outbox_relay.close()
+    await dapr.close()
+    if async_engine:
+        await async_engine.dispose()
+    if read_router.replica and read_router.replica[1]:
+        await read_router.replica[1].dispose()
 
 # Determine root path based on environment
 # On Vercel, requests to /api/backend/xxx are routed to this app
@@ -49,18 +79,39 @@ app = FastAPI(
     root_path=root_path
 )
 
-@app.middleware("http")
-async def catch_exceptions_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except Exception as e:
-        # Don't catch HTTPExceptions (like 401 Unauthorized), let FastAPI handle them
-        if type(e).__name__ == "HTTPException" or type(e).__name__ == "StarletteHTTPException":
-            raise e
-            
-        logger.error(f"Global exception: {e}")
-        logger.error(traceback.format_exc())
-        return Response("Internal Server Error", status_code=500)
+class CatchExceptionsMiddleware:
+    """
+    Turn unhandled exceptions into a plain 500. Written as raw ASGI rather than
+    @app.middleware("http"): that wrapper adds a task group and memory stream to
+    every response, which each open /todos/stream connection would hold.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # Don't catch HTTPExceptions (like 401 Unauthorized), let FastAPI handle them
+            if response_started or type(e).__name__ in ("HTTPException", "StarletteHTTPException"):
+                raise
+
+            logger.error(f"Global exception: {e}")
+            logger.error(traceback.format_exc())
+            await Response("Internal Server Error", status_code=500)(scope, receive, send)
+
+app.add_middleware(CatchExceptionsMiddleware)
 
 # Allow CORS for Frontend
 # In production this should be restricted to the frontend domain
@@ -82,10 +133,24 @@ app.include_router(events.router)
 def read_root():
     return {"message": "Welcome to Evolution of Todo API"}
 
+# No I/O: answered on the event loop, so a busy threadpool can't delay it
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy"}
 
 @app.get("/system/status")
 def get_system_status():
     return get_system_status_data()
+
+@app.get("/metrics")
+def get_metrics():
+    return {
+        "session_cache": session_cache.stats(),
+        "outbox": outbox_relay.stats(),
+        "event_dedupe": event_dedupe.stats(),
+        "reminders": reminder_scheduler.stats(),
+        "change_stream": change_hub.stats(),
+        "read_routing": read_router.stats(),
+        "migrations": migration_runner.stats(),
+        "sqlite": {"optimize_runs": sqlite_optimizer.runs, "writer_queues": writer_queue_stats()},
+    }
@@ -1,23 +1,44 @@
 """
 MCP Server for Task Management Tools
 
-This module implements the Model Context Protocol (MCP) server with 5 task management tools:
+This module implements the Model Context Protocol (MCP) server with 7 task management tools:
 - add_task: Create a new task
 - list_tasks: List tasks with optional filtering
 - complete_task: Mark a task as completed
 - delete_task: Delete a task
+- complete_nth_task / delete_nth_task: The same for the task at a position
+  in the list ("first", "last"), found with one LIMIT 1 query
 - update_task: Update task details
+
+Each tool commits its own session, or, given the caller's session (the chat
+endpoint's turn), only stages its changes there and leaves the commit to the
+caller.
 """
 
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any
 from sqlmodel import Session, select
-from database import get_session, engine
+from database import get_session, engine, read_session
 from models import Todo, User
+from outbox import add_event, outbox_relay
 import uuid
 import json
 from datetime import datetime
 
 
+@contextmanager
+def _unit_of_work(session: Optional[Session]):
+    """The caller's session (the caller commits), or a new one committed on exit"""
+    if session is not None:
+        yield session
+        return
+    with Session(engine) as session:
+        yield session
+        if session.new or session.dirty or session.deleted:
+            session.commit()
+            outbox_relay.notify()
+
+
 class MCPTaskTools:
     """MCP Task Management Tools"""
     
@@ -27,7 +48,8 @@ class MCPTaskTools:
         title: str, 
         description: Optional[str] = None,
         priority: str = "medium",
-        due_date: Optional[str] = None
+        due_date: Optional[str] = None,
+        session: Optional[Session] = None
     ) -> Dict[str, Any]:
         """
         Add a new task for the user
@@ -38,14 +60,15 @@ class MCPTaskTools:
             description: Optional task description
             priority: Task priority ("low" | "medium" | "high")
             due_date: ISO date string (optional)
+            session: Caller's session to work in; it commits (default: own session)
             
         Returns:
             Dict with task_id, status, and title
         """
         try:
-            with Session(engine) as session:
+            with _unit_of_work(session) as db:
                 # Verify user exists
-                user = session.get(User, user_id)
+                user = db.get(User, user_id)
                 if not user:
                     return {
                         "status": "error",
@@ -69,24 +92,14 @@ class MCPTaskTools:
                     priority=priority.lower() if priority else "medium",
                     due_date=parsed_due_date
                 )
-                session.add(task)
-                session.commit()
-                # SP-2: Emit event via Dapr
-                try:
-                    import asyncio
-                    from dapr_client import dapr
-                    # We use a separate thread/task for fire-and-forget in sync method
-                    # or handle it synchronously since it's a tool.
-                    # Best: Use a lightweight bridge.
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(dapr.publish_event("pubsub", "task-events", {
-                        "type": "task_created_mcp",
-                        "user_id": user_id,
-                        "task_id": str(task.id),
-                        "title": task.title
-                    }))
-                except: pass
+                db.add(task)
+                # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+                add_event(db, "task-events", {
+                    "type": "task_created_mcp",
+                    "user_id": user_id,
+                    "task_id": str(task.id),
+                    "title": task.title
+                })
 
                 return {
                     "task_id": str(task.id),
@@ -96,25 +109,29 @@ class MCPTaskTools:
                 }
 
         except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
             return {
                 "status": "error",
                 "message": f"Failed to add task: {str(e)}"
             }
     
     @staticmethod
-    def list_tasks(user_id: str, status: str = "all") -> Dict[str, Any]:
+    def list_tasks(user_id: str, status: str = "all", session: Optional[Session] = None) -> Dict[str, Any]:
         """
         List user's tasks with optional filtering
         
         Args:
             user_id: User identifier
             status: Filter by status ("all" | "pending" | "completed")
+            session: Caller's session to read in (default: the user's read session)
             
         Returns:
             Dict with tasks array
         """
         try:
-            with Session(engine) as session:
+            with (read_session(user_id) if session is None else _unit_of_work(session)) as db:
                 # Build query
                 statement = select(Todo).where(Todo.user_id == user_id)
                 
@@ -122,8 +139,10 @@ class MCPTaskTools:
                     statement = statement.where(Todo.is_completed == False)
                 elif status == "completed":
                     statement = statement.where(Todo.is_completed == True)
+                # Creation order, which the *_nth_task positions refer to
+                statement = statement.order_by(Todo.created_at, Todo.id)
                 
-                tasks = session.exec(statement).all()
+                tasks = db.exec(statement).all()
                 
                 task_list = [
                     {
@@ -145,25 +164,29 @@ class MCPTaskTools:
                     "count": len(task_list)
                 }
         except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
             return {
                 "status": "error",
                 "message": f"Failed to list tasks: {str(e)}"
             }
     
     @staticmethod
-    def complete_task(user_id: str, task_id: str) -> Dict[str, Any]:
+    def complete_task(user_id: str, task_id: str, session: Optional[Session] = None) -> Dict[str, Any]:
         """
         Mark a task as completed
         
         Args:
             user_id: User identifier
             task_id: Task identifier (UUID string)
+            session: Caller's session to work in; it commits (default: own session)
             
         Returns:
             Dict with task_id, status, and title
         """
         try:
-            with Session(engine) as session:
+            with _unit_of_work(session) as db:
                 # Find task
                 try:
                     task_uuid = uuid.UUID(task_id)
@@ -177,7 +200,7 @@ class MCPTaskTools:
                     Todo.id == task_uuid,
                     Todo.user_id == user_id
                 )
-                task = session.exec(statement).first()
+                task = db.exec(statement).first()
                 
                 if not task:
                     return {
@@ -185,50 +208,32 @@ class MCPTaskTools:
                         "message": f"Task not found: {task_id}"
                     }
                 
-                # Mark as completed
-                task.is_completed = True
-                session.add(task)
-                session.commit()
-                
-                # SP-2: Emit event via Dapr
-                try:
-                    import asyncio
-                    from dapr_client import dapr
-                    loop = asyncio.new_event_loop()
-                    loop.run_until_complete(dapr.publish_event("pubsub", "task-events", {
-                        "type": "task_completed_mcp",
-                        "user_id": user_id,
-                        "task_id": task_id
-                    }))
-                except: pass
-
-                return {
-                    "task_id": task_id,
-                    "status": "completed",
-                    "title": task.title,
-                    "message": f"✅ Marked '{task.title}' as completed"
-                }
+                return MCPTaskTools._mark_completed(db, user_id, task)
 
         except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
             return {
                 "status": "error",
                 "message": f"Failed to complete task: {str(e)}"
             }
     
     @staticmethod
-    def delete_task(user_id: str, task_id: str) -> Dict[str, Any]:
+    def delete_task(user_id: str, task_id: str, session: Optional[Session] = None) -> Dict[str, Any]:
         """
         Delete a task
         
         Args:
             user_id: User identifier
             task_id: Task identifier (UUID string)
+            session: Caller's session to work in; it commits (default: own session)
             
         Returns:
             Dict with task_id, status, and title
         """
         try:
-            with Session(engine) as session:
+            with _unit_of_work(session) as db:
                 # Find task
                 try:
                     task_uuid = uuid.UUID(task_id)
@@ -242,7 +247,7 @@ class MCPTaskTools:
                     Todo.id == task_uuid,
                     Todo.user_id == user_id
                 )
-                task = session.exec(statement).first()
+                task = db.exec(statement).first()
                 
                 if not task:
                     return {
@@ -250,30 +255,70 @@ class MCPTaskTools:
                         "message": f"Task not found: {task_id}"
                     }
                 
-                title = task.title
-                session.delete(task)
-                session.commit()
-                
-                # SP-2: Emit event via Dapr
-                try:
-                    import asyncio
-                    from dapr_client import dapr
-                    loop = asyncio.new_event_loop()
-                    loop.run_until_complete(dapr.publish_event("pubsub", "task-events", {
-                        "type": "task_deleted_mcp",
-                        "user_id": user_id,
-                        "task_id": task_id
-                    }))
-                except: pass
+                return MCPTaskTools._delete(db, user_id, task)
 
-                return {
-                    "task_id": task_id,
-                    "status": "deleted",
-                    "title": title,
-                    "message": f"🗑️ Deleted task: {title}"
-                }
+        except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
+            return {
+                "status": "error",
+                "message": f"Failed to delete task: {str(e)}"
+            }
+    
+    @staticmethod
+    def complete_nth_task(user_id: str, n: int = 1, session: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        Mark the user's n-th pending task as completed, in list_tasks order
+        
+        Args:
+            user_id: User identifier
+            n: 1-based position; negative counts from the end (-1 is the last)
+            session: Caller's session to work in; it commits (default: own session)
+            
+        Returns:
+            Dict with task_id, status, and title
+        """
+        try:
+            with _unit_of_work(session) as db:
+                task = MCPTaskTools._nth_task(db, user_id, n, pending=True)
+                if not task:
+                    return {"status": "error", "message": "No pending tasks found"}
+                return MCPTaskTools._mark_completed(db, user_id, task)
+
+        except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
+            return {
+                "status": "error",
+                "message": f"Failed to complete task: {str(e)}"
+            }
+    
+    @staticmethod
+    def delete_nth_task(user_id: str, n: int = 1, session: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        Delete the user's n-th task, in list_tasks order
+        
+        Args:
+            user_id: User identifier
+            n: 1-based position; negative counts from the end (-1 is the last)
+            session: Caller's session to work in; it commits (default: own session)
+            
+        Returns:
+            Dict with task_id, status, and title
+        """
+        try:
+            with _unit_of_work(session) as db:
+                task = MCPTaskTools._nth_task(db, user_id, n, pending=False)
+                if not task:
+                    return {"status": "error", "message": "No tasks found"}
+                return MCPTaskTools._delete(db, user_id, task)
 
         except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
             return {
                 "status": "error",
                 "message": f"Failed to delete task: {str(e)}"
@@ -286,7 +331,8 @@ class MCPTaskTools:
         title: Optional[str] = None,
         description: Optional[str] = None,
         priority: Optional[str] = None,
-        due_date: Optional[str] = None
+        due_date: Optional[str] = None,
+        session: Optional[Session] = None
     ) -> Dict[str, Any]:
         """
         Update task details
@@ -298,12 +344,13 @@ class MCPTaskTools:
             description: New description (optional)
             priority: New priority (optional)
             due_date: New due date string (optional)
+            session: Caller's session to work in; it commits (default: own session)
             
         Returns:
             Dict with task_id, status, and title
         """
         try:
-            with Session(engine) as session:
+            with _unit_of_work(session) as db:
                 # Find task
                 try:
                     task_uuid = uuid.UUID(task_id)
@@ -317,7 +364,7 @@ class MCPTaskTools:
                     Todo.id == task_uuid,
                     Todo.user_id == user_id
                 )
-                task = session.exec(statement).first()
+                task = db.exec(statement).first()
                 
                 if not task:
                     return {
@@ -338,22 +385,14 @@ class MCPTaskTools:
                     except ValueError:
                         pass
                 
-                session.add(task)
-                session.commit()
-                session.refresh(task)
-                
-                # SP-2: Emit event via Dapr
-                try:
-                    import asyncio
-                    from dapr_client import dapr
-                    loop = asyncio.new_event_loop()
-                    loop.run_until_complete(dapr.publish_event("pubsub", "task-events", {
-                        "type": "task_updated_mcp",
-                        "user_id": user_id,
-                        "task_id": task_id,
-                        "title": task.title
-                    }))
-                except: pass
+                db.add(task)
+                # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+                add_event(db, "task-events", {
+                    "type": "task_updated_mcp",
+                    "user_id": user_id,
+                    "task_id": task_id,
+                    "title": task.title
+                })
 
                 return {
                     "task_id": task_id,
@@ -363,11 +402,67 @@ class MCPTaskTools:
                 }
 
         except Exception as e:
+            if session is not None:
+                # Fails the caller's whole unit of work
+                raise
             return {
                 "status": "error",
                 "message": f"Failed to update task: {str(e)}"
             }
 
 
+    @staticmethod
+    def _nth_task(db: Session, user_id: str, n: int, pending: bool) -> Optional[Todo]:
+        """One row, read with LIMIT 1 off the (user_id[, is_completed], created_at, id) index"""
+        if n == 0:
+            raise ValueError("Task positions start at 1 (or -1 from the end)")
+        statement = select(Todo).where(Todo.user_id == user_id)
+        if pending:
+            statement = statement.where(Todo.is_completed == False)
+        if n > 0:
+            statement = statement.order_by(Todo.created_at, Todo.id)
+        else:
+            statement = statement.order_by(Todo.created_at.desc(), Todo.id.desc())
+        return db.exec(statement.offset(abs(n) - 1).limit(1)).first()
+
+    @staticmethod
+    def _mark_completed(db: Session, user_id: str, task: Todo) -> Dict[str, Any]:
+        task_id = str(task.id)
+        task.is_completed = True
+        db.add(task)
+        # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+        add_event(db, "task-events", {
+            "type": "task_completed_mcp",
+            "user_id": user_id,
+            "task_id": task_id
+        })
+
+        return {
+            "task_id": task_id,
+            "status": "completed",
+            "title": task.title,
+            "message": f"✅ Marked '{task.title}' as completed"
+        }
+
+    @staticmethod
+    def _delete(db: Session, user_id: str, task: Todo) -> Dict[str, Any]:
+        task_id = str(task.id)
+        title = task.title
+        db.delete(task)
+        # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+        add_event(db, "task-events", {
+            "type": "task_deleted_mcp",
+            "user_id": user_id,
+            "task_id": task_id
+        })
+
+        return {
+            "task_id": task_id,
+            "status": "deleted",
+            "title": title,
+            "message": f"🗑️ Deleted task: {title}"
+        }
+
+
 # Export singleton instance
 mcp_tools = MCPTaskTools()
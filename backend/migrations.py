@@ -0,0 +1,623 @@
+"""
+Versioned Schema Migrations
+
+Replaces the one-off migrate_*.py scripts. Every schema change to an existing
+table is a numbered Migration; applied versions are recorded in the
+schema_migration table, so each runs once per database.
+
+- A fresh database gets create_all and every version stamped as applied;
+  only migrations marked fresh (objects the models don't declare) run.
+- "schema" migrations (nullable ADD COLUMN, small fixups) run at startup,
+  before the app serves traffic. On PostgreSQL they take an advisory lock
+  (one instance migrates, the others wait) and a lock_timeout, so an
+  ALTER TABLE queued behind a long transaction is retried instead of
+  stalling every query on the table.
+- "background" migrations (index builds, backfills) run in a task after
+  startup, so readiness doesn't wait on large tables. Backfills update
+  MIGRATION_BATCH_SIZE rows per transaction in primary key order and report
+  progress in the log and /metrics. On PostgreSQL, indexes are built with
+  CREATE INDEX CONCURRENTLY (an index left INVALID by an interrupted build is
+  dropped and rebuilt) and one instance at a time runs this phase.
+
+Steps must be idempotent: a migration interrupted before it is recorded runs
+again from the start. Adding an index to a model means appending a
+background migration that runs build_model_indexes.
+
+Run all pending migrations to completion, or show their state:
+
+    cd backend && python migrations.py [status]
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+# Pause between backfill batches, leaving room for live writers
+MIGRATION_BATCH_PAUSE_SECONDS = float(os.getenv("MIGRATION_BATCH_PAUSE_SECONDS", "0.05"))
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "5000"))
+MIGRATION_LOCK_RETRIES = 5
+PROGRESS_LOG_INTERVAL = 5.0
+
+# pg_advisory_lock keys
+SCHEMA_LOCK_KEY = 7_420_001
+BACKGROUND_LOCK_KEY = 7_420_002
+
+# Column type SQLModel uses for uuid.UUID fields
+UUID_SQL = {"postgresql": "UUID", "sqlite": "CHAR(32)"}
+
+PRIORITY_RANK_SQL = "CASE lower(priority) WHEN 'high' THEN 2 WHEN 'low' THEN 0 ELSE 1 END"
+
+
+class MigrationInterrupted(Exception):
+    """The runner is shutting down; the migration resumes on the next start"""
+
+
+class Progress:
+    """Progress of the running migration, shared with stats()"""
+
+    def __init__(self, migration: "Migration", stopping: threading.Event):
+        self.migration = migration
+        self.stopping = stopping
+        self.done = 0
+        self.total: Optional[int] = None
+        self.unit = "rows scanned"
+        self.updated = 0
+        self._logged_at = time.monotonic()
+        self._statement_connection = None
+
+    def advance(self, scanned: int, updated: int):
+        self.done += scanned
+        self.updated += updated
+        if time.monotonic() - self._logged_at >= PROGRESS_LOG_INTERVAL:
+            self._logged_at = time.monotonic()
+            logger.info(f"Migration {self.migration.label}: {self.describe()}")
+
+    def check_stopping(self):
+        if self.stopping.is_set():
+            raise MigrationInterrupted()
+
+    @contextmanager
+    def interruptible(self, conn):
+        """Lets interrupt() abort the long statement run on conn inside this block"""
+        self._statement_connection = conn.connection.dbapi_connection
+        try:
+            yield
+        finally:
+            self._statement_connection = None
+
+    def interrupt(self):
+        connection = self._statement_connection
+        if connection is not None:
+            # psycopg2's cancel() and sqlite3's interrupt() are safe to call from another thread
+            cancel = getattr(connection, "cancel", None) or getattr(connection, "interrupt", None)
+            if cancel is not None:
+                cancel()
+
+    def describe(self) -> str:
+        percent = f" ({100 * self.done // self.total}%)" if self.total else ""
+        updated = f", {self.updated} updated" if self.unit == "rows scanned" else ""
+        return f"{self.done}/{self.total} {self.unit}{percent}{updated}"
+
+    def as_dict(self) -> dict:
+        return {"version": self.migration.version, "name": self.migration.name, "unit": self.unit,
+                "done": self.done, "total": self.total, "updated": self.updated}
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    phase: str  # "schema" or "background"
+    apply: Callable  # apply(engine, progress)
+    # Also run on a fresh database, for objects create_all doesn't know about
+    fresh: bool = False
+
+    @property
+    def label(self) -> str:
+        return f"{self.version} ({self.name})"
+
+
+# --- Building blocks ---
+
+def column_exists(engine, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def add_column(engine, table: str, column: str, definition: str) -> bool:
+    """
+    Nullable (or constant-default) ADD COLUMN: a catalog change on both
+    databases. False if the column already exists.
+    """
+    if column_exists(engine, table, column):
+        return False
+    exists = " IF NOT EXISTS" if engine.dialect.name == "postgresql" else ""
+    run_ddl(engine, [f"ALTER TABLE {table} ADD COLUMN{exists} {column} {definition}"])
+    logger.info(f"Added column {table}.{column}")
+    return True
+
+
+def run_ddl(engine, statements: List[str]):
+    """
+    Run short DDL statements in one transaction. On PostgreSQL, give up rather
+    than queue behind a long transaction while blocking everyone else, and retry.
+    """
+    postgres = engine.dialect.name == "postgresql"
+    for attempt in range(1, MIGRATION_LOCK_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                if postgres:
+                    conn.exec_driver_sql(f"SET LOCAL lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}")
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+            return
+        except OperationalError as e:
+            if attempt == MIGRATION_LOCK_RETRIES:
+                raise
+            logger.warning(f"{statements[0].splitlines()[0]} could not get its lock ({e.orig}); retrying")
+            time.sleep(attempt)
+
+
+def backfill(engine, progress: Progress, table: str, assignment: str, condition: str, params: dict = None):
+    """
+    UPDATE table SET assignment WHERE condition, MIGRATION_BATCH_SIZE rows per
+    transaction. Walks the primary key in order, so each batch is an index
+    range scan however much of the table is already done.
+    """
+    run_batched(engine, progress, table, f"UPDATE {table} SET {assignment} WHERE {{batch}} AND ({condition})", params)
+
+
+def run_batched(engine, progress: Progress, table: str, statement: str, params: dict = None):
+    """
+    Run statement once per MIGRATION_BATCH_SIZE rows of table, in id order, one
+    transaction each; its {batch} placeholder becomes the batch's id range.
+    Progress counts the rows the statement affected.
+    """
+    with engine.connect() as conn:
+        progress.total = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    last_id = None
+    while True:
+        progress.check_stopping()
+        lower = f"{table}.id > :last_id" if last_id is not None else "1 = 1"
+        with engine.begin() as conn:
+            # Last id of this batch; None when fewer than a batch remain
+            upper = conn.execute(
+                text(f"SELECT id FROM {table} WHERE {lower} ORDER BY id LIMIT 1 OFFSET :offset"),
+                {"last_id": last_id, "offset": MIGRATION_BATCH_SIZE - 1},
+            ).scalar()
+            upper_bound = f"{table}.id <= :upper" if upper is not None else "1 = 1"
+            result = conn.execute(
+                text(statement.format(batch=f"{lower} AND {upper_bound}")),
+                {**(params or {}), "last_id": last_id, "upper": upper},
+            )
+        if upper is None:
+            progress.advance(max(progress.total - progress.done, 0), max(result.rowcount, 0))
+            return
+        last_id = upper
+        progress.advance(MIGRATION_BATCH_SIZE, max(result.rowcount, 0))
+        if MIGRATION_BATCH_PAUSE_SECONDS:
+            time.sleep(MIGRATION_BATCH_PAUSE_SECONDS)
+
+
+def invalid_indexes(engine) -> set:
+    """PostgreSQL indexes left INVALID by an interrupted CREATE INDEX CONCURRENTLY"""
+    if engine.dialect.name != "postgresql":
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        )).scalars())
+
+
+def build_model_indexes(engine, progress: Progress):
+    """Create every index declared on the models that the database lacks"""
+    build_indexes(engine, progress, [index for table in SQLModel.metadata.sorted_tables for index in table.indexes])
+
+
+def build_indexes(engine, progress: Progress, indexes: list):
+    """Create the indexes (model Index objects) that the database lacks"""
+    postgres = engine.dialect.name == "postgresql"
+    inspector = inspect(engine)
+    invalid = invalid_indexes(engine)
+    existing = {}
+    missing = []
+    for index in indexes:
+        table = index.table.name
+        if table not in existing:
+            existing[table] = {i["name"] for i in inspector.get_indexes(table)} - invalid
+        if index.name not in existing[table]:
+            missing.append(index)
+    progress.unit = "indexes built"
+    progress.total = len(missing)
+
+    for index in missing:
+        progress.check_stopping()
+        started = time.monotonic()
+        if postgres:
+            # CONCURRENTLY can't run in a transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                if index.name in invalid:
+                    conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+                ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+                with progress.interruptible(conn):
+                    conn.exec_driver_sql(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl))
+        else:
+            with engine.begin() as conn:
+                with progress.interruptible(conn):
+                    index.create(conn, checkfirst=True)
+        progress.advance(1, 0)
+        logger.info(f"Built index {index.name} in {time.monotonic() - started:.1f}s")
+
+
+# --- Migrations (append only; never renumber) ---
+
+def _priority_and_due_date(engine, progress):
+    add_column(engine, "todo", "priority", "VARCHAR DEFAULT 'medium'")
+    add_column(engine, "todo", "due_date", "TIMESTAMP")
+
+
+def _title(engine, progress):
+    if not add_column(engine, "todo", "title", "VARCHAR(200)"):
+        return
+    # The API requires a title, so this backfill can't wait for the background phase
+    backfill(engine, progress, "todo", "title = description", "title IS NULL")
+
+
+def _recurrence_tags_reminder(engine, progress):
+    add_column(engine, "todo", "recurrence", "VARCHAR DEFAULT 'none'")
+    add_column(engine, "todo", "tags", "VARCHAR DEFAULT ''")
+    add_column(engine, "todo", "reminder_time", "TIMESTAMP")
+
+
+def _priority_rank(engine, progress):
+    # Nullable at first so unfilled rows are distinguishable during the backfill
+    add_column(engine, "todo", "priority_rank", "INTEGER")
+
+
+def _backfill_priority_rank(engine, progress):
+    # sort_by=priority pages on priority_rank, so NULLs can't wait for the background phase
+    backfill(engine, progress, "todo", f"priority_rank = {PRIORITY_RANK_SQL}", "priority_rank IS NULL")
+
+
+def _recurrence_parent_id(engine, progress):
+    # Existing rows stay NULL: NULLs never collide in the occurrence unique index
+    add_column(engine, "todo", "recurrence_parent_id", UUID_SQL[engine.dialect.name])
+
+
+def _reminder_sent_at(engine, progress):
+    if not add_column(engine, "todo", "reminder_sent_at", "TIMESTAMP"):
+        return
+    # Past reminders were handled by the old Dapr jobs; don't send them again.
+    # Runs before the reminder scheduler starts.
+    backfill(engine, progress, "todo", "reminder_sent_at = reminder_time",
+             "reminder_sent_at IS NULL AND reminder_time <= :now", {"now": datetime.utcnow()})
+
+
+def _updated_at(engine, progress):
+    add_column(engine, "todo", "updated_at", "TIMESTAMP")
+
+
+def _backfill_updated_at(engine, progress):
+    backfill(engine, progress, "todo", "updated_at = created_at", "updated_at IS NULL")
+
+
+def _backfill_message_tool_calls(engine, progress):
+    # Rows for messages written before message_tool_call existed. Chat turns write
+    # their own meanwhile; the unique (message_id, position) index skips those.
+    if engine.dialect.name == "postgresql":
+        elements = "jsonb_array_elements_text(message.tool_calls::jsonb) WITH ORDINALITY AS tc(value, ordinality)"
+        position, is_array = "tc.ordinality - 1", "left(message.tool_calls, 1) = '['"
+    else:
+        elements = "json_each(message.tool_calls) AS tc"
+        position, is_array = "tc.key", "json_valid(message.tool_calls)"
+    run_batched(engine, progress, "message", f"""
+        INSERT INTO message_tool_call (message_id, user_id, tool, position, created_at)
+        SELECT message.id, message.user_id, tc.value, {position}, message.created_at
+        FROM message, {elements}
+        WHERE {{batch}} AND message.tool_calls IS NOT NULL AND {is_array}
+        ON CONFLICT (message_id, position) DO NOTHING
+    """)
+
+
+def _recurrence_occurrence_index(engine, progress):
+    # The occurrence guard must exist before events are handled, not after the
+    # background phase reaches it. Instances duplicated while it was missing are
+    # deleted first (keeping a completed one), or the unique build would fail.
+    from models import Todo, record_tombstones, bump_data_version
+    index = next(i for i in Todo.__table__.indexes if i.name == "ux_todo_recurrence_occurrence")
+    if index.name in {i["name"] for i in inspect(engine).get_indexes("todo")}:
+        return
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM todo WHERE recurrence_parent_id IS NOT NULL LIMIT 1")).first() is None:
+            duplicates = []  # No instances yet (e.g. migration 6 just added the column)
+        else:
+            duplicates = conn.execute(text("""
+                SELECT id, user_id FROM (
+                    SELECT id, user_id, ROW_NUMBER() OVER (
+                        PARTITION BY recurrence_parent_id, due_date ORDER BY is_completed DESC, created_at, id
+                    ) AS n
+                    FROM todo WHERE recurrence_parent_id IS NOT NULL AND due_date IS NOT NULL
+                ) AS occurrence WHERE n > 1
+            """).columns(Todo.__table__.c.id, Todo.__table__.c.user_id)).all()
+        by_user = {}
+        for todo_id, user_id in duplicates:
+            by_user.setdefault(user_id, []).append(todo_id)
+        for user_id, todo_ids in by_user.items():
+            conn.execute(Todo.__table__.delete().where(Todo.__table__.c.id.in_(todo_ids)))
+            record_tombstones(conn, user_id, todo_ids)
+            bump_data_version(conn, user_id, "todos")
+    if duplicates:
+        logger.info(f"Deleted {len(duplicates)} duplicate recurring task instances")
+    build_indexes(engine, progress, [index])
+
+
+def _legacy_recurrence_series(engine, progress):
+    # Recurring tasks written before recurrence_series were continued by the old
+    # completion handler; a finished series row keeps the sweeper off them
+    # (recurrence.LEGACY_SERIES_MIGRATION). Completing one still materializes.
+    run_batched(engine, progress, "todo", """
+        INSERT INTO recurrence_series (root_id, materialized_through, finished, updated_at)
+        SELECT todo.id, todo.due_date, TRUE, :now FROM todo
+        WHERE {batch} AND todo.recurrence_parent_id IS NULL AND todo.due_date IS NOT NULL
+            AND todo.recurrence IS NOT NULL AND todo.recurrence NOT IN ('', 'none')
+        ON CONFLICT (root_id) DO NOTHING
+    """, {"now": datetime.utcnow()})
+
+
+# PostgreSQL full-text search (search.PostgresFTSBackend). A trigger keeps the
+# column current instead of GENERATED ... STORED, whose ADD COLUMN rewrites
+# the table under an exclusive lock.
+SEARCH_VECTOR_SQL = "to_tsvector('simple', coalesce({row}title, '') || ' ' || coalesce({row}description, ''))"
+
+
+def _search_vector_generated(engine) -> bool:
+    # Databases where an earlier release added search_vector as a generated column
+    with engine.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT attgenerated <> '' FROM pg_attribute WHERE attrelid = 'todo'::regclass AND attname = 'search_vector'"
+        )).scalar())
+
+
+def _search_vector(engine, progress):
+    if engine.dialect.name != "postgresql":
+        return
+    add_column(engine, "todo", "search_vector", "tsvector")
+    if _search_vector_generated(engine):
+        return
+    run_ddl(engine, [
+        f"""CREATE OR REPLACE FUNCTION todo_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_SQL.format(row="NEW.")};
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS todo_search_vector ON todo",
+        """CREATE TRIGGER todo_search_vector BEFORE INSERT OR UPDATE OF title, description ON todo
+        FOR EACH ROW EXECUTE FUNCTION todo_search_vector()""",
+    ])
+
+
+def _backfill_search_vector(engine, progress):
+    if engine.dialect.name != "postgresql" or _search_vector_generated(engine):
+        return
+    backfill(engine, progress, "todo", f"search_vector = {SEARCH_VECTOR_SQL.format(row='')}", "search_vector IS NULL")
+
+
+def _search_vector_index(engine, progress):
+    if engine.dialect.name != "postgresql":
+        return
+    progress.unit = "indexes built"
+    progress.total = 1
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if "ix_todo_search_vector" in invalid_indexes(engine):
+            conn.exec_driver_sql("DROP INDEX CONCURRENTLY IF EXISTS ix_todo_search_vector")
+        with progress.interruptible(conn):
+            conn.exec_driver_sql("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_todo_search_vector ON todo USING GIN (search_vector)")
+    progress.advance(1, 0)
+
+
+def _clear_message_tool_calls(engine, progress):
+    # message_tool_call is the only copy from here on (migration 13 filled it)
+    backfill(engine, progress, "message", "tool_calls = NULL", "tool_calls IS NOT NULL")
+
+
+MIGRATIONS = [
+    Migration(1, "todo.priority, todo.due_date", "schema", _priority_and_due_date),
+    Migration(2, "todo.title", "schema", _title),
+    Migration(3, "todo.recurrence, todo.tags, todo.reminder_time", "schema", _recurrence_tags_reminder),
+    Migration(4, "todo.priority_rank", "schema", _priority_rank),
+    Migration(5, "backfill todo.priority_rank", "schema", _backfill_priority_rank),
+    Migration(6, "todo.recurrence_parent_id", "schema", _recurrence_parent_id),
+    Migration(7, "todo.reminder_sent_at", "schema", _reminder_sent_at),
+    Migration(8, "todo.updated_at", "schema", _updated_at),
+    Migration(9, "backfill todo.updated_at", "background", _backfill_updated_at),
+    Migration(10, "model indexes", "background", build_model_indexes),
+    Migration(11, "ix_todo_user_completed_created_id", "background", build_model_indexes),
+    Migration(12, "ix_conversation_user_updated_id, ix_message_conversation_created_id", "background", build_model_indexes),
+    Migration(13, "backfill message_tool_call", "background", _backfill_message_tool_calls),
+    Migration(14, "ux_todo_recurrence_occurrence", "schema", _recurrence_occurrence_index),
+    Migration(15, "recurrence_series for legacy recurring tasks", "background", _legacy_recurrence_series),
+    Migration(16, "todo.search_vector", "schema", _search_vector, fresh=True),
+    Migration(17, "backfill todo.search_vector", "background", _backfill_search_vector),
+    Migration(18, "ix_todo_search_vector", "background", _search_vector_index, fresh=True),
+    Migration(19, "clear message.tool_calls", "background", _clear_message_tool_calls),
+]
+
+
+class MigrationRunner:
+    """Applies MIGRATIONS: the schema phase inline, the background phase in a task"""
+
+    def __init__(self, migrations: List[Migration] = MIGRATIONS):
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = threading.Event()
+        self.applied: set = set()
+        self.progress: Optional[Progress] = None
+        self.failed: Optional[str] = None
+
+    def _applied_versions(self, engine) -> set:
+        from models import SchemaMigration
+        with engine.connect() as conn:
+            return set(conn.execute(SchemaMigration.__table__.select().with_only_columns(SchemaMigration.version)).scalars())
+
+    def _record(self, engine, migrations: List[Migration]):
+        from models import SchemaMigration
+        now = datetime.utcnow()
+        for migration in migrations:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(SchemaMigration.__table__.insert().values(
+                        version=migration.version, name=migration.name, applied_at=now,
+                    ))
+            except IntegrityError:
+                pass  # Recorded by another process meanwhile (SQLite has no advisory lock)
+            self.applied.add(migration.version)
+
+    def is_applied(self, version: int) -> bool:
+        return version in self.applied
+
+    def pending(self, phase: Optional[str] = None) -> List[Migration]:
+        return [m for m in self.migrations if m.version not in self.applied and phase in (None, m.phase)]
+
+    def _apply(self, engine, migration: Migration):
+        self.progress = Progress(migration, self._stopping)
+        started = time.monotonic()
+        logger.info(f"Applying migration {migration.label}")
+        migration.apply(engine, self.progress)
+        self._record(engine, [migration])
+        logger.info(f"Applied migration {migration.label} in {time.monotonic() - started:.1f}s"
+                    + (f": {self.progress.describe()}" if self.progress.total is not None else ""))
+        self.progress = None
+
+    def migrate_schema(self, engine):
+        """Create missing tables and apply the pending schema migrations"""
+        import models  # Registers every table
+        fresh = not inspect(engine).has_table("todo")
+        SQLModel.metadata.create_all(engine)
+        with advisory_lock(engine, SCHEMA_LOCK_KEY, wait=True):
+            self.applied = self._applied_versions(engine)
+            if fresh:
+                # create_all built the current schema, except what fresh migrations add
+                for migration in self.pending():
+                    if migration.fresh:
+                        self._apply(engine, migration)
+                self._record(engine, self.pending())
+                return
+            for migration in self.pending("schema"):
+                self._apply(engine, migration)
+
+    def run_background(self, engine):
+        """Apply the pending background migrations (blocking)"""
+        if not self.pending("background"):
+            return
+        with advisory_lock(engine, BACKGROUND_LOCK_KEY, wait=False) as acquired:
+            if not acquired:
+                logger.info("Another instance is running the background migrations")
+                return
+            self.applied = self._applied_versions(engine)
+            for migration in self.pending("background"):
+                self._apply(engine, migration)
+
+    async def start(self, engine):
+        if self._task is None and self.pending("background"):
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def close(self):
+        if self._task is not None:
+            # Backfills stop between batches, index builds are cancelled
+            self._stopping.set()
+            if self.progress is not None:
+                self.progress.interrupt()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, engine):
+        try:
+            await asyncio.to_thread(self.run_background, engine)
+            logger.info("Background migrations finished")
+        except Exception as e:
+            if self._stopping.is_set():
+                # MigrationInterrupted, or the cancelled index build
+                logger.info("Background migrations interrupted; they resume on the next start")
+            else:
+                self.failed = f"{self.progress.migration.label if self.progress else ''}: {e}"
+                logger.error(f"Background migration failed: {self.failed}")
+        finally:
+            self.progress = None
+
+    def stats(self) -> dict:
+        progress = self.progress
+        return {
+            "applied": len(self.applied),
+            "pending": [m.label for m in self.pending()],
+            "running": progress.as_dict() if progress else None,
+            "failed": self.failed,
+        }
+
+
+class advisory_lock:
+    """
+    PostgreSQL session advisory lock held on its own autocommit connection
+    (an open transaction would make CREATE INDEX CONCURRENTLY wait on it).
+    Always "acquired" on other databases.
+    """
+
+    def __init__(self, engine, key: int, wait: bool):
+        self.engine = engine
+        self.key = key
+        self.wait = wait
+        self.conn = None
+
+    def __enter__(self) -> bool:
+        if self.engine.dialect.name != "postgresql":
+            return True
+        self.conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if self.wait:
+            self.conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": self.key})
+            return True
+        if self.conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar():
+            return True
+        self.conn.close()
+        self.conn = None
+        return False
+
+    def __exit__(self, *exc):
+        if self.conn is not None:
+            self.conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self.conn.close()
+
+
+# Singleton instance
+migration_runner = MigrationRunner()
+
+
+if __name__ == "__main__":
+    import sys
+    from database import engine
+
+    if not engine:
+        raise RuntimeError("DATABASE_URL is not set")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if sys.argv[1:] == ["status"]:
+        migration_runner.applied = migration_runner._applied_versions(engine) if inspect(engine).has_table("schema_migration") else set()
+        for migration in migration_runner.migrations:
+            state = "applied" if migration.version in migration_runner.applied else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.phase:<11} {migration.name}")
+    else:
+        migration_runner.migrate_schema(engine)
+        migration_runner.run_background(engine)
+        print("Migrations finished!")
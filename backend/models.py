@@ -1,6 +1,9 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import Index, event, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session, Session as SASession
+from typing import Optional, List, Dict, Any
+from datetime import date, datetime
 import uuid
 import json
 
@@ -20,7 +23,7 @@ class Session(SQLModel, table=True):
     id: str = Field(primary_key=True)
     userId: str = Field(foreign_key="user.id")
     expiresAt: datetime
-    token: str
+    token: str = Field(index=True)
     createdAt: datetime
     updatedAt: datetime
     ipAddress: Optional[str] = None
@@ -38,12 +41,59 @@ class TodoBase(SQLModel):
     tags: Optional[str] = Field(default="")  # Comma-separated tags
     reminder_time: Optional[datetime] = None
 
+# Integer ranks so priority sorts correctly (high > medium > low) and can use an index
+PRIORITY_RANKS = {"low": 0, "medium": 1, "high": 2}
+
+def priority_rank(priority: Optional[str]) -> int:
+    return PRIORITY_RANKS.get((priority or "medium").lower(), PRIORITY_RANKS["medium"])
+
 # Todo Table (Managed by Python Backend)
 class Todo(TodoBase, table=True):
+    # Covering index for the stats aggregate (GROUP BY is_completed, priority per user)
+    __table_args__ = (
+        Index("ix_todo_user_completed_priority", "user_id", "is_completed", "priority"),
+        # Keyset pagination: (sort column, id) per user
+        Index("ix_todo_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_todo_user_due_id", "user_id", "due_date", "id"),
+        Index("ix_todo_user_priority_rank", "user_id", "priority_rank", "created_at", "id"),
+        # Pending tasks in creation order (list_tasks, chat's "complete the first/last task")
+        Index("ix_todo_user_completed_created_id", "user_id", "is_completed", "created_at", "id"),
+        # Delta sync: rows changed since a token, per user
+        Index("ix_todo_user_updated_id", "user_id", "updated_at", "id"),
+        # At most one instance of a recurring series per occurrence date
+        Index("ux_todo_recurrence_occurrence", "recurrence_parent_id", "due_date", unique=True),
+        # Reminder scheduler: pending reminders in (reminder_time, id) order
+        Index("ix_todo_reminder_pending", "is_completed", "reminder_sent_at", "reminder_time", "id"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     # specific user_id to link with User table
     user_id: str = Field(foreign_key="user.id", index=True) 
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped on every ORM update; bulk UPDATEs must set it themselves
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Derived from priority on every insert/update; not part of the API
+    priority_rank: int = Field(default=PRIORITY_RANKS["medium"])
+    # First task of the recurring series this instance was generated from (None for originals)
+    recurrence_parent_id: Optional[uuid.UUID] = Field(default=None)
+    # Set when the reminder was published; reset whenever reminder_time changes
+    reminder_sent_at: Optional[datetime] = Field(default=None)
+
+@event.listens_for(Todo, "before_insert")
+@event.listens_for(Todo, "before_update")
+def _sync_priority_rank(mapper, connection, target: Todo):
+    target.priority_rank = priority_rank(target.priority)
+
+@event.listens_for(Todo, "before_update")
+def _touch_updated_at(mapper, connection, target: Todo):
+    session = object_session(target)
+    if session is None or session.is_modified(target, include_collections=False):
+        target.updated_at = datetime.utcnow()
+
+@event.listens_for(Todo, "after_delete")
+def _record_tombstone(mapper, connection, target: Todo):
+    # Delta sync needs to tell clients about deletes; bulk DELETEs add their own tombstones
+    record_tombstones(connection, target.user_id, [target.id])
 
 class TodoCreate(TodoBase):
     pass
@@ -61,9 +111,45 @@ class TodoUpdate(SQLModel):
 class TodoRead(TodoBase):
     id: uuid.UUID
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+# Batch Schemas
+class TodoBatchOperation(SQLModel):
+    op: str  # "create" | "update" | "delete"
+    id: Optional[uuid.UUID] = None  # Required for update/delete
+    data: Optional[Dict[str, Any]] = None  # TodoCreate fields (create) or TodoUpdate fields (update)
+
+class TodoBatchRequest(SQLModel):
+    operations: List[TodoBatchOperation]
+
+class TodoBatchItemResult(SQLModel):
+    index: int
+    op: str
+    status: str  # "ok" | "error"
+    id: Optional[uuid.UUID] = None
+    todo: Optional[TodoRead] = None
+    detail: Optional[str] = None
+
+class TodoBatchResponse(SQLModel):
+    results: List[TodoBatchItemResult]
+
+class TodoPage(SQLModel):
+    items: List[TodoRead]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
+
+class TodoChanges(SQLModel):
+    items: List[TodoRead]  # Created or updated since the token; apply as upserts
+    deleted: List[uuid.UUID]  # Deleted since the token
+    next_token: str  # Pass back as ?since= on the next poll
+    has_more: bool  # Poll again right away with next_token
 
 # Conversation Table (For AI Chat)
 class Conversation(SQLModel, table=True):
+    # Keyset pagination: a user's conversations, most recently active first
+    __table_args__ = (
+        Index("ix_conversation_user_updated_id", "user_id", "updated_at", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="user.id", index=True)
     title: str = Field(default="New Conversation", max_length=200)
@@ -72,13 +158,161 @@ class Conversation(SQLModel, table=True):
 
 # Message Table (For Chat History)
 class Message(SQLModel, table=True):
+    # Keyset pagination and export: a conversation's messages in order
+    __table_args__ = (
+        Index("ix_message_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     user_id: str = Field(foreign_key="user.id", index=True)
     conversation_id: int = Field(foreign_key="conversation.id", index=True)
     role: str = Field(max_length=20)  # "user" | "assistant" | "system"
     content: str
-    tool_calls: Optional[str] = None  # JSON array of tool names
+    # Legacy JSON array of tool names; MessageToolCall holds them now (migration 13 copies, 19 clears)
+    tool_calls: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Message Tool Call Table (one row per tool an assistant message called, for analytics)
+class MessageToolCall(SQLModel, table=True):
+    __tablename__ = "message_tool_call"
+    __table_args__ = (
+        # Also what the tool-call backfill's ON CONFLICT needs
+        Index("ux_message_tool_call_message_position", "message_id", "position", unique=True),
+        # Calls of a tool per user over time (tool usage per day)
+        Index("ix_message_tool_call_user_tool_created", "user_id", "tool", "created_at"),
+    )
+
+    id: int = Field(default=None, primary_key=True)
+    message_id: int = Field(foreign_key="message.id")
+    user_id: str = Field(foreign_key="user.id")
+    tool: str = Field(max_length=50)
+    position: int = 0  # Index in the message's tool_calls
+    created_at: datetime = Field(default_factory=datetime.utcnow)  # The message's
+
+# Outbox Table (task-events written in the same transaction as the change)
+class OutboxEvent(SQLModel, table=True):
+    __tablename__ = "outbox_event"
+    # Relay scan: undelivered rows that are due, oldest first
+    __table_args__ = (
+        Index("ix_outbox_event_pending", "published_at", "next_attempt_at", "id"),
+    )
+
+    id: int = Field(default=None, primary_key=True)
+    # Stable across retries; sent as the bulk-publish entryId and in the event body
+    event_id: str = Field(default_factory=lambda: str(uuid.uuid4()), unique=True)
+    pubsub_name: str = Field(default="pubsub")
+    topic: str
+    payload: str  # JSON event body
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    published_at: Optional[datetime] = None
+
+# Recurrence Series Table (how far each recurring series has been materialized)
+class RecurrenceSeries(SQLModel, table=True):
+    __tablename__ = "recurrence_series"
+
+    root_id: uuid.UUID = Field(primary_key=True)  # First task of the series
+    materialized_through: datetime  # Latest occurrence generated so far
+    finished: bool = Field(default=False)  # Rule exhausted (COUNT/UNTIL) or invalid
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Todo Tombstone Table (deleted todo ids, kept for delta sync clients)
+class TodoTombstone(SQLModel, table=True):
+    __tablename__ = "todo_tombstone"
+    __table_args__ = (
+        Index("ix_todo_tombstone_user_deleted", "user_id", "deleted_at", "todo_id"),
+    )
+
+    todo_id: uuid.UUID = Field(primary_key=True)
+    user_id: str = Field(foreign_key="user.id")
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Schema Migration Table (versions applied by migrations.py)
+class SchemaMigration(SQLModel, table=True):
+    __tablename__ = "schema_migration"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Processed Event Table (dedupe store for at-least-once event consumers)
+class ProcessedEvent(SQLModel, table=True):
+    __tablename__ = "processed_event"
+
+    event_id: str = Field(primary_key=True)
+    processed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+# User Data Version Table (per-user change counters behind the ETags of read endpoints)
+class UserDataVersion(SQLModel, table=True):
+    __tablename__ = "user_data_version"
+
+    user_id: str = Field(primary_key=True, foreign_key="user.id")
+    todos_version: int = Field(default=0)  # Todos and everything derived from them (stats)
+    chat_version: int = Field(default=0)  # Conversations and messages
+
+DATA_VERSION_SCOPES = {"todos": "todos_version", "chat": "chat_version"}
+
+def bump_data_version(connection, user_id: str, scope: str):
+    """Increment a user's version counter in the caller's transaction"""
+    from database import read_router
+    # The user's next reads go to the primary, which has this write
+    read_router.mark_write(user_id)
+    table = UserDataVersion.__table__
+    column = table.c[DATA_VERSION_SCOPES[scope]]
+    result = connection.execute(update(table).where(table.c.user_id == user_id).values({column: column + 1}))
+    if result.rowcount:
+        return
+    # First change for this user; concurrent first changes meet in the upsert
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(connection.dialect.name)
+    if dialect is None:
+        connection.execute(insert(table).values({"user_id": user_id, column.name: 1}))
+    else:
+        connection.execute(
+            dialect.insert(table).values({"user_id": user_id, column.name: 1})
+            .on_conflict_do_update(index_elements=[table.c.user_id], set_={column.name: column + 1})
+        )
+
+def record_tombstones(connection, user_id: str, todo_ids: list):
+    """
+    Add tombstones for deleted todos in the caller's transaction. An upsert, so
+    two requests racing to delete the same todo both succeed.
+    """
+    if not todo_ids:
+        return
+    table = TodoTombstone.__table__
+    now = datetime.utcnow()
+    rows = [{"todo_id": todo_id, "user_id": user_id, "deleted_at": now} for todo_id in todo_ids]
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(connection.dialect.name)
+    if dialect is None:
+        connection.execute(insert(table), rows)
+    else:
+        statement = dialect.insert(table)
+        connection.execute(
+            statement.on_conflict_do_update(index_elements=[table.c.todo_id], set_={"deleted_at": statement.excluded.deleted_at}),
+            rows,
+        )
+
+# ORM writes bump the versions here, once per user and scope per transaction (a chat turn
+# writes several rows); bulk statements call bump_data_version themselves
+_DATA_VERSION_SCOPE_OF = {Todo: "todos", Conversation: "chat", Message: "chat"}
+_BUMPED_KEY = "data_versions_bumped"
+
+@event.listens_for(SASession, "after_flush")
+def _bump_data_versions(session, flush_context):
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    # Still the pre-flush state here: what this flush inserted, updated and deleted
+    for target in (*session.new, *session.dirty, *session.deleted):
+        scope = _DATA_VERSION_SCOPE_OF.get(type(target))
+        if scope and (target.user_id, scope) not in bumped:
+            bumped.add((target.user_id, scope))
+            bump_data_version(session.connection(), target.user_id, scope)
+
+@event.listens_for(SASession, "after_commit")
+@event.listens_for(SASession, "after_rollback")
+def _reset_bumped_data_versions(session):
+    session.info.pop(_BUMPED_KEY, None)
 
 # Chat Schemas
 class MessageCreate(SQLModel):
@@ -98,6 +332,19 @@ class MessageRead(SQLModel):
     tool_calls: Optional[List[str]] = None
     created_at: datetime
 
+class ToolUsage(SQLModel):
+    day: date
+    tool: str
+    count: int
+
+class ConversationPage(SQLModel):
+    items: List[ConversationRead]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
+
+class MessagePage(SQLModel):
+    items: List[MessageRead]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
+
 class ChatRequest(SQLModel):
     conversation_id: Optional[int] = None
     message: str
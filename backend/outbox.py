@@ -0,0 +1,283 @@
+"""
+Transactional Outbox
+
+Task events are staged in the outbox_event table by add_event(), in the same
+transaction as the Todo change, so an event exists if and only if the change
+was committed. OutboxRelay drains the table in the background and publishes
+each batch to Dapr with one bulk-publish request per topic:
+
+- At-least-once: a row is marked published only after Dapr accepts it, so
+  consumers may see duplicates; every event carries its event_id for dedupe.
+- Failed rows are retried with exponential backoff and jitter, indefinitely,
+  so a sidecar restart delays events instead of dropping them.
+- Rows are claimed with a lease (plus SKIP LOCKED on PostgreSQL), so several
+  app instances can relay from the same table and a crashed relay's rows
+  become due again when the lease runs out.
+- Published rows are deleted after OUTBOX_RETENTION_HOURS.
+- In-process consumers (the change stream) can register with
+  add_commit_listener() to see events as soon as their transaction commits.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event as sa_event, func, update
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from dapr_client import dapr
+from database import engine
+from models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+OUTBOX_CLEANUP_INTERVAL_SECONDS = float(os.getenv("OUTBOX_CLEANUP_INTERVAL_SECONDS", "600"))
+OUTBOX_FLUSH_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_FLUSH_TIMEOUT_SECONDS", "10"))
+
+_LATENCY_SAMPLES = 1000
+
+_commit_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+_STAGED_KEY = "outbox_staged_events"
+
+
+def add_event(session: Session, topic: str, data: Dict[str, Any], pubsub_name: str = "pubsub") -> OutboxEvent:
+    """Stage an event in the caller's transaction; it is relayed after commit"""
+    event = OutboxEvent(pubsub_name=pubsub_name, topic=topic, payload="")
+    data = {**data, "event_id": event.event_id}
+    event.payload = json.dumps(data, default=str)
+    session.add(event)
+    if _commit_listeners:
+        session.info.setdefault(_STAGED_KEY, []).append((topic, data))
+    return event
+
+
+def add_events(session: Session, topic: str, events: List[Dict[str, Any]], pubsub_name: str = "pubsub"):
+    for data in events:
+        add_event(session, topic, data, pubsub_name)
+
+
+def add_commit_listener(callback: Callable[[str, Dict[str, Any]], None]):
+    """
+    Call callback(topic, data) in-process for every event whose transaction
+    committed, before the relay publishes it (used for local fan-out)
+    """
+    _commit_listeners.append(callback)
+
+
+@sa_event.listens_for(SASession, "after_commit")
+def _notify_commit_listeners(session):
+    for topic, data in session.info.pop(_STAGED_KEY, ()):
+        for callback in _commit_listeners:
+            try:
+                callback(topic, data)
+            except Exception as e:
+                logger.error(f"Outbox commit listener failed: {e}")
+
+
+@sa_event.listens_for(SASession, "after_rollback")
+def _discard_staged(session):
+    session.info.pop(_STAGED_KEY, None)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds until the next attempt: exponential backoff with jitter"""
+    delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 2)
+
+
+class OutboxRelay:
+    """Background task publishing committed outbox rows to Dapr"""
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_cleanup = time.monotonic()
+        self.published = 0
+        self.failed_attempts = 0
+        # Milliseconds per bulk-publish request, and from commit to publish
+        self._publish_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self._lag_ms = deque(maxlen=_LATENCY_SAMPLES)
+
+    async def start(self):
+        """Start relaying on the running loop; call once from the app lifespan"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Outbox relay started")
+
+    async def close(self, timeout: float = OUTBOX_FLUSH_TIMEOUT_SECONDS):
+        """Stop the relay after one last drain (up to timeout seconds)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Outbox drain timed out; remaining events are relayed on next start")
+        except Exception as e:
+            logger.error(f"Outbox drain failed: {e}")
+        self._task = None
+        self._loop = None
+        logger.info("Outbox relay stopped")
+
+    def notify(self):
+        """Wake the relay after committing outbox rows; safe to call from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            # Cleared before the scan, so a notify() that lands mid-scan triggers another one
+            self._wakeup.clear()
+            try:
+                claimed = await self.relay_once()
+                if time.monotonic() - self._last_cleanup >= OUTBOX_CLEANUP_INTERVAL_SECONDS:
+                    await asyncio.to_thread(self.cleanup)
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _drain(self):
+        while await self.relay_once() >= self.batch_size:
+            pass
+
+    async def relay_once(self) -> int:
+        """Claim, publish and settle one batch; returns the number of rows claimed"""
+        rows = await asyncio.to_thread(self._claim)
+        if not rows:
+            return 0
+
+        groups = {}
+        for row in rows:
+            groups.setdefault((row.pubsub_name, row.topic), []).append(row)
+
+        published, failed = [], []
+        for (pubsub_name, topic), group in groups.items():
+            start = time.monotonic()
+            failed_ids = set(await dapr.publish_events_bulk(
+                pubsub_name, topic,
+                [json.loads(row.payload) for row in group],
+                entry_ids=[row.event_id for row in group],
+            ))
+            self._publish_ms.append((time.monotonic() - start) * 1000)
+            for row in group:
+                (failed if row.event_id in failed_ids else published).append(row)
+
+        await asyncio.to_thread(self._settle, published, failed)
+        return len(rows)
+
+    def _claim(self) -> list:
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            statement = (
+                select(
+                    OutboxEvent.id, OutboxEvent.event_id, OutboxEvent.pubsub_name, OutboxEvent.topic,
+                    OutboxEvent.payload, OutboxEvent.attempts, OutboxEvent.created_at,
+                )
+                .where(OutboxEvent.published_at == None, OutboxEvent.next_attempt_at <= now)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = session.exec(statement).all()
+            if rows:
+                # Lease the rows so no other relay picks them up while they are in flight
+                session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_([row.id for row in rows]))
+                    .values(next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+                )
+                session.commit()
+            return rows
+
+    def _settle(self, published: list, failed: list):
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            if published:
+                session.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id.in_([row.id for row in published]))
+                    .values(published_at=now, attempts=OutboxEvent.attempts + 1, last_error=None)
+                )
+            if failed:
+                session.execute(update(OutboxEvent), [
+                    {
+                        "id": row.id,
+                        "attempts": row.attempts + 1,
+                        "next_attempt_at": now + timedelta(seconds=retry_delay(row.attempts + 1)),
+                        "last_error": "Dapr publish failed",
+                    }
+                    for row in failed
+                ])
+            session.commit()
+
+        self.published += len(published)
+        self.failed_attempts += len(failed)
+        self._lag_ms.extend((now - row.created_at).total_seconds() * 1000 for row in published)
+        if failed:
+            logger.error(f"Outbox: {len(failed)} events failed to publish, will retry")
+
+    def cleanup(self) -> int:
+        """Delete rows published more than OUTBOX_RETENTION_HOURS ago"""
+        cutoff = datetime.utcnow() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+        with Session(engine) as session:
+            result = session.execute(delete(OutboxEvent).where(OutboxEvent.published_at < cutoff))
+            session.commit()
+        self._last_cleanup = time.monotonic()
+        if result.rowcount:
+            logger.info(f"Outbox: deleted {result.rowcount} published events")
+        return result.rowcount
+
+    def stats(self) -> dict:
+        with Session(engine) as session:
+            pending, oldest = session.exec(
+                select(func.count(), func.min(OutboxEvent.created_at)).where(OutboxEvent.published_at == None)
+            ).one()
+        return {
+            "running": self._task is not None,
+            "pending": pending,
+            "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None,
+            "published": self.published,
+            "failed_attempts": self.failed_attempts,
+            "publish_ms_p50": _percentile(self._publish_ms, 0.50),
+            "publish_ms_p99": _percentile(self._publish_ms, 0.99),
+            "commit_to_publish_ms_p50": _percentile(self._lag_ms, 0.50),
+            "commit_to_publish_ms_p99": _percentile(self._lag_ms, 0.99),
+        }
+
+
+# Singleton instance
+outbox_relay = OutboxRelay()
@@ -0,0 +1,120 @@
+"""
+Keyset (Cursor) Pagination
+
+Helpers for paging through ordered queries without OFFSET. A sort is a list
+of SortKey columns ending in a unique tiebreaker (usually the primary key);
+the cursor is an opaque, URL-safe encoding of the last row's key values.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List
+
+from sqlalchemy import and_, or_, false
+
+
+@dataclass(frozen=True)
+class SortKey:
+    column: Any
+    descending: bool = False
+    nullable: bool = False  # NULLs always sort last
+
+
+def apply_sort(statement, keys: List[SortKey]):
+    """Order a statement by the sort keys"""
+    clauses = []
+    for key in keys:
+        clause = key.column.desc() if key.descending else key.column.asc()
+        if key.nullable:
+            clause = clause.nulls_last()
+        clauses.append(clause)
+    return statement.order_by(*clauses)
+
+
+def apply_keyset(statement, keys: List[SortKey], values: list):
+    """Restrict a statement to rows strictly after the cursor position"""
+    conditions = []
+    for i, key in enumerate(keys):
+        after = _after(key, values[i])
+        equal_prefix = [_equal(k, v) for k, v in zip(keys[:i], values[:i])]
+        conditions.append(and_(*equal_prefix, after))
+    statement = statement.where(or_(*conditions))
+
+    # Planners (SQLite in particular) can't turn the OR into an index range; a
+    # redundant bound on the leading key lets them seek instead of scanning
+    first = keys[0]
+    if values[0] is not None and not first.nullable:
+        bound = first.column <= values[0] if first.descending else first.column >= values[0]
+        statement = statement.where(bound)
+    return statement
+
+
+def _after(key: SortKey, value):
+    if value is None:
+        # Nothing sorts after NULL when NULLs are last
+        return false()
+    condition = key.column < value if key.descending else key.column > value
+    if key.nullable:
+        condition = or_(condition, key.column.is_(None))
+    return condition
+
+
+def _equal(key: SortKey, value):
+    return key.column.is_(None) if value is None else key.column == value
+
+
+def cursor_values(row, keys: List[SortKey]) -> list:
+    """Read the sort key values off the last row of a page"""
+    return [getattr(row, key.column.key) for key in keys]
+
+
+def encode_cursor(sort_by: str, values: list) -> str:
+    payload = json.dumps({"s": sort_by, "v": [_dump(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, keys: List[SortKey]) -> list:
+    """
+    Decode a cursor for the sort keys, raising ValueError if it is malformed,
+    for another sort, or its values don't fit the keys' columns
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort_by:
+            raise ValueError("Cursor was issued for a different sort order")
+        if not isinstance(payload["v"], list) or len(payload["v"]) != len(keys):
+            raise ValueError("Cursor doesn't match the sort keys")
+        values = [_load(v) for v in payload["v"]]
+    except (KeyError, TypeError, json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    for key, value in zip(keys, values):
+        if value is None:
+            if not key.nullable:
+                raise ValueError(f"Invalid cursor: {key.column.key} can't be null")
+        elif type(value) is not key.column.type.python_type:
+            # type(), so a bool doesn't pass for an int
+            raise ValueError(f"Invalid cursor: wrong type for {key.column.key}")
+    return values
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"uuid": str(value)}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "uuid" in value:
+            return uuid.UUID(value["uuid"])
+        raise ValueError("Unknown cursor value")
+    return value
@@ -0,0 +1,514 @@
+"""
+Recurring Tasks
+
+Rule engine plus materialization of upcoming occurrences.
+
+Todo.recurrence holds either a legacy keyword ("daily", "weekly", "monthly",
+"yearly", "none") or an RRULE subset:
+
+    FREQ=DAILY|WEEKLY|MONTHLY|YEARLY   (required)
+    INTERVAL=n                         every n days/weeks/months/years
+    BYDAY=MO,WE,FR                     weekdays (DAILY, WEEKLY, MONTHLY)
+    BYDAY=1MO / -1FR                   nth weekday of the month (MONTHLY)
+    BYMONTHDAY=15 / 31 / -1            day of month (MONTHLY); days past the
+                                       end of a short month clamp to its last day
+    COUNT=n / UNTIL=YYYYMMDD[THHMMSSZ] end of the series (COUNT includes the first task)
+
+A series is anchored on its first task's due date (dtstart), so monthly
+series starting on the 31st land on the last day of shorter months and
+return to the 31st afterwards instead of drifting. All datetimes are naive
+UTC, like the rest of the schema.
+
+Occurrences are materialized as Todo rows: completing an instance inserts the
+next RECURRENCE_LOOKAHEAD occurrences in one bulk insert (duplicates are
+skipped by the (recurrence_parent_id, due_date) unique index). The
+recurrence_series table records how far each series has been materialized;
+RecurrenceSweeper uses it to restart series whose latest occurrence was
+completed without the completion event being handled. It only creates
+occurrences from today on, never a backlog of past ones.
+
+Tasks from before recurrence_series existed were continued by the old
+completion handler as unlinked copies (no recurrence_parent_id). Migration
+LEGACY_SERIES_MIGRATION gives each a finished series row, so the sweeper
+doesn't take them for stalled first tasks, and materialize_next skips a task
+whose chain already has a later copy (both created before that migration ran).
+"""
+
+import asyncio
+import calendar
+import logging
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from models import Todo, RecurrenceSeries, SchemaMigration, priority_rank, bump_data_version
+
+logger = logging.getLogger(__name__)
+
+RECURRENCE_LOOKAHEAD = int(os.getenv("RECURRENCE_LOOKAHEAD", "1"))
+RECURRENCE_SWEEP_INTERVAL_SECONDS = float(os.getenv("RECURRENCE_SWEEP_INTERVAL_SECONDS", "300"))
+RECURRENCE_SWEEP_BATCH_SIZE = int(os.getenv("RECURRENCE_SWEEP_BATCH_SIZE", "500"))
+
+# migrations.py version that adds series rows for pre-series recurring tasks
+LEGACY_SERIES_MIGRATION = 15
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+LEGACY_RULES = {
+    "daily": "FREQ=DAILY",
+    "weekly": "FREQ=WEEKLY",
+    "monthly": "FREQ=MONTHLY",
+    "yearly": "FREQ=YEARLY",
+}
+NO_RECURRENCE = ("", "none")
+
+# Give up on rules whose filters never match (e.g. every 7 days, but only on Tuesdays)
+MAX_EMPTY_PERIODS = 1000
+
+_BYDAY = re.compile(r"^([+-]?\d{1,2})?(MO|TU|WE|TH|FR|SA|SU)$")
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    by_weekday: Tuple[Tuple[int, Optional[int]], ...] = ()  # (weekday 0=Monday, nth in month or None)
+    by_month_day: Tuple[int, ...] = ()
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # A bare date includes the whole day
+        return until.replace(hour=23, minute=59, second=59) if fmt == "%Y%m%d" else until
+    raise ValueError(f"Invalid UNTIL: {value}")
+
+
+def _positive_int(key: str, value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{key} must be a positive integer")
+    return int(value)
+
+
+def parse_rule(text: Optional[str]) -> Optional[RecurrenceRule]:
+    """Parse Todo.recurrence; None means not recurring. Raises ValueError on invalid rules."""
+    text = (text or "").strip()
+    if text.lower() in NO_RECURRENCE:
+        return None
+    text = LEGACY_RULES.get(text.lower(), text)
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+
+    parts = {}
+    for part in text.upper().split(";"):
+        if not part:
+            continue
+        key, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Invalid rule part: {part}")
+        if key in parts:
+            raise ValueError(f"Duplicate rule part: {key}")
+        parts[key] = value
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = _positive_int("INTERVAL", parts.pop("INTERVAL", "1"))
+    count = _positive_int("COUNT", parts.pop("COUNT")) if "COUNT" in parts else None
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if count is not None and until is not None:
+        raise ValueError("COUNT and UNTIL are mutually exclusive")
+
+    by_weekday = []
+    for token in parts.pop("BYDAY").split(",") if "BYDAY" in parts else []:
+        match = _BYDAY.match(token)
+        if not match:
+            raise ValueError(f"Invalid BYDAY: {token}")
+        nth = int(match.group(1)) if match.group(1) else None
+        if nth is not None and (freq != "MONTHLY" or nth == 0 or abs(nth) > 5):
+            raise ValueError(f"Invalid BYDAY: {token}")
+        by_weekday.append((WEEKDAYS.index(match.group(2)), nth))
+    if by_weekday and freq == "YEARLY":
+        raise ValueError("BYDAY is not supported with FREQ=YEARLY")
+
+    by_month_day = []
+    for token in parts.pop("BYMONTHDAY").split(",") if "BYMONTHDAY" in parts else []:
+        if not re.fullmatch(r"[+-]?\d{1,2}", token) or int(token) == 0 or abs(int(token)) > 31:
+            raise ValueError(f"Invalid BYMONTHDAY: {token}")
+        by_month_day.append(int(token))
+    if by_month_day and freq not in ("DAILY", "MONTHLY"):
+        raise ValueError(f"BYMONTHDAY is not supported with FREQ={freq}")
+
+    parts.pop("WKST", None)  # Weeks always start on Monday
+    if parts:
+        raise ValueError(f"Unsupported rule parts: {', '.join(sorted(parts))}")
+
+    return RecurrenceRule(
+        freq=freq,
+        interval=interval,
+        by_weekday=tuple(sorted(set(by_weekday), key=lambda d: (d[0], d[1] or 0))),
+        by_month_day=tuple(sorted(set(by_month_day))),
+        count=count,
+        until=until,
+    )
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    years, month_index = divmod(month - 1 + months, 12)
+    return year + years, month_index + 1
+
+
+def _clamped_month_days(by_month_day: Tuple[int, ...], year: int, month: int) -> set:
+    last = calendar.monthrange(year, month)[1]
+    # Month-end clamping: the 31st means the last day in shorter months
+    return {min(d, last) if d > 0 else max(1, last + 1 + d) for d in by_month_day}
+
+
+def _month_days(rule: RecurrenceRule, year: int, month: int, default_day: int) -> List[int]:
+    last = calendar.monthrange(year, month)[1]
+    if not rule.by_month_day and not rule.by_weekday:
+        return [min(default_day, last)]
+
+    weekdays = set()
+    for weekday, nth in rule.by_weekday:
+        first = (weekday - calendar.weekday(year, month, 1)) % 7 + 1
+        days = list(range(first, last + 1, 7))
+        if nth is None:
+            weekdays.update(days)
+        elif abs(nth) <= len(days):
+            weekdays.add(days[nth - 1] if nth > 0 else days[nth])
+
+    if not rule.by_month_day:
+        return sorted(weekdays)
+    month_days = _clamped_month_days(rule.by_month_day, year, month)
+    return sorted(month_days & weekdays if rule.by_weekday else month_days)
+
+
+def _period_candidates(rule: RecurrenceRule, dtstart: datetime, k: int) -> List[datetime]:
+    """Occurrences in the k-th period (day/week/month/year) of the series, ascending"""
+    start = dtstart.date()
+    at_time = dtstart.time()
+    if rule.freq == "DAILY":
+        day = start + timedelta(days=k * rule.interval)
+        if rule.by_weekday and day.weekday() not in {d for d, _ in rule.by_weekday}:
+            return []
+        if rule.by_month_day and day.day not in _clamped_month_days(rule.by_month_day, day.year, day.month):
+            return []
+        days = [day]
+    elif rule.freq == "WEEKLY":
+        week = start - timedelta(days=start.weekday()) + timedelta(weeks=k * rule.interval)
+        weekdays = sorted({d for d, _ in rule.by_weekday}) or [start.weekday()]
+        days = [week + timedelta(days=d) for d in weekdays]
+    elif rule.freq == "MONTHLY":
+        year, month = _add_months(start.year, start.month, k * rule.interval)
+        if year > date.max.year:
+            return []
+        days = [date(year, month, d) for d in _month_days(rule, year, month, start.day)]
+    else:
+        year = start.year + k * rule.interval
+        if year > date.max.year:
+            return []
+        days = [date(year, start.month, min(start.day, calendar.monthrange(year, start.month)[1]))]
+    return [datetime.combine(day, at_time) for day in days]
+
+
+def _period_index(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> int:
+    """Index of the period containing `moment`"""
+    start, target = dtstart.date(), moment.date()
+    if rule.freq == "DAILY":
+        return (target - start).days // rule.interval
+    if rule.freq == "WEEKLY":
+        weeks = ((target - timedelta(days=target.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+        return weeks // rule.interval
+    if rule.freq == "MONTHLY":
+        return ((target.year - start.year) * 12 + target.month - start.month) // rule.interval
+    return (target.year - start.year) // rule.interval
+
+
+def iter_occurrences(rule: RecurrenceRule, dtstart: datetime, after: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    Occurrences of the series starting at dtstart, ascending. dtstart itself is
+    the first occurrence. With `after`, only later occurrences are yielded and
+    (for rules without COUNT) the periods before it are skipped, not scanned.
+    """
+    start_k = 0
+    if after is not None and rule.count is None and after > dtstart:
+        start_k = max(0, _period_index(rule, dtstart, after) - 1)
+
+    produced = 0
+    if start_k == 0:
+        produced = 1
+        if after is None or dtstart > after:
+            yield dtstart
+
+    k, empty = start_k, 0
+    while True:
+        if rule.count is not None and produced >= rule.count:
+            return
+        candidates = [c for c in _period_candidates(rule, dtstart, k) if c > dtstart]
+        if not candidates:
+            empty += 1
+            if empty > MAX_EMPTY_PERIODS:
+                return
+        else:
+            empty = 0
+        for candidate in candidates:
+            if rule.until is not None and candidate > rule.until:
+                return
+            if rule.count is not None and produced >= rule.count:
+                return
+            produced += 1
+            if after is None or candidate > after:
+                yield candidate
+        k += 1
+
+
+def next_occurrences(rule: RecurrenceRule, dtstart: datetime, after: datetime, n: int) -> List[datetime]:
+    """The first n occurrences strictly after `after`"""
+    occurrences = []
+    for occurrence in iter_occurrences(rule, dtstart, after):
+        if len(occurrences) >= n:
+            break
+        occurrences.append(occurrence)
+    return occurrences
+
+
+def _start_of_today() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _dialect_insert(session: Session, model):
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
+
+
+def _record_progress(session: Session, root_id: uuid.UUID, through: datetime, finished: bool):
+    """Upsert the series row, never moving materialized_through backwards"""
+    now = datetime.utcnow()
+    statement = _dialect_insert(session, RecurrenceSeries)
+    if statement is None:
+        series = session.get(RecurrenceSeries, root_id) or RecurrenceSeries(root_id=root_id, materialized_through=through)
+        series.materialized_through = max(series.materialized_through, through)
+        series.finished = finished
+        series.updated_at = now
+        session.add(series)
+        return
+    greatest = func.greatest if session.get_bind().dialect.name == "postgresql" else func.max
+    statement = statement.values(root_id=root_id, materialized_through=through, finished=finished, updated_at=now)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["root_id"],
+        set_={
+            "materialized_through": greatest(RecurrenceSeries.materialized_through, statement.excluded.materialized_through),
+            "finished": statement.excluded.finished,
+            "updated_at": now,
+        },
+    ))
+
+
+def _legacy_cutoff(session: Session) -> datetime:
+    """When LEGACY_SERIES_MIGRATION ran; until it has, every existing task predates it"""
+    applied_at = session.exec(
+        select(SchemaMigration.applied_at).where(SchemaMigration.version == LEGACY_SERIES_MIGRATION)
+    ).first()
+    return applied_at or datetime.utcnow()
+
+
+def _continued_by_legacy_copy(session: Session, task: Todo) -> bool:
+    """
+    True if the old completion handler already created the task's successor.
+    Only tasks from before LEGACY_SERIES_MIGRATION qualify: later ones are
+    linked by recurrence_parent_id, and an unlinked task with the same title
+    is an independent series.
+    """
+    if task.recurrence_parent_id or task.due_date is None:
+        return False
+    cutoff = _legacy_cutoff(session)
+    if task.created_at is not None and task.created_at >= cutoff:
+        return False
+    later = select(Todo.id).where(
+        Todo.user_id == task.user_id,
+        Todo.recurrence_parent_id == None,
+        Todo.title == task.title,
+        Todo.recurrence == task.recurrence,
+        Todo.due_date > task.due_date,
+        Todo.created_at < cutoff,
+    ).limit(1)
+    return session.exec(later).first() is not None
+
+
+def materialize_next(session: Session, task: Todo, count: int = RECURRENCE_LOOKAHEAD,
+                     not_before: Optional[datetime] = None) -> int:
+    """
+    Insert the next `count` occurrences after `task` (and after `not_before`)
+    that do not exist yet, in one bulk insert, and record the series' progress.
+    The caller commits. Returns the number of new occurrences; raises
+    ValueError on invalid rules.
+    """
+    root_id = task.recurrence_parent_id or task.id
+    try:
+        rule = parse_rule(task.recurrence)
+    except ValueError:
+        _record_progress(session, root_id, task.due_date or _start_of_today(), finished=True)
+        raise
+    if rule is None:
+        return 0
+    if _continued_by_legacy_copy(session, task):
+        _record_progress(session, root_id, task.due_date, finished=True)
+        return 0
+
+    # Anchor on the first task so calendar rules don't drift; undated tasks count from today
+    dtstart = None
+    if task.recurrence_parent_id:
+        root = session.get(Todo, task.recurrence_parent_id)
+        dtstart = root.due_date if root else None
+    after = task.due_date or _start_of_today()
+    dtstart = dtstart or after
+    if not_before is not None:
+        after = max(after, not_before)
+
+    dates = next_occurrences(rule, dtstart, after, count)
+    _record_progress(session, root_id, dates[-1] if dates else after, finished=len(dates) < count)
+    if not dates:
+        return 0
+
+    reminder_offset = task.due_date - task.reminder_time if task.due_date and task.reminder_time else None
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": task.user_id,
+            "title": task.title,
+            "description": task.description,
+            "is_completed": False,
+            "priority": task.priority,
+            "priority_rank": priority_rank(task.priority),
+            "due_date": due_date,
+            "recurrence": task.recurrence,
+            "tags": task.tags,
+            "reminder_time": due_date - reminder_offset if reminder_offset is not None else None,
+            "created_at": now,
+            "updated_at": now,
+            "recurrence_parent_id": root_id,
+        }
+        for due_date in dates
+    ]
+
+    # Occurrences that already exist (earlier lookahead, another materializer racing
+    # this one) are skipped by the occurrence unique index; RETURNING counts the rest
+    statement = _dialect_insert(session, Todo)
+    if statement is None:
+        existing = set(session.exec(
+            select(Todo.due_date).where(Todo.recurrence_parent_id == root_id, Todo.due_date.in_(dates))
+        ).all())
+        rows = [row for row in rows if row["due_date"] not in existing]
+        if rows:
+            session.execute(insert(Todo), rows)
+        created = len(rows)
+    else:
+        created = len(session.scalars(statement.on_conflict_do_nothing().returning(Todo.id), rows).all())
+    if created:
+        bump_data_version(session.connection(), task.user_id, "todos")
+    return created
+
+
+def find_stalled(session: Session, limit: int = RECURRENCE_SWEEP_BATCH_SIZE, first_tasks: bool = True) -> List[Todo]:
+    """
+    Completed tasks that should have produced an occurrence but did not:
+    series whose latest materialized occurrence is completed, and (with
+    first_tasks) completed first tasks of series that were never
+    materialized. Occurrences the user deleted are not brought back: the
+    series row still records them. Undated tasks are left to the completion
+    event.
+    """
+    recurring = and_(Todo.recurrence.is_not(None), Todo.recurrence.not_in(NO_RECURRENCE))
+    frontier = (
+        select(Todo)
+        .join(RecurrenceSeries, and_(
+            RecurrenceSeries.root_id == Todo.recurrence_parent_id,
+            RecurrenceSeries.materialized_through == Todo.due_date,
+        ))
+        .where(Todo.is_completed == True, RecurrenceSeries.finished == False, recurring)
+        .limit(limit)
+    )
+    roots = (
+        select(Todo)
+        .outerjoin(RecurrenceSeries, RecurrenceSeries.root_id == Todo.id)
+        .where(
+            Todo.recurrence_parent_id == None,
+            Todo.is_completed == True,
+            Todo.due_date != None,
+            RecurrenceSeries.root_id == None,
+            recurring,
+        )
+        .limit(limit)
+    )
+    stalled = list(session.exec(frontier).all())
+    return stalled + list(session.exec(roots).all()) if first_tasks else stalled
+
+
+def sweep(engine, limit: int = RECURRENCE_SWEEP_BATCH_SIZE) -> int:
+    """Materialize occurrences for stalled series; returns the number created"""
+    from migrations import migration_runner
+    # Until legacy tasks have series rows they look like stalled first tasks
+    first_tasks = migration_runner.is_applied(LEGACY_SERIES_MIGRATION)
+    created = 0
+    today = _start_of_today()
+    with Session(engine) as session:
+        for task in find_stalled(session, limit, first_tasks):
+            try:
+                created += materialize_next(session, task, not_before=today)
+            except ValueError as e:
+                logger.warning(f"Recurrence: invalid rule on task {task.id}: {e}")
+        session.commit()
+    if created:
+        logger.info(f"Recurrence sweep created {created} occurrences")
+    return created
+
+
+class RecurrenceSweeper:
+    """Periodic background sweep; safe to run on every replica"""
+
+    def __init__(self, interval: float = RECURRENCE_SWEEP_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.created = 0
+
+    async def start(self, engine):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(engine))
+            logger.info("Recurrence sweeper started")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            logger.info("Recurrence sweeper stopped")
+
+    async def _run(self, engine):
+        while True:
+            try:
+                self.created += await asyncio.to_thread(sweep, engine)
+            except Exception as e:
+                logger.error(f"Recurrence sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Singleton instance
+recurrence_sweeper = RecurrenceSweeper()
@@ -0,0 +1,292 @@
+"""
+Reminder Scheduler
+
+Publishes a reminders-topic event when a todo's reminder_time comes due. The
+database is the source of truth: a reminder is pending while the task is open
+and reminder_sent_at is NULL, and ix_todo_reminder_pending serves every query.
+In memory the scheduler keeps only a min-heap of the reminders due before a
+horizon, so memory stays bounded however many reminders are pending:
+
+- The heap holds every pending reminder up to the horizon (reminder_time, id):
+  at most REMINDER_MAX_LOADED rows, no further than REMINDER_WINDOW_SECONDS
+  ahead. When the heap runs dry or the clock reaches the horizon, the next
+  slice is loaded with a keyset query starting at the horizon.
+- The API calls track()/cancel() after committing a change, so created, edited,
+  completed and deleted reminders are rescheduled without a reload. Reminders
+  beyond the horizon are left to the next slice.
+- Due reminders are claimed in batches (reminder_sent_at is set, SKIP LOCKED on
+  PostgreSQL) and published through the outbox in the same transaction, so each
+  reminder is sent once even with several replicas. The claim re-checks the row,
+  so heap entries made stale by an edit elsewhere are dropped.
+- Every REMINDER_RESYNC_SECONDS the window is reloaded from the database to pick
+  up rows written by other replicas and by the recurrence engine.
+
+All time comes from the injected clock, so tests can drive it with a fake one.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from database import engine
+from models import Todo
+from outbox import add_events, outbox_relay
+
+logger = logging.getLogger(__name__)
+
+REMINDER_WINDOW_SECONDS = float(os.getenv("REMINDER_WINDOW_SECONDS", "3600"))
+REMINDER_MAX_LOADED = int(os.getenv("REMINDER_MAX_LOADED", "100000"))
+REMINDER_FIRE_BATCH_SIZE = int(os.getenv("REMINDER_FIRE_BATCH_SIZE", "500"))
+REMINDER_RESYNC_SECONDS = float(os.getenv("REMINDER_RESYNC_SECONDS", "60"))
+# Reminders missed by more than this (e.g. while the app was down) are not sent
+REMINDER_MAX_LATENESS_SECONDS = float(os.getenv("REMINDER_MAX_LATENESS_SECONDS", "86400"))
+REMINDER_RETRY_SECONDS = 5.0
+
+_MIN_ID = uuid.UUID(int=0)
+_MAX_ID = uuid.UUID(int=2 ** 128 - 1)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Todo datetimes are stored as naive UTC; API input may carry an offset"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_pending(todo) -> bool:
+    return bool(todo.reminder_time) and not todo.is_completed and getattr(todo, "reminder_sent_at", None) is None
+
+
+class ReminderScheduler:
+    """Min-heap of upcoming reminders over a sliding window of the database"""
+
+    def __init__(
+        self,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        window: float = REMINDER_WINDOW_SECONDS,
+        max_loaded: int = REMINDER_MAX_LOADED,
+        batch_size: int = REMINDER_FIRE_BATCH_SIZE,
+        resync_interval: float = REMINDER_RESYNC_SECONDS,
+    ):
+        self.clock = clock
+        self.window = timedelta(seconds=window)
+        self.max_loaded = max_loaded
+        self.batch_size = batch_size
+        self.resync_interval = timedelta(seconds=resync_interval)
+        self._heap: list = []  # (reminder_time, id); entries not matching _due are stale
+        self._due: dict = {}  # id -> reminder_time of its live heap entry
+        self._horizon: Optional[tuple] = None  # everything pending up to here is in the heap
+        self._last_resync: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.fired = 0
+        self.loads = 0
+
+    # --- Incremental updates from the API ---
+
+    def track(self, todo):
+        """Schedule, reschedule or drop a todo's reminder after its change was committed"""
+        when = _naive_utc(todo.reminder_time) if is_pending(todo) else None
+        with self._lock:
+            if when is None or self._horizon is None or (when, todo.id) > self._horizon:
+                # Not pending, or beyond the horizon: the next slice loads it from the database
+                self._due.pop(todo.id, None)
+                return
+            self._due[todo.id] = when
+            heapq.heappush(self._heap, (when, todo.id))
+            self._compact()
+            earliest = self._heap[0] == (when, todo.id)
+        if earliest:
+            self._notify()
+
+    def cancel(self, todo_ids: Iterable[uuid.UUID]):
+        with self._lock:
+            for todo_id in todo_ids:
+                self._due.pop(todo_id, None)
+            self._compact()
+
+    def _compact(self):
+        # Lazy deletion leaves stale entries behind; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._heap = [(when, todo_id) for todo_id, when in self._due.items()]
+            heapq.heapify(self._heap)
+
+    # --- Loading ---
+
+    def reload(self):
+        """Rebuild the heap from the database, starting REMINDER_MAX_LATENESS_SECONDS back"""
+        now = self.clock()
+        with self._lock:
+            self._heap = []
+            self._due = {}
+            self._horizon = (now - timedelta(seconds=REMINDER_MAX_LATENESS_SECONDS), _MIN_ID)
+            self._last_resync = now
+        self._load_more(now)
+
+    def _load_more(self, now: datetime) -> int:
+        """Load the next slice after the horizon; returns the number of reminders loaded"""
+        with self._lock:
+            after_time, after_id = self._horizon
+            room = self.max_loaded - len(self._due)
+        until = now + self.window
+        if room <= 0 or after_time >= until:
+            return 0
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Todo.id, Todo.reminder_time)
+                .where(
+                    Todo.is_completed == False,
+                    Todo.reminder_sent_at == None,
+                    Todo.reminder_time >= after_time,
+                    or_(Todo.reminder_time > after_time, Todo.id > after_id),
+                    Todo.reminder_time <= until,
+                )
+                .order_by(Todo.reminder_time, Todo.id)
+                .limit(room)
+            ).all()
+        with self._lock:
+            for todo_id, when in rows:
+                self._due[todo_id] = when
+                heapq.heappush(self._heap, (when, todo_id))
+            # A full slice may have stopped mid-window: continue after its last row next time
+            self._horizon = (rows[-1][1], rows[-1][0]) if len(rows) == room else (until, _MAX_ID)
+        self.loads += 1
+        return len(rows)
+
+    # --- Firing ---
+
+    def tick(self) -> int:
+        """Send every reminder due at clock(); returns the number sent"""
+        now = self.clock()
+        if self._horizon is None or now - self._last_resync >= self.resync_interval:
+            self.reload()
+        sent = 0
+        while True:
+            todo_ids = self._pop_due(now)
+            if todo_ids:
+                sent += self._fire(todo_ids, now)
+            elif not self._due or self._horizon[0] <= now:
+                if not self._load_more(now):
+                    break
+            else:
+                break
+        self.fired += sent
+        return sent
+
+    def _pop_due(self, now: datetime) -> List[uuid.UUID]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                when, todo_id = heapq.heappop(self._heap)
+                if self._due.get(todo_id) == when:
+                    del self._due[todo_id]
+                    due.append(todo_id)
+        return due
+
+    def _fire(self, todo_ids: List[uuid.UUID], now: datetime) -> int:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Todo.id, Todo.user_id, Todo.title, Todo.reminder_time, Todo.due_date)
+                .where(
+                    Todo.id.in_(todo_ids),
+                    Todo.is_completed == False,
+                    Todo.reminder_sent_at == None,
+                    Todo.reminder_time <= now,
+                )
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return 0
+            session.execute(
+                update(Todo).where(Todo.id.in_([row.id for row in rows])).values(reminder_sent_at=now),
+                execution_options={"synchronize_session": False},
+            )
+            # SP-1.5: Reminders reach the reminders topic through the outbox, committed with the claim
+            add_events(session, "reminders", [
+                {
+                    "type": "reminder_due",
+                    "user_id": row.user_id,
+                    "task_id": str(row.id),
+                    "title": row.title,
+                    "reminder_time": row.reminder_time.isoformat(),
+                    "due_date": row.due_date.isoformat() if row.due_date else None,
+                }
+                for row in rows
+            ])
+            session.commit()
+        outbox_relay.notify()
+        return len(rows)
+
+    def seconds_until_next(self) -> float:
+        with self._lock:
+            if self._horizon is None:
+                return 0.0
+            candidates = [self._horizon[0], self._last_resync + self.resync_interval]
+            if self._heap:
+                candidates.append(self._heap[0][0])
+        return max(0.0, (min(candidates) - self.clock()).total_seconds())
+
+    # --- Background task ---
+
+    async def start(self):
+        """Start scheduling on the running loop; call once from the app lifespan"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Reminder scheduler started")
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._loop = None
+        logger.info("Reminder scheduler stopped")
+
+    def _notify(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.tick)
+                delay = self.seconds_until_next()
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {e}")
+                delay = REMINDER_RETRY_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            loaded, heap_size, horizon = len(self._due), len(self._heap), self._horizon
+        return {
+            "running": self._task is not None,
+            "loaded": loaded,
+            "heap_entries": heap_size,
+            "horizon": horizon[0].isoformat() if horizon else None,
+            "fired": self.fired,
+            "loads": self.loads,
+        }
+
+
+# Singleton instance
+reminder_scheduler = ReminderScheduler()
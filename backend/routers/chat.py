@@ -6,23 +6,31 @@ Provides natural language interface for task management with:
 - Mock AI (pattern matching)
 - Urdu language support
 - MCP tool integration
+- History: cursor-paginated conversations and messages, NDJSON export
+- Tool usage per day (from the message_tool_call table)
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, Dict, List, Optional
+from datetime import datetime, timedelta
 import json
-import re
+import os
 
-from database import get_session
+from database import get_async_read_session, read_router, run_write
 from models import (
     Conversation, Message, ChatRequest, ChatResponse,
-    ConversationRead, MessageRead, User
+    ConversationRead, MessageRead, ConversationPage, MessagePage, MessageToolCall, ToolUsage, User
 )
 from auth import get_current_user
 from mcp_server import mcp_tools
+from outbox import outbox_relay
 from system_utils import get_system_status_data
+from etags import conditional_get_async
+from intent_engine import intent_engine
+from pagination import SortKey, apply_sort, apply_keyset, cursor_values, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -34,131 +42,22 @@ class MockAI:
     @staticmethod
     def detect_language(text: str) -> str:
         """Detect if text is in Urdu"""
-        # Simple Urdu detection - check for Urdu Unicode range
-        urdu_pattern = re.compile(r'[\u0600-\u06FF]')
-        return "urdu" if urdu_pattern.search(text) else "english"
+        return intent_engine.detect_language(text)
     
     @staticmethod
     def extract_task_title(text: str, language: str) -> Optional[str]:
         """Extract task title from natural language"""
-        text_lower = text.lower()
-        
-        # English patterns
-        add_patterns = [
-            r'add task:?\s*(.+)',
-            r'create task:?\s*(.+)',
-            r'new task:?\s*(.+)',
-            r'add\s+(.+)\s+to\s+(my\s+)?list',
-            r'remind me to\s+(.+)',
-        ]
-        
-        # Urdu patterns
-        urdu_add_patterns = [
-            r'نیا کام:?\s*(.+)',
-            r'کام شامل کرو:?\s*(.+)',
-            r'یاد دہانی:?\s*(.+)',
-        ]
-        
-        patterns = urdu_add_patterns if language == "urdu" else add_patterns
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-        
-        return None
+        return intent_engine.extract_task_title(text, language)
     
     @staticmethod
     def detect_intent(text: str, language: str) -> tuple[str, dict]:
         """
-        Detect user intent and extract parameters
+        Detect user intent and extract parameters (see intent_engine.py)
         
         Returns:
             (intent, params) tuple
         """
-        text_lower = text.lower()
-        
-        # Add task intent
-        task_title = MockAI.extract_task_title(text, language)
-        if task_title:
-            params = {"title": task_title}
-            
-            # Extract priority
-            priority = None
-            if any(w in text_lower for w in ["high priority", "urgent", "important", "ضروری", "انتہائی"]):
-                priority = "high"
-            elif any(w in text_lower for w in ["low priority", "not urgent", "معمولی"]):
-                priority = "low"
-            elif any(w in text_lower for w in ["medium", "درمیانہ"]):
-                priority = "medium"
-            
-            if priority:
-                params["priority"] = priority
-
-            # Extract due date (simple patterns)
-            due_date = None
-            if any(w in text_lower for w in ["today", "آج"]):
-                due_date = datetime.utcnow().date().isoformat()
-            elif any(w in text_lower for w in ["tomorrow", "کل"]):
-                from datetime import timedelta
-                due_date = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
-            
-            if due_date:
-                params["due_date"] = due_date
-
-            return ("add_task", params)
-        
-        # List tasks intent
-        list_keywords_en = ["show", "list", "display", "view", "my tasks", "what tasks"]
-        list_keywords_ur = ["دکھاؤ", "فہرست", "کام"]
-        
-        keywords = list_keywords_ur if language == "urdu" else list_keywords_en
-        if any(kw in text_lower for kw in keywords):
-            # Check for status filter
-            if "pending" in text_lower or "incomplete" in text_lower or "زیر التواء" in text_lower:
-                return ("list_tasks", {"status": "pending"})
-            elif "completed" in text_lower or "done" in text_lower or "مکمل" in text_lower:
-                return ("list_tasks", {"status": "completed"})
-            else:
-                return ("list_tasks", {"status": "all"})
-        
-        # Complete task intent
-        complete_keywords_en = ["complete", "finish", "done", "mark"]
-        complete_keywords_ur = ["مکمل", "ختم"]
-        
-        keywords = complete_keywords_ur if language == "urdu" else complete_keywords_en
-        if any(kw in text_lower for kw in keywords):
-            # Try to extract task reference
-            if "first" in text_lower or "پہلا" in text_lower:
-                return ("complete_task", {"task_ref": "first"})
-            elif "last" in text_lower or "آخری" in text_lower:
-                return ("complete_task", {"task_ref": "last"})
-            else:
-                return ("complete_task", {"task_ref": "first"})  # Default to first
-        
-        # Delete task intent
-        delete_keywords_en = ["delete", "remove", "cancel"]
-        delete_keywords_ur = ["حذف", "ہٹاؤ"]
-        
-        keywords = delete_keywords_ur if language == "urdu" else delete_keywords_en
-        if any(kw in text_lower for kw in keywords):
-            if "first" in text_lower or "پہلا" in text_lower:
-                return ("delete_task", {"task_ref": "first"})
-            elif "last" in text_lower or "آخری" in text_lower:
-                return ("delete_task", {"task_ref": "last"})
-            else:
-                return ("delete_task", {"task_ref": "first"})
-        
-        # System status intent
-        system_keywords_en = ["cluster", "nodes", "pods", "status", "system", "health", "infrastructure"]
-        system_keywords_ur = ["کلسٹر", "نوڈز", "پوڈز", "سسٹم", "صحت", "انفراسٹرکچر"]
-        
-        keywords = system_keywords_ur if language == "urdu" else system_keywords_en
-        if any(kw in text_lower for kw in keywords):
-            return ("check_system_status", {})
-
-        # Default: unknown intent
-        return ("unknown", {})
+        return intent_engine.detect_intent(text, language)
     
     @staticmethod
     def generate_response(intent: str, result: dict, language: str) -> str:
@@ -279,17 +178,70 @@ class MockAI:
         return "❌ کچھ غلط ہو گیا"
 
 
+# Intents whose tools only touch the database; they run in the turn's session
+DB_INTENTS = {"add_task", "list_tasks", "complete_task", "delete_task"}
+MUTATING_INTENTS = {"add_task", "complete_task", "delete_task"}
+
+
+def run_tool(session: Optional[Session], user_id: str, intent: str, params: dict) -> tuple[dict, List[str]]:
+    """
+    Execute the MCP tool for a detected intent; returns (result, tool_calls).
+    The tools work in session (the chat endpoint passes its turn's session) and
+    leave the commit to the caller.
+    """
+    tool_calls = []
+    result = {}
+    
+    if intent == "add_task":
+        result = mcp_tools.add_task(
+            user_id, 
+            params["title"],
+            priority=params.get("priority", "medium"),
+            due_date=params.get("due_date"),
+            session=session
+        )
+        tool_calls = ["add_task"]
+    
+    elif intent == "list_tasks":
+        result = mcp_tools.list_tasks(user_id, params.get("status", "all"), session=session)
+        tool_calls = ["list_tasks"]
+    
+    elif intent in ("complete_task", "delete_task"):
+        n = -1 if params.get("task_ref") == "last" else 1
+        if intent == "complete_task":
+            result = mcp_tools.complete_nth_task(user_id, n, session=session)
+        else:
+            result = mcp_tools.delete_nth_task(user_id, n, session=session)
+        tool_calls = [intent]
+
+    elif intent == "check_system_status":
+        result = get_system_status_data()
+        tool_calls = ["get_system_status"]
+    
+    else:
+        result = {"status": "unknown"}
+
+    return result, tool_calls
+
+
 @router.post("/{user_id}", response_model=ChatResponse)
 async def chat(
     user_id: str,
     request: ChatRequest,
-    session: Session = Depends(get_session),
 ):
     """
     Stateless chat endpoint
     
-    Handles natural language task management with conversation persistence
+    Handles natural language task management with conversation persistence.
+    A turn is one unit of work: the conversation, both messages and the tool's
+    changes are flushed together and committed once, in one threadpool call
+    (see database.run_write).
     """
+    return await run_write(_chat_turn, user_id, request)
+
+
+def _chat_turn(session: Session, user_id: str, request: ChatRequest) -> ChatResponse:
+    now = datetime.utcnow()
     
     # Get or create conversation
     conversation_id = request.conversation_id
@@ -299,12 +251,12 @@ async def chat(
         conversation = Conversation(
             user_id=user_id,
             title="New Conversation",
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            created_at=now,
+            updated_at=now
         )
         session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        # The messages need its id
+        session.flush()
         conversation_id = conversation.id
     else:
         # Verify conversation exists and belongs to user
@@ -313,86 +265,23 @@ async def chat(
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Update timestamp
-        conversation.updated_at = datetime.utcnow()
-        session.add(conversation)
-        session.commit()
+        conversation.updated_at = now
     
     # Save user message
-    user_message = Message(
+    session.add(Message(
         user_id=user_id,
         conversation_id=conversation_id,
         role="user",
         content=request.message,
-        created_at=datetime.utcnow()
-    )
-    session.add(user_message)
-    session.commit()
-    session.refresh(user_message)
+        created_at=now
+    ))
     
     # Process with Mock AI
     language = MockAI.detect_language(request.message)
     intent, params = MockAI.detect_intent(request.message, language)
     
     # Execute MCP tool
-    tool_calls = []
-    result = {}
-    
-    if intent == "add_task":
-        result = mcp_tools.add_task(
-            user_id, 
-            params["title"],
-            priority=params.get("priority", "medium"),
-            due_date=params.get("due_date")
-        )
-        tool_calls = ["add_task"]
-    
-    elif intent == "list_tasks":
-        result = mcp_tools.list_tasks(user_id, params.get("status", "all"))
-        tool_calls = ["list_tasks"]
-    
-    elif intent == "complete_task":
-        # Get task to complete
-        tasks_result = mcp_tools.list_tasks(user_id, "pending")
-        if tasks_result.get("status") == "success" and tasks_result.get("tasks"):
-            tasks = tasks_result["tasks"]
-            task_ref = params.get("task_ref", "first")
-            
-            if task_ref == "first":
-                task_id = tasks[0]["task_id"]
-            elif task_ref == "last":
-                task_id = tasks[-1]["task_id"]
-            else:
-                task_id = tasks[0]["task_id"]
-            
-            result = mcp_tools.complete_task(user_id, task_id)
-            tool_calls = ["list_tasks", "complete_task"]
-        else:
-            result = {"status": "error", "message": "No pending tasks found"}
-    
-    elif intent == "delete_task":
-        tasks_result = mcp_tools.list_tasks(user_id, "all")
-        if tasks_result.get("status") == "success" and tasks_result.get("tasks"):
-            tasks = tasks_result["tasks"]
-            task_ref = params.get("task_ref", "first")
-            
-            if task_ref == "first":
-                task_id = tasks[0]["task_id"]
-            elif task_ref == "last":
-                task_id = tasks[-1]["task_id"]
-            else:
-                task_id = tasks[0]["task_id"]
-            
-            result = mcp_tools.delete_task(user_id, task_id)
-            tool_calls = ["list_tasks", "delete_task"]
-        else:
-            result = {"status": "error", "message": "No tasks found"}
-
-    elif intent == "check_system_status":
-        result = get_system_status_data()
-        tool_calls = ["get_system_status"]
-    
-    else:
-        result = {"status": "unknown"}
+    result, tool_calls = run_tool(session if intent in DB_INTENTS else None, user_id, intent, params)
     
     # Generate response
     response_text = MockAI.generate_response(intent, result, language)
@@ -403,12 +292,25 @@ async def chat(
         conversation_id=conversation_id,
         role="assistant",
         content=response_text,
-        tool_calls=json.dumps(tool_calls) if tool_calls else None,
         created_at=datetime.utcnow()
     )
     session.add(assistant_message)
+    if tool_calls:
+        # The tool call rows need the message id
+        session.flush()
+        session.add_all(
+            MessageToolCall(
+                message_id=assistant_message.id,
+                user_id=user_id,
+                tool=tool,
+                position=position,
+                created_at=assistant_message.created_at
+            )
+            for position, tool in enumerate(tool_calls)
+        )
     session.commit()
-    session.refresh(assistant_message)
+    if intent in MUTATING_INTENTS:
+        outbox_relay.notify()
     
     return ChatResponse(
         conversation_id=conversation_id,
@@ -418,54 +320,233 @@ async def chat(
     )
 
 
+# Sort orders for the paged endpoints, each ending in id so keyset cursors are unambiguous
+CONVERSATION_SORT = [SortKey(Conversation.updated_at, descending=True), SortKey(Conversation.id, descending=True)]
+MESSAGE_SORTS = {
+    "oldest": [SortKey(Message.created_at), SortKey(Message.id)],
+    "newest": [SortKey(Message.created_at, descending=True), SortKey(Message.id, descending=True)],
+}
+
+# Messages per query while exporting; each batch is read and sent before the next
+CHAT_EXPORT_BATCH_SIZE = int(os.getenv("CHAT_EXPORT_BATCH_SIZE", "1000"))
+
+
+async def _tool_calls(session: AsyncSession, message_ids) -> Dict[int, List[str]]:
+    """Tool names per message, in call order; message_ids is a list or an id subquery"""
+    statement = (
+        select(MessageToolCall.message_id, MessageToolCall.tool)
+        .where(MessageToolCall.message_id.in_(message_ids))
+        .order_by(MessageToolCall.message_id, MessageToolCall.position)
+    )
+    calls = {}
+    for message_id, tool in await session.exec(statement):
+        calls.setdefault(message_id, []).append(tool)
+    return calls
+
+
+def _legacy_tool_calls(tool_calls: Optional[str]) -> Optional[list]:
+    # Messages the tool call backfill (migration 13) hasn't reached yet; it clears the column after
+    if not tool_calls:
+        return None
+    try:
+        return json.loads(tool_calls)
+    except ValueError:
+        return None
+
+
+def _message_read(msg: Message, tool_calls: Dict[int, List[str]]) -> MessageRead:
+    return MessageRead(
+        id=msg.id,
+        role=msg.role,
+        content=msg.content,
+        tool_calls=tool_calls.get(msg.id) or _legacy_tool_calls(msg.tool_calls),
+        created_at=msg.created_at
+    )
+
+
+async def _get_own_conversation(session: AsyncSession, user_id: str, conversation_id: int) -> Conversation:
+    conversation = await session.get(Conversation, conversation_id)
+    if not conversation or conversation.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+
+def _decode_cursor(cursor: str, sort_by: str, keys: List[SortKey]) -> list:
+    try:
+        return decode_cursor(cursor, sort_by, keys)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/{user_id}/conversations", response_model=List[ConversationRead])
 async def list_conversations(
     user_id: str,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
 ):
     """List all conversations for a user"""
+    not_modified = await conditional_get_async(request, response, session, user_id, "chat")
+    if not_modified:
+        return not_modified
     statement = select(Conversation).where(
         Conversation.user_id == user_id
     ).order_by(Conversation.updated_at.desc())
     
-    conversations = session.exec(statement).all()
+    conversations = (await session.exec(statement)).all()
     return conversations
 
 
+@router.get("/{user_id}/conversations/page", response_model=ConversationPage)
+async def list_conversations_page(
+    user_id: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """Keyset-paginated variant of list_conversations; follow next_cursor until it is null"""
+    not_modified = await conditional_get_async(request, response, session, user_id, "chat")
+    if not_modified:
+        return not_modified
+    statement = select(Conversation).where(Conversation.user_id == user_id)
+    if cursor:
+        statement = apply_keyset(statement, CONVERSATION_SORT, _decode_cursor(cursor, "updated_at", CONVERSATION_SORT))
+
+    # Fetch one extra row to know whether another page exists
+    conversations = (await session.exec(apply_sort(statement, CONVERSATION_SORT).limit(limit + 1))).all()
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        next_cursor = encode_cursor("updated_at", cursor_values(conversations[-1], CONVERSATION_SORT))
+
+    return ConversationPage(items=conversations, next_cursor=next_cursor)
+
+
 @router.get("/{user_id}/conversations/{conversation_id}/messages", response_model=List[MessageRead])
 async def get_conversation_messages(
     user_id: str,
     conversation_id: int,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_read_session),
 ):
     """Get all messages in a conversation"""
+    not_modified = await conditional_get_async(request, response, session, user_id, "chat")
+    if not_modified:
+        return not_modified
     # Verify conversation belongs to user
-    conversation = session.get(Conversation, conversation_id)
-    if not conversation or conversation.user_id != user_id:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    await _get_own_conversation(session, user_id, conversation_id)
     
     statement = select(Message).where(
         Message.conversation_id == conversation_id
     ).order_by(Message.created_at)
     
-    messages = session.exec(statement).all()
-    
-    # Parse tool_calls JSON
-    result = []
-    for msg in messages:
-        tool_calls_list = None
-        if msg.tool_calls:
-            try:
-                tool_calls_list = json.loads(msg.tool_calls)
-            except:
-                pass
-        
-        result.append(MessageRead(
-            id=msg.id,
-            role=msg.role,
-            content=msg.content,
-            tool_calls=tool_calls_list,
-            created_at=msg.created_at
-        ))
-    
-    return result
+    messages = (await session.exec(statement)).all()
+    tool_calls = await _tool_calls(session, select(Message.id).where(Message.conversation_id == conversation_id))
+    return [_message_read(msg, tool_calls) for msg in messages]
+
+
+@router.get("/{user_id}/conversations/{conversation_id}/messages/page", response_model=MessagePage)
+async def get_conversation_messages_page(
+    user_id: str,
+    conversation_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    order: str = Query(default="oldest"), # "oldest", "newest" (latest messages first, for scrolling back)
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """Keyset-paginated variant of get_conversation_messages; follow next_cursor until it is null"""
+    not_modified = await conditional_get_async(request, response, session, user_id, "chat")
+    if not_modified:
+        return not_modified
+    await _get_own_conversation(session, user_id, conversation_id)
+    if order not in MESSAGE_SORTS:
+        order = "oldest"
+    keys = MESSAGE_SORTS[order]
+    statement = select(Message).where(Message.conversation_id == conversation_id)
+    if cursor:
+        statement = apply_keyset(statement, keys, _decode_cursor(cursor, order, keys))
+
+    messages = (await session.exec(apply_sort(statement, keys).limit(limit + 1))).all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(order, cursor_values(messages[-1], keys))
+
+    tool_calls = await _tool_calls(session, [msg.id for msg in messages])
+    return MessagePage(items=[_message_read(msg, tool_calls) for msg in messages], next_cursor=next_cursor)
+
+
+@router.get("/{user_id}/conversations/{conversation_id}/messages/export")
+async def export_conversation_messages(
+    user_id: str,
+    conversation_id: int,
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """
+    Full history as NDJSON: one MessageRead object per line, oldest first.
+    Messages are read CHAT_EXPORT_BATCH_SIZE at a time, each batch in its own
+    short transaction, so memory stays flat and no connection is held while
+    the client reads. Messages added during the export may or may not be
+    included; none are repeated or skipped.
+    """
+    await _get_own_conversation(session, user_id, conversation_id)
+    await session.close()
+    return StreamingResponse(
+        _export_messages(read_router.async_engine(user_id), conversation_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="conversation-{conversation_id}.ndjson"'},
+    )
+
+
+async def _export_messages(engine, conversation_id: int) -> AsyncIterator[bytes]:
+    keys = MESSAGE_SORTS["oldest"]
+    columns = (Message.id, Message.role, Message.content, Message.tool_calls, Message.created_at)
+    values = None
+    while True:
+        statement = select(*columns).where(Message.conversation_id == conversation_id)
+        if values is not None:
+            statement = apply_keyset(statement, keys, values)
+        async with AsyncSession(engine) as session:
+            rows = (await session.exec(apply_sort(statement, keys).limit(CHAT_EXPORT_BATCH_SIZE))).all()
+            tool_calls = await _tool_calls(session, [row.id for row in rows]) if rows else {}
+        if not rows:
+            return
+        yield "".join(
+            _message_read(row, tool_calls).model_dump_json() + "\n" for row in rows
+        ).encode()
+        if len(rows) < CHAT_EXPORT_BATCH_SIZE:
+            return
+        values = cursor_values(rows[-1], keys)
+
+
+@router.get("/{user_id}/tool-usage", response_model=List[ToolUsage])
+async def get_tool_usage(
+    user_id: str,
+    request: Request,
+    response: Response,
+    tool: Optional[str] = None,
+    days: int = Query(default=30, ge=1, le=366),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    """Tool calls per day and tool over the last `days` days (UTC), optionally for one tool"""
+    not_modified = await conditional_get_async(request, response, session, user_id, "chat")
+    if not_modified:
+        return not_modified
+    since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    day = func.date(MessageToolCall.created_at)
+    # Served from ix_message_tool_call_user_tool_created (a range scan per tool)
+    statement = select(day, MessageToolCall.tool, func.count()).where(
+        MessageToolCall.user_id == user_id,
+        MessageToolCall.created_at >= since
+    )
+    if tool:
+        statement = statement.where(MessageToolCall.tool == tool)
+    statement = statement.group_by(day, MessageToolCall.tool).order_by(day, MessageToolCall.tool)
+
+    rows = (await session.exec(statement)).all()
+    return [ToolUsage(day=row[0], tool=row[1], count=row[2]) for row in rows]
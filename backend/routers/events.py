@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Body
 import logging
 from typing import Dict, Any, List
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from database import engine
 from models import Todo
-from datetime import datetime, timedelta
+from event_dedupe import event_dedupe
+from recurrence import materialize_next, NO_RECURRENCE
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -28,44 +30,59 @@ def subscribe():
     return subscriptions
 
 @router.post("/events/task-lifecycle")
-async def handle_task_lifecycle(event: Dict[str, Any] = Body(...)):
-    """Handle task lifecycle events for recurrence logic"""
+def handle_task_lifecycle(event: Dict[str, Any] = Body(...)):
+    """
+    Handle task lifecycle events for recurrence logic
+
+    Idempotent: redelivered events are skipped (event id dedupe), and a series
+    never gets two instances for the same occurrence date. Completions from the
+    API (task_updated) and from chat (task_completed_mcp) both count.
+
+    A plain def on purpose: materialization uses the sync engine, so FastAPI
+    runs it in the threadpool instead of on the event loop.
+    """
     data = event.get("data", {})
     event_type = data.get("type")
     user_id = data.get("user_id")
     task_id = data.get("task_id")
+    # Outbox events carry their own id; fall back to the CloudEvent id
+    event_id = data.get("event_id") or event.get("id")
     
     logger.info(f"Received lifecycle event: {event_type} for task {task_id}")
+
+    if event_id and event_dedupe.seen(event_id):
+        logger.info(f"Skipping duplicate event {event_id}")
+        return {"status": "SUCCESS"}
     
-    if event_type == "task_updated" and data.get("is_completed") is True:
-        # Check recurrence
+    completed = (event_type == "task_updated" and data.get("is_completed") is True) or event_type == "task_completed_mcp"
+    if completed:
+        # Materialize the next occurrence(s) of a recurring task
         with Session(engine) as session:
             task = session.get(Todo, uuid.UUID(task_id))
-            if task and task.recurrence and task.recurrence != "none":
-                # Create next instance of recurring task
-                new_due_date = None
-                if task.recurrence == "daily":
-                    new_due_date = (task.due_date or datetime.utcnow()) + timedelta(days=1)
-                elif task.recurrence == "weekly":
-                    new_due_date = (task.due_date or datetime.utcnow()) + timedelta(weeks=1)
-                elif task.recurrence == "monthly":
-                    # Simple monthly logic
-                    new_due_date = (task.due_date or datetime.utcnow()) + timedelta(days=30)
-                
-                if new_due_date:
-                    new_task = Todo(
-                        user_id=task.user_id,
-                        title=task.title,
-                        description=task.description,
-                        priority=task.priority,
-                        due_date=new_due_date,
-                        recurrence=task.recurrence,
-                        tags=task.tags
-                    )
-                    session.add(new_task)
+            if task and (task.recurrence or "").strip().lower() not in NO_RECURRENCE:
+                try:
+                    created = materialize_next(session, task)
+                except ValueError as e:
+                    created = 0
+                    logger.warning(f"Invalid recurrence rule on task {task_id}: {e}")
+                if event_id:
+                    event_dedupe.record(session, event_id)
+                try:
                     session.commit()
-                    logger.info(f"Created recurring task: {new_task.title} for {new_due_date}")
+                    logger.info(f"Created {created} recurring instance(s) of {task.title}")
+                except IntegrityError:
+                    session.rollback()
+                    if not (event_id and event_dedupe.is_recorded(session, event_id)):
+                        # Some other constraint failed: answer 500 so Dapr redelivers
+                        # the event rather than acknowledging one that wasn't handled
+                        raise
+                    # Another delivery of this event was processed first
+                    event_dedupe.duplicate(event_id)
+                    logger.info(f"Skipping duplicate event {event_id} for task {task_id}")
 
+    if event_id:
+        event_dedupe.remember(event_id)
+    event_dedupe.maybe_sweep()
     return {"status": "SUCCESS"}
 
 @router.post("/events/reminders")
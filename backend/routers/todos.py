@@ -1,52 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert, update, delete
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Generator, List, Optional
 from datetime import datetime
 import uuid
 
-from database import get_session
-from models import Todo, TodoCreate, TodoUpdate, TodoRead, User, TodoStats
+from database import get_session, get_async_session, read_session, run_write
+from models import (
+    Todo, TodoCreate, TodoUpdate, TodoRead, TodoPage, TodoChanges, User, TodoStats, priority_rank,
+    TodoBatchOperation, TodoBatchRequest, TodoBatchItemResult, TodoBatchResponse, bump_data_version,
+    record_tombstones
+)
 from auth import get_current_user
+from pagination import SortKey, apply_sort, apply_keyset, cursor_values, encode_cursor, decode_cursor
+from stats import compute_todo_stats
+from outbox import add_event, add_events, outbox_relay
+from reminders import reminder_scheduler
+from sync import changes_since, maybe_purge_tombstones, SyncTokenExpired
+from etags import conditional_get, data_version_async
+from change_stream import change_hub
+import search as search_module
 
 router = APIRouter(prefix="/todos", tags=["todos"])
 
+def get_read_session(current_user: User = Depends(get_current_user)) -> Generator[Session, None, None]:
+    """Session for read-only endpoints: the read replica, or the primary right after the user's own writes"""
+    with read_session(current_user.id) as session:
+        yield session
+
 @router.get("/stats", response_model=TodoStats)
 def get_todo_stats(
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user),
 ):
     print(f"DEBUG: get_todo_stats for user {current_user.id}")
-    statement = select(Todo).where(Todo.user_id == current_user.id)
-    todos = session.exec(statement).all()
-    print(f"DEBUG: found {len(todos)} todos for stats")
-    
-    total = len(todos)
-    completed = len([t for t in todos if t.is_completed])
-    pending = total - completed
-    rate = (completed / total * 100) if total > 0 else 0
-
-    
-    priority_map = {"high": 0, "medium": 0, "low": 0}
-    for t in todos:
-        p = t.priority.lower() if t.priority else "medium"
-        if p in priority_map:
-            priority_map[p] += 1
-            
-    return TodoStats(
-        total_tasks=total,
-        completed_tasks=completed,
-        pending_tasks=pending,
-        completion_rate=round(rate, 2),
-        priority_breakdown=priority_map
-    )
+    # SP-1.1: 304 from the user's data version, without aggregating the todo table
+    not_modified = conditional_get(request, response, session, current_user.id, "todos")
+    if not_modified:
+        return not_modified
+    return compute_todo_stats(session, current_user.id)
 
 
 @router.post("", response_model=TodoRead)
 async def create_todo(
     todo_in: TodoCreate,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
+    # Writes run as one threadpool call on a sync session (see database.run_write)
+    return await run_write(_create_todo, todo_in, current_user)
+
+def _create_todo(session: Session, todo_in: TodoCreate, current_user: User) -> Todo:
     # Ensure description is not None for database constraint parity
     if todo_in.description is None:
         todo_in.description = ""
@@ -54,66 +62,202 @@ async def create_todo(
     todo = Todo.model_validate(todo_in, update={"user_id": current_user.id})
 
     session.add(todo)
+    # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+    add_event(session, "task-events", {
+        "type": "task_created",
+        "user_id": current_user.id,
+        "task_id": str(todo.id),
+        "title": todo.title
+    })
     session.commit()
-    session.refresh(todo)
-    
-    # SP-1.5: Schedule reminder via Dapr Jobs API if needed
-    if todo.reminder_time:
-        try:
-            from dapr_client import dapr
-            # Schedule a job to fire at reminder_time
-            await dapr.invoke_service("app", "jobs/reminders", {
-                "jobId": f"reminder-{todo.id}",
-                "dueTime": todo.reminder_time.isoformat(),
-                "data": {"task_id": str(todo.id), "title": todo.title}
-            })
-        except: pass
-
-    # SP-2: Emit event via Dapr
-    try:
-        from dapr_client import dapr
-        await dapr.publish_event("pubsub", "task-events", {
-            "type": "task_created",
-            "user_id": current_user.id,
-            "task_id": str(todo.id),
-            "title": todo.title
-        })
-    except Exception as e:
-        print(f"DEBUG: Failed to emit dapr event: {e}")
-        
+    outbox_relay.notify()
+    # SP-1.5: Schedule the reminder (if any) with the in-process scheduler
+    reminder_scheduler.track(todo)
+
     return todo
 
+MAX_BATCH_OPERATIONS = 500
+
+@router.post("/batch", response_model=TodoBatchResponse)
+async def batch_todos(
+    batch: TodoBatchRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Apply mixed create/update/delete operations in one transaction
+
+    Valid operations are written with one bulk INSERT, one executemany UPDATE
+    and one DELETE; invalid ones are reported per item and skipped.
+    """
+    return await run_write(_batch_todos, batch, current_user)
+
+def _batch_todos(session: Session, batch: TodoBatchRequest, current_user: User) -> TodoBatchResponse:
+    if len(batch.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+
+    results: List[Optional[TodoBatchItemResult]] = [None] * len(batch.operations)
+    creates = []  # (index, row)
+    updates = {}  # id -> (index, changes)
+    deletes = {}  # id -> index
+
+    def fail(index: int, op: TodoBatchOperation, detail: str):
+        results[index] = TodoBatchItemResult(index=index, op=op.op, status="error", id=op.id, detail=detail)
+
+    # 1. Validate every operation without touching the database
+    for i, op in enumerate(batch.operations):
+        if op.op == "create":
+            try:
+                todo_in = TodoCreate.model_validate(op.data or {})
+            except ValidationError as e:
+                fail(i, op, str(e))
+                continue
+            if todo_in.description is None:
+                todo_in.description = ""
+            row = Todo.model_validate(todo_in, update={"user_id": current_user.id}).model_dump()
+            row["priority_rank"] = priority_rank(row["priority"])
+            creates.append((i, row))
+        elif op.op in ("update", "delete"):
+            if op.id is None:
+                fail(i, op, "id is required")
+            elif op.id in updates or op.id in deletes:
+                fail(i, op, "Duplicate id in batch")
+            elif op.op == "delete":
+                deletes[op.id] = i
+            else:
+                try:
+                    changes = TodoUpdate.model_validate(op.data or {}).model_dump(exclude_unset=True)
+                except ValidationError as e:
+                    fail(i, op, str(e))
+                    continue
+                updates[op.id] = (i, changes)
+        else:
+            fail(i, op, f"Unknown op: {op.op}")
+
+    # 2. One ownership lookup for every referenced todo
+    target_ids = list(updates) + list(deletes)
+    existing = {}
+    if target_ids:
+        statement = select(Todo).where(Todo.id.in_(target_ids), Todo.user_id == current_user.id)
+        existing = {todo.id: TodoRead.model_validate(todo) for todo in session.exec(statement)}
+    for todo_id in target_ids:
+        if todo_id not in existing:
+            index = updates.pop(todo_id)[0] if todo_id in updates else deletes.pop(todo_id)
+            fail(index, batch.operations[index], "Todo not found")
+
+    # 3. Bulk statements (ORM events don't run for these, so derived columns are set here)
+    now = datetime.utcnow()
+    if creates:
+        session.exec(insert(Todo), params=[row for _, row in creates])
+    update_rows = []
+    for todo_id, (_, changes) in updates.items():
+        if not changes:
+            continue
+        row = {"id": todo_id, **changes, "updated_at": now}
+        if "priority" in changes:
+            row["priority_rank"] = priority_rank(changes["priority"])
+        if "reminder_time" in changes:
+            row["reminder_sent_at"] = None
+        update_rows.append(row)
+    if update_rows:
+        session.exec(update(Todo), params=update_rows)
+    if deletes:
+        session.exec(
+            delete(Todo).where(Todo.id.in_(list(deletes)), Todo.user_id == current_user.id),
+            execution_options={"synchronize_session": False},
+        )
+        record_tombstones(session.connection(), current_user.id, list(deletes))
+    # Updates with no changes write nothing, so they leave the ETags alone
+    if creates or update_rows or deletes:
+        bump_data_version(session.connection(), current_user.id, "todos")
+
+    # 4. Per-item results and the matching task-events, committed with the changes
+    events = []
+    reminders = []
+    for i, row in creates:
+        todo = TodoRead.model_validate(row)
+        results[i] = TodoBatchItemResult(index=i, op="create", status="ok", id=todo.id, todo=todo)
+        events.append({"type": "task_created", "user_id": current_user.id, "task_id": str(todo.id), "title": todo.title})
+        if todo.reminder_time:
+            reminders.append(todo)
+    for todo_id, (i, changes) in updates.items():
+        todo = existing[todo_id].model_copy(update={**changes, "updated_at": now} if changes else {})
+        results[i] = TodoBatchItemResult(index=i, op="update", status="ok", id=todo_id, todo=todo)
+        if "reminder_time" in changes or "is_completed" in changes:
+            reminders.append(todo)
+        events.append({"type": "task_updated", "user_id": current_user.id, "task_id": str(todo_id), "is_completed": todo.is_completed})
+    for todo_id, i in deletes.items():
+        results[i] = TodoBatchItemResult(index=i, op="delete", status="ok", id=todo_id)
+        events.append({"type": "task_deleted", "user_id": current_user.id, "task_id": str(todo_id)})
+
+    # SP-2: Stage all events in the outbox; the relay sends them with bulk publish
+    add_events(session, "task-events", events)
+    session.commit()
+    outbox_relay.notify()
+
+    # SP-1.5: Reschedule reminders of created and updated todos
+    for todo in reminders:
+        reminder_scheduler.track(todo)
+    reminder_scheduler.cancel(deletes)
+
+    return TodoBatchResponse(results=results)
+
+# SP-1.1: Sort orders, each ending in id so keyset cursors are unambiguous
+TODO_SORTS = {
+    "created_at": [SortKey(Todo.created_at, descending=True), SortKey(Todo.id, descending=True)],
+    "due_date": [SortKey(Todo.due_date, nullable=True), SortKey(Todo.id)],
+    "priority": [
+        SortKey(Todo.priority_rank, descending=True),
+        SortKey(Todo.created_at, descending=True),
+        SortKey(Todo.id, descending=True),
+    ],
+}
+
+def _todo_query(
+    user_id: str,
+    search: Optional[str],
+    priority: Optional[str],
+    is_completed: Optional[bool],
+    sort_by: Optional[str],
+):
+    statement = select(Todo).where(Todo.user_id == user_id)
+    
+    # SP-1.1: Search (full-text where available), filter
+    rank = None
+    if search:
+        statement, rank = search_module.search_backend.apply(
+            statement, search, user_id, ranked=(sort_by == "relevance")
+        )
+    if priority:
+        statement = statement.where(Todo.priority == priority)
+    if is_completed is not None:
+        statement = statement.where(Todo.is_completed == is_completed)
+
+    keys = TODO_SORTS.get(sort_by, TODO_SORTS["created_at"])
+    return statement, keys, rank
+
 @router.get("", response_model=List[TodoRead])
 def read_todos(
+    request: Request,
+    response: Response,
     offset: int = 0,
     limit: int = Query(default=100, le=100),
     search: Optional[str] = None,
     priority: Optional[str] = None,
     is_completed: Optional[bool] = None,
-    sort_by: Optional[str] = Query(default="created_at"), # "created_at", "due_date", "priority"
-    session: Session = Depends(get_session),
+    sort_by: Optional[str] = Query(default="created_at"), # "created_at", "due_date", "priority", "relevance"
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user),
 ):
     print(f"DEBUG: read_todos for user {current_user.id}")
+    not_modified = conditional_get(request, response, session, current_user.id, "todos")
+    if not_modified:
+        return not_modified
     try:
-        statement = select(Todo).where(Todo.user_id == current_user.id)
-        
-        # SP-1.1: Search, filter
-        if search:
-            statement = statement.where(Todo.title.contains(search) | Todo.description.contains(search))
-        if priority:
-            statement = statement.where(Todo.priority == priority)
-        if is_completed is not None:
-            statement = statement.where(Todo.is_completed == is_completed)
-            
-        # SP-1.1: Sort
-        if sort_by == "due_date":
-            statement = statement.order_by(Todo.due_date.asc())
-        elif sort_by == "priority":
-            statement = statement.order_by(Todo.priority.desc())
+        statement, keys, rank = _todo_query(current_user.id, search, priority, is_completed, sort_by)
+        if sort_by == "relevance" and rank is not None:
+            statement = statement.order_by(rank, Todo.id)
         else:
-            statement = statement.order_by(Todo.created_at.desc())
-
+            statement = apply_sort(statement, keys)
         statement = statement.offset(offset).limit(limit)
         todos = session.exec(statement).all()
         return todos
@@ -121,13 +265,94 @@ def read_todos(
         print(f"DEBUG: error in read_todos: {e}")
         raise e
 
+@router.get("/page", response_model=TodoPage)
+def read_todos_page(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    search: Optional[str] = None,
+    priority: Optional[str] = None,
+    is_completed: Optional[bool] = None,
+    sort_by: Optional[str] = Query(default="created_at"), # "created_at", "due_date", "priority"
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Keyset-paginated variant of GET /todos; follow next_cursor until it is null"""
+    not_modified = conditional_get(request, response, session, current_user.id, "todos")
+    if not_modified:
+        return not_modified
+    if sort_by not in TODO_SORTS:
+        sort_by = "created_at"
+    statement, keys, _ = _todo_query(current_user.id, search, priority, is_completed, sort_by)
+
+    if cursor:
+        try:
+            values = decode_cursor(cursor, sort_by, keys)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        statement = apply_keyset(statement, keys, values)
+
+    # Fetch one extra row to know whether another page exists
+    todos = session.exec(apply_sort(statement, keys).limit(limit + 1)).all()
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        next_cursor = encode_cursor(sort_by, cursor_values(todos[-1], keys))
+
+    return TodoPage(items=todos, next_cursor=next_cursor)
+
+@router.get("/changes", response_model=TodoChanges)
+def read_todo_changes(
+    since: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Delta sync: todos created, updated or deleted since the token returned by
+    the previous call. Omit since for the initial snapshot; on 410 the token
+    is too old and the client must reload the full list.
+    """
+    try:
+        changes = changes_since(session, current_user.id, since, limit)
+    except SyncTokenExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    maybe_purge_tombstones(session)
+    return changes
+
+@router.get("/stream")
+async def stream_todo_changes(
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Server-Sent Events feed of this user's todo changes: `ready` with the
+    current version, then `task` (a task-event from this instance), `changed`
+    (any other write) and `resync` (the client fell behind and should reload),
+    with keep-alive comments in between
+    """
+    version = await data_version_async(session, current_user.id, "todos")
+    # The stream can stay open for hours; don't hold a pooled connection for it
+    await session.close()
+    subscription = change_hub.subscribe(current_user.id, version)
+    return StreamingResponse(
+        change_hub.stream(subscription, version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.put("/{todo_id}", response_model=TodoRead)
 async def update_todo(
     todo_id: uuid.UUID,
     todo_in: TodoUpdate,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
+    return await run_write(_update_todo, todo_id, todo_in, current_user)
+
+def _update_todo(session: Session, todo_id: uuid.UUID, todo_in: TodoUpdate, current_user: User) -> Todo:
     statement = select(Todo).where(Todo.id == todo_id, Todo.user_id == current_user.id)
     todo = session.exec(statement).first()
     if not todo:
@@ -136,46 +361,47 @@ async def update_todo(
     todo_data = todo_in.model_dump(exclude_unset=True)
     for key, value in todo_data.items():
         setattr(todo, key, value)
+    if "reminder_time" in todo_data:
+        # A new reminder time is a new reminder
+        todo.reminder_sent_at = None
         
     session.add(todo)
+    # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+    add_event(session, "task-events", {
+        "type": "task_updated",
+        "user_id": current_user.id,
+        "task_id": str(todo.id),
+        "is_completed": todo.is_completed
+    })
     session.commit()
-    session.refresh(todo)
-    
-    # SP-2: Emit event via Dapr
-    try:
-        from dapr_client import dapr
-        await dapr.publish_event("pubsub", "task-events", {
-            "type": "task_updated",
-            "user_id": current_user.id,
-            "task_id": str(todo.id),
-            "is_completed": todo.is_completed
-        })
-    except: pass
+    outbox_relay.notify()
+    if "reminder_time" in todo_data or "is_completed" in todo_data:
+        reminder_scheduler.track(todo)
     
     return todo
 
 @router.delete("/{todo_id}")
 async def delete_todo(
     todo_id: uuid.UUID,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
+    return await run_write(_delete_todo, todo_id, current_user)
+
+def _delete_todo(session: Session, todo_id: uuid.UUID, current_user: User) -> dict:
     statement = select(Todo).where(Todo.id == todo_id, Todo.user_id == current_user.id)
     todo = session.exec(statement).first()
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
         
     session.delete(todo)
+    # SP-2: Stage the task event in the same transaction (relayed to Dapr by the outbox)
+    add_event(session, "task-events", {
+        "type": "task_deleted",
+        "user_id": current_user.id,
+        "task_id": str(todo_id)
+    })
     session.commit()
-    
-    # SP-2: Emit event via Dapr
-    try:
-        from dapr_client import dapr
-        await dapr.publish_event("pubsub", "task-events", {
-            "type": "task_deleted",
-            "user_id": current_user.id,
-            "task_id": str(todo_id)
-        })
-    except: pass
+    outbox_relay.notify()
+    reminder_scheduler.cancel([todo_id])
     
     return {"ok": True}
@@ -0,0 +1,223 @@
+"""
+Todo Full-Text Search
+
+Pluggable search backends used by read_todos:
+- SQLite: FTS5 table `todo_fts`, kept in sync with `todo` by triggers
+- PostgreSQL: `search_vector` tsvector column with a GIN index, both built by migrations
+- Fallback: the original LIKE '%term%' scan, used when neither is available
+
+The FTS backends match every word of the query as a prefix ("gro milk" finds
+"Buy groceries and milk"). apply() returns the filtered statement plus, when
+ranked=True, an ORDER BY clause ranking results by relevance (always None for
+the LIKE fallback).
+The statement must already be restricted to the given user.
+"""
+
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, text
+from sqlalchemy.exc import OperationalError
+
+from models import Todo
+
+logger = logging.getLogger(__name__)
+
+# How often the PostgreSQL backend checks whether its index has been built
+SEARCH_READY_CHECK_SECONDS = float(os.getenv("SEARCH_READY_CHECK_SECONDS", "60"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_ID_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def query_terms(search: str) -> list:
+    return _WORD.findall(search.lower())
+
+
+class LikeSearchBackend:
+    """Substring matching; cannot use an index"""
+    name = "like"
+
+    def install(self, engine):
+        pass
+
+    def apply(self, statement, search: str, user_id: str, ranked: bool = False):
+        statement = statement.where(Todo.title.contains(search) | Todo.description.contains(search))
+        return statement, None
+
+
+class SQLiteFTSBackend:
+    """
+    FTS5 index over todo.title/description.
+
+    todo has no INTEGER PRIMARY KEY, so its implicit rowid can be renumbered by
+    VACUUM and can't address index entries. Each todo instead gets a row in
+    todo_fts_key, whose INTEGER PRIMARY KEY is stable, and that key is the
+    index entry's rowid; queries map it back to todo.id.
+    """
+    name = "sqlite-fts5"
+
+    _KEY = "(SELECT id FROM todo_fts_key WHERE todo_id = {}.id)"
+
+    # user_id is indexed too so MATCH only ever scores the requesting user's rows
+    DDL = [
+        "CREATE TABLE IF NOT EXISTS todo_fts_key (id INTEGER PRIMARY KEY, todo_id CHAR(32) NOT NULL UNIQUE)",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS todo_fts USING fts5(
+            user_id, title, description,
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS todo_fts_ai AFTER INSERT ON todo BEGIN
+            INSERT INTO todo_fts_key(todo_id) VALUES (new.id);
+            INSERT INTO todo_fts(rowid, user_id, title, description)
+            VALUES ({_KEY.format("new")}, new.user_id, new.title, new.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS todo_fts_ad AFTER DELETE ON todo BEGIN
+            DELETE FROM todo_fts WHERE rowid = {_KEY.format("old")};
+            DELETE FROM todo_fts_key WHERE todo_id = old.id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS todo_fts_au AFTER UPDATE OF user_id, title, description ON todo BEGIN
+            UPDATE todo_fts SET user_id = new.user_id, title = new.title, description = new.description
+            WHERE rowid = {_KEY.format("new")};
+        END""",
+        # Default rank: bm25 ignoring user_id, with title matches weighted double
+        "INSERT INTO todo_fts(todo_fts, rank) VALUES ('rank', 'bm25(0.0, 2.0, 1.0)')",
+    ]
+
+    _MATCHES = "FROM todo_fts JOIN todo_fts_key ON todo_fts_key.id = todo_fts.rowid WHERE todo_fts MATCH :fts_query"
+
+    def install(self, engine):
+        with engine.begin() as conn:
+            installed = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todo_fts_key'"
+            ).first()
+            if not installed:
+                # Replace the index from before todo_fts_key, which was keyed on todo.rowid
+                for trigger in ("todo_fts_ai", "todo_fts_ad", "todo_fts_au"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.exec_driver_sql("DROP TABLE IF EXISTS todo_fts")
+            for ddl in self.DDL:
+                conn.exec_driver_sql(ddl)
+            if not installed:
+                # Index rows that were written before the triggers existed
+                self._populate(conn)
+
+    def rebuild(self, engine):
+        """Re-index every todo from scratch; only needed to repair a damaged index"""
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM todo_fts")
+            conn.exec_driver_sql("DELETE FROM todo_fts_key")
+            self._populate(conn)
+
+    @staticmethod
+    def _populate(conn):
+        conn.exec_driver_sql("INSERT INTO todo_fts_key(todo_id) SELECT id FROM todo")
+        conn.exec_driver_sql(
+            """INSERT INTO todo_fts(rowid, user_id, title, description)
+            SELECT todo_fts_key.id, todo.user_id, todo.title, todo.description
+            FROM todo JOIN todo_fts_key ON todo_fts_key.todo_id = todo.id"""
+        )
+
+    @staticmethod
+    def _match_query(search: str, user_id: str) -> Optional[str]:
+        terms = query_terms(search)
+        if not terms:
+            return None
+        # unicode61 splits ids on punctuation, so match them as a phrase of their tokens
+        user_phrase = " ".join(_ID_TOKEN.findall(user_id.lower()))
+        words = " ".join(f'"{t}"*' for t in terms)
+        return f'user_id : "{user_phrase}" AND {{title description}} : ({words})'
+
+    def apply(self, statement, search: str, user_id: str, ranked: bool = False):
+        match = self._match_query(search, user_id)
+        if match is None:
+            return LikeSearchBackend().apply(statement, search, user_id)
+        if not ranked:
+            # Scoring every hit is the expensive part; skip it unless ordering by relevance
+            matches = text(f"SELECT todo_fts_key.todo_id {self._MATCHES}").bindparams(fts_query=match)
+            return statement.where(literal_column("todo.id").in_(matches)), None
+        fts = (
+            text(f"SELECT todo_fts_key.todo_id AS fts_todo_id, todo_fts.rank AS fts_rank {self._MATCHES}")
+            .bindparams(fts_query=match)
+            .columns(column("fts_todo_id"), column("fts_rank"))
+            .subquery("fts")
+        )
+        statement = statement.join(fts, fts.c.fts_todo_id == literal_column("todo.id"))
+        # FTS5 rank is bm25(), which is lower for better matches
+        return statement, fts.c.fts_rank.asc()
+
+
+class PostgresFTSBackend:
+    """
+    tsvector column plus GIN index, queried with prefix tsqueries. Migrations
+    16-18 create both (see migrations.py); until the index is built, searches
+    use the LIKE scan.
+    """
+    name = "postgres-tsvector"
+
+    INDEX_MIGRATION = 18
+
+    def __init__(self):
+        self.engine = None
+        self.ready = False
+        self._checked_at = None
+
+    def install(self, engine):
+        self.engine = engine
+        self._check_ready()
+
+    def _check_ready(self) -> bool:
+        # Another instance may run the background migrations, so ask the database
+        if not self.ready and (self._checked_at is None or time.monotonic() - self._checked_at >= SEARCH_READY_CHECK_SECONDS):
+            self._checked_at = time.monotonic()
+            with self.engine.connect() as conn:
+                self.ready = conn.execute(
+                    text("SELECT 1 FROM schema_migration WHERE version = :version"), {"version": self.INDEX_MIGRATION}
+                ).first() is not None
+            if self.ready:
+                logger.info("Todo search: tsvector index ready")
+        return self.ready
+
+    @staticmethod
+    def _tsquery(search: str):
+        terms = query_terms(search)
+        if not terms:
+            return None
+        return func.to_tsquery("simple", " & ".join(f"{t}:*" for t in terms))
+
+    def apply(self, statement, search: str, user_id: str, ranked: bool = False):
+        tsquery = self._tsquery(search)
+        if tsquery is None or not self._check_ready():
+            return LikeSearchBackend().apply(statement, search, user_id)
+        search_vector = literal_column("todo.search_vector")
+        statement = statement.where(search_vector.op("@@")(tsquery))
+        return statement, (func.ts_rank(search_vector, tsquery).desc() if ranked else None)
+
+
+search_backend = LikeSearchBackend()
+
+
+def install_search_backend(engine):
+    """Pick and install the best search backend for the engine's dialect"""
+    global search_backend
+
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        backend = SQLiteFTSBackend()
+    elif dialect == "postgresql":
+        backend = PostgresFTSBackend()
+    else:
+        backend = LikeSearchBackend()
+
+    try:
+        backend.install(engine)
+    except OperationalError as e:
+        # e.g. SQLite built without FTS5
+        logger.error(f"Full-text search unavailable, falling back to LIKE: {e}")
+        backend = LikeSearchBackend()
+
+    search_backend = backend
+    logger.info(f"Todo search backend: {backend.name}")
+    return backend
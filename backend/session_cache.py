@@ -0,0 +1,102 @@
+"""
+Authenticated-Session Cache
+
+In-process TTL/LRU cache used by auth.get_current_user so hot sessions
+resolve without touching the database. Entries are keyed by the stripped
+Better Auth session token and never outlive the session's expiresAt.
+
+Staleness window: sessions are created and deleted by Better Auth in the
+Next.js app, not by this service, so there is no sign-out hook to call
+invalidate() from. A session deleted there (sign-out, revocation) keeps
+authenticating on each backend instance that cached it for up to
+SESSION_CACHE_TTL_SECONDS (default 60). Lower it to shorten the window;
+0 disables the cache and every request checks the session table.
+invalidate()/invalidate_user() are for in-process callers.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from models import User
+
+# Longest a revoked session can keep authenticating from the cache (0 disables it)
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+
+
+class SessionCache:
+    """Thread-safe LRU of token -> (user, cache deadline, session expiry)"""
+
+    def __init__(self, ttl_seconds: float = SESSION_CACHE_TTL_SECONDS, max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[User]:
+        """Return the cached user, or None on a miss or an expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user, deadline, expires_at = entry
+            if deadline <= now or expires_at <= datetime.now(timezone.utc):
+                del self._entries[token]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: User, expires_at: datetime):
+        """Cache a resolved session until the TTL or the session expiry, whichever is first"""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+        # Store a detached copy so it survives the request session being closed or expired
+        snapshot = User.model_validate(user.model_dump())
+        with self._lock:
+            self._entries[token] = (snapshot, time.monotonic() + self.ttl_seconds, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        """Drop a single session, e.g. after sign-out"""
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached session belonging to a user"""
+        with self._lock:
+            for token in [t for t, (user, _, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Singleton instance
+session_cache = SessionCache()
@@ -0,0 +1,265 @@
+"""
+SQLite Performance Profile
+
+Connection tuning and write scheduling for SQLite deployments (single node,
+Docker volume, Vercel's /tmp):
+
+- SQLITE_PROFILE selects the PRAGMAs set on every new connection:
+  - standard: WAL + synchronous=NORMAL only (the previous behaviour)
+  - performance (default): adds busy_timeout, a 64 MiB page cache, 256 MiB
+    mmap, in-memory temp tables and an explicit WAL autocheckpoint
+  - ephemeral: performance with synchronous=OFF, for throwaway files such as
+    /tmp/todo.db on Vercel (the default there), where durability is moot
+- Writer queue: SQLite has one writer at a time. Concurrent writers otherwise
+  wait in SQLite's busy handler, which polls with sleeps of up to 100 ms.
+  Instead, a connection takes a process-wide lock on its first
+  INSERT/UPDATE/DELETE and holds it until its transaction ends, and writers
+  are handed the lock in arrival order.
+  The sync and async (aiosqlite) engines of a file share one queue. Readers
+  never take it (WAL lets them run alongside the writer). A writer that waits
+  longer than busy_timeout proceeds and falls back to the busy handler.
+- SqliteOptimizer runs PRAGMA optimize every SQLITE_OPTIMIZE_INTERVAL_SECONDS
+  so the planner statistics follow the data.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_WRITER_QUEUE = os.getenv("SQLITE_WRITER_QUEUE", "true").lower() == "true"
+SQLITE_OPTIMIZE_INTERVAL_SECONDS = float(os.getenv("SQLITE_OPTIMIZE_INTERVAL_SECONDS", "3600"))
+
+_STANDARD = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+_PERFORMANCE = {
+    **_STANDARD,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "cache_size": -65536,  # KiB
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,  # Pages
+}
+SQLITE_PROFILES = {
+    "standard": _STANDARD,
+    "performance": _PERFORMANCE,
+    "ephemeral": {**_PERFORMANCE, "synchronous": "OFF"},
+}
+
+
+def default_profile(url: str) -> str:
+    profile = os.getenv("SQLITE_PROFILE")
+    if profile:
+        if profile not in SQLITE_PROFILES:
+            raise ValueError(f"SQLITE_PROFILE must be one of {', '.join(SQLITE_PROFILES)}")
+        return profile
+    return "ephemeral" if url.startswith("sqlite:////tmp/") and os.environ.get("VERCEL") else "performance"
+
+
+def pragma_listener(profile: str):
+    """Engine "connect" listener applying a profile's PRAGMAs"""
+    pragmas = SQLITE_PROFILES[profile]
+
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return set_sqlite_pragma
+
+
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _hand_over(queue: "SqliteWriterQueue", future: asyncio.Future):
+    # On the waiter's loop: a waiter that timed out or was cancelled passes the lock on
+    if future.done():
+        queue.release()
+    else:
+        future.set_result(None)
+
+
+class SqliteWriterQueue:
+    """
+    FIFO write lock shared by the sync and async engines of one SQLite file.
+    Sync writers block their thread; async writers await on the event loop, so
+    a queued async write doesn't block the loop or hold a thread.
+    """
+
+    def __init__(self, timeout: float = SQLITE_BUSY_TIMEOUT_MS / 1000):
+        self.timeout = timeout
+        self._mutex = threading.Lock()
+        self._held = False
+        self._waiters = deque()  # threading.Event (sync) or (loop, future) (async)
+        self.writes = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def attach(self, engine, async_engine=None):
+        engines = [(engine, self._before_execute)]
+        if async_engine is not None:
+            engines.append((async_engine.sync_engine, self._before_execute_async))
+        for target, before_execute in engines:
+            event.listen(target, "before_cursor_execute", before_execute)
+            event.listen(target, "commit", self._end_transaction)
+            event.listen(target, "rollback", self._end_transaction)
+            event.listen(target, "checkin", self._checkin)
+
+    def _enqueue(self, waiter) -> bool:
+        """Take the lock if it is free (True); otherwise queue the waiter"""
+        with self._mutex:
+            self.writes += 1
+            if not self._held:
+                self._held = True
+                return True
+            self.waits += 1
+            self._waiters.append(waiter)
+            return False
+
+    def _withdraw(self, waiter) -> bool:
+        """Leave the queue after a timeout; False if the lock was handed over meanwhile"""
+        with self._mutex:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            self.timeouts += 1
+        logger.warning("SQLite writer queue wait exceeded busy_timeout; using the busy handler")
+        return True
+
+    def acquire(self) -> bool:
+        granted = threading.Event()
+        if self._enqueue(granted) or granted.wait(self.timeout):
+            return True
+        return not self._withdraw(granted)
+
+    async def acquire_async(self) -> bool:
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        if self._enqueue(waiter):
+            return True
+        try:
+            await asyncio.wait_for(waiter[1], self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            # If the lock was already handed over, _hand_over sees the cancelled future and passes it on
+            self._withdraw(waiter)
+            return False
+        except asyncio.CancelledError:
+            with self._mutex:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        with self._mutex:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_hand_over, self, future)
+                    return
+            self._held = False
+
+    def _is_first_write(self, conn, statement: str) -> bool:
+        return "sqlite_writer" not in conn.info and statement.lstrip()[:7].upper().startswith(_WRITE_VERBS)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._is_first_write(conn, statement):
+            # Remember the outcome either way, so a timed-out writer doesn't wait again
+            conn.info["sqlite_writer"] = self.acquire()
+
+    def _before_execute_async(self, conn, cursor, statement, parameters, context, executemany):
+        if self._is_first_write(conn, statement):
+            # Async engines run this in SQLAlchemy's greenlet, which can await the loop
+            conn.info["sqlite_writer"] = await_only(self.acquire_async())
+
+    def _end_transaction(self, conn):
+        # Fires just before COMMIT/ROLLBACK; by the time the next writer is
+        # running it has normally finished, else it waits in the busy handler
+        if conn.info.pop("sqlite_writer", False):
+            self.release()
+
+    def _checkin(self, dbapi_connection, connection_record):
+        # Connections returned without an explicit commit or rollback
+        if connection_record.info.pop("sqlite_writer", False):
+            self.release()
+
+    def stats(self) -> dict:
+        with self._mutex:
+            return {"writes": self.writes, "waits": self.waits, "timeouts": self.timeouts, "queued": len(self._waiters)}
+
+
+# One queue per database file, shared by every engine that writes to it
+_writer_queues: Dict[str, SqliteWriterQueue] = {}
+_writer_queues_lock = threading.Lock()
+
+
+def configure_sqlite(engine, async_engine=None, profile: str = "performance", writer_queue: bool = SQLITE_WRITER_QUEUE):
+    """Apply a profile to an engine pair for one SQLite file; returns its writer queue, if any"""
+    listener = pragma_listener(profile)
+    event.listen(engine, "connect", listener)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", listener)
+    if not writer_queue:
+        return None
+    path = os.path.abspath(engine.url.database)
+    with _writer_queues_lock:
+        queue = _writer_queues.setdefault(path, SqliteWriterQueue())
+    queue.attach(engine, async_engine)
+    return queue
+
+
+def writer_queue_stats() -> dict:
+    with _writer_queues_lock:
+        return {path: queue.stats() for path, queue in _writer_queues.items()}
+
+
+def optimize(engine):
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA optimize")
+
+
+class SqliteOptimizer:
+    """Periodic PRAGMA optimize; a no-op for other databases"""
+
+    def __init__(self, interval: float = SQLITE_OPTIMIZE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+
+    async def start(self, engine):
+        if self._task is None and self.interval > 0 and engine.dialect.name == "sqlite":
+            self._task = asyncio.create_task(self._run(engine))
+            logger.info("SQLite optimizer started")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            logger.info("SQLite optimizer stopped")
+
+    async def _run(self, engine):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(optimize, engine)
+                self.runs += 1
+            except Exception as e:
+                logger.error(f"SQLite optimize failed: {e}")
+
+
+# Singleton instance
+sqlite_optimizer = SqliteOptimizer()
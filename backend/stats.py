@@ -0,0 +1,46 @@
+"""
+Todo Stats Engine
+
+Computes the dashboard statistics with a single GROUP BY over
+(is_completed, priority), answered from the covering index
+ix_todo_user_completed_priority instead of loading every Todo row.
+"""
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from models import Todo, TodoStats
+
+PRIORITY_LEVELS = ("high", "medium", "low")
+
+
+def compute_todo_stats(session: Session, user_id: str) -> TodoStats:
+    """Aggregate completion and priority counts for a user's todos"""
+    statement = (
+        select(Todo.is_completed, Todo.priority, func.count())
+        .where(Todo.user_id == user_id)
+        .group_by(Todo.is_completed, Todo.priority)
+    )
+
+    total = 0
+    completed = 0
+    priority_map = {p: 0 for p in PRIORITY_LEVELS}
+
+    # At most a handful of groups per user, so normalizing in Python is free
+    for is_completed, priority, count in session.exec(statement):
+        total += count
+        if is_completed:
+            completed += count
+        p = priority.lower() if priority else "medium"
+        if p in priority_map:
+            priority_map[p] += count
+
+    rate = (completed / total * 100) if total > 0 else 0
+
+    return TodoStats(
+        total_tasks=total,
+        completed_tasks=completed,
+        pending_tasks=total - completed,
+        completion_rate=round(rate, 2),
+        priority_breakdown=priority_map
+    )
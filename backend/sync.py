@@ -0,0 +1,130 @@
+"""
+Delta Sync
+
+Clients keep a local copy of their todos and poll GET /todos/changes with the
+token from the previous response instead of reloading the whole list. Changed
+rows come from ix_todo_user_updated_id and deletions from the todo_tombstone
+table, so a poll with nothing new costs two index probes that return no rows.
+
+A token is a keyset position (timestamp, id) in the merged stream of updated
+todos and tombstones, and never moves backwards. At the end of the stream it is
+held SYNC_SETTLE_SECONDS behind the clock: a transaction that stamped
+updated_at just before a slow commit is still picked up by the next poll, at
+the price of recent changes being sent twice (clients apply items as upserts).
+
+Tombstones are kept for SYNC_TOMBSTONE_RETENTION_DAYS; older tokens are
+rejected as expired and the client must reload the full list.
+
+Until migration 9 has backfilled updated_at, rows without one sort first, as
+if changed at the epoch, so no token ever holds a NULL. Each is sent again
+once the backfill stamps it.
+"""
+
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from models import Todo, TodoChanges, TodoRead, TodoTombstone
+from pagination import SortKey, apply_sort, apply_keyset, encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "5"))
+SYNC_TOMBSTONE_RETENTION_DAYS = float(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+SYNC_PURGE_INTERVAL_SECONDS = float(os.getenv("SYNC_PURGE_INTERVAL_SECONDS", "3600"))
+
+TOKEN_KIND = "changes"
+_MIN_ID = uuid.UUID(int=0)
+_NULL_UPDATED_AT = datetime(1970, 1, 1)
+_TODO_KEYS = [SortKey(Todo.updated_at), SortKey(Todo.id)]
+_TOMBSTONE_KEYS = [SortKey(TodoTombstone.deleted_at), SortKey(TodoTombstone.todo_id)]
+
+_last_purge = time.monotonic()
+
+
+class SyncTokenExpired(ValueError):
+    """The token predates the tombstone retention window"""
+
+
+def decode_token(token: str) -> tuple:
+    """Decode a sync token, raising ValueError if it is malformed"""
+    try:
+        return tuple(decode_cursor(token, TOKEN_KIND, _TODO_KEYS))
+    except ValueError:
+        raise ValueError("Invalid sync token")
+
+
+def changes_since(session: Session, user_id: str, since: Optional[str], limit: int) -> TodoChanges:
+    """
+    Todos changed and deleted after the token, oldest first. Without a token
+    this is the initial snapshot (every todo, no deletions), paged the same way.
+    """
+    now = datetime.utcnow()
+    position = decode_token(since) if since else None
+    # Tokens at the epoch are still inside the initial snapshot's NULL rows
+    in_nulls = position is None or position[0] == _NULL_UPDATED_AT
+    if not in_nulls and position[0] < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise SyncTokenExpired("Sync token expired; reload the full list")
+
+    statement = select(Todo).where(Todo.user_id == user_id)
+    if position:
+        statement = apply_keyset(statement, _TODO_KEYS, list(position))
+    else:
+        statement = statement.where(Todo.updated_at.is_not(None))
+    changes = [((todo.updated_at, todo.id), todo) for todo in session.exec(apply_sort(statement, _TODO_KEYS).limit(limit + 1))]
+
+    if in_nulls:
+        statement = select(Todo).where(Todo.user_id == user_id, Todo.updated_at.is_(None))
+        if position:
+            statement = statement.where(Todo.id > position[1])
+        changes += [((_NULL_UPDATED_AT, todo.id), todo) for todo in session.exec(statement.order_by(Todo.id).limit(limit + 1))]
+
+    if position:
+        statement = apply_keyset(select(TodoTombstone).where(TodoTombstone.user_id == user_id), _TOMBSTONE_KEYS, list(position))
+        changes += [((row.deleted_at, row.todo_id), None) for row in session.exec(apply_sort(statement, _TOMBSTONE_KEYS).limit(limit + 1))]
+
+    changes.sort(key=lambda change: change[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    if has_more:
+        next_position = changes[-1][0]
+    else:
+        next_position = (now - timedelta(seconds=SYNC_SETTLE_SECONDS), _MIN_ID)
+        if changes:
+            next_position = min(next_position, changes[-1][0])
+        if position:
+            next_position = max(next_position, position)
+
+    return TodoChanges(
+        items=[TodoRead.model_validate(todo) for _, todo in changes if todo is not None],
+        deleted=[key[1] for key, todo in changes if todo is None],
+        next_token=encode_cursor(TOKEN_KIND, list(next_position)),
+        has_more=has_more,
+    )
+
+
+def purge_tombstones(session: Session) -> int:
+    """Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    result = session.execute(delete(TodoTombstone).where(TodoTombstone.deleted_at < cutoff))
+    session.commit()
+    if result.rowcount:
+        logger.info(f"Delta sync: deleted {result.rowcount} expired tombstones")
+    return result.rowcount
+
+
+def maybe_purge_tombstones(session: Session):
+    global _last_purge
+    if time.monotonic() - _last_purge >= SYNC_PURGE_INTERVAL_SECONDS:
+        _last_purge = time.monotonic()
+        try:
+            purge_tombstones(session)
+        except Exception as e:
+            logger.error(f"Tombstone purge failed: {e}")
@@ -42,7 +42,9 @@ export default function ChatInterface() {
 
     const fetchHistory = async () => {
         try {
-            const convs = await apiFetch(`/chat/${session.data?.user.id}/conversations`);
+            // Only the most recent conversation is shown
+            const page = await apiFetch(`/chat/${session.data?.user.id}/conversations/page?limit=1`);
+            const convs = page?.items;
             if (convs && convs.length > 0) {
                 setConversationId(convs[0].id);
                 const history = await apiFetch(`/chat/${session.data?.user.id}/conversations/${convs[0].id}/messages`);
@@ -0,0 +1,159 @@
+"""
+Benchmark: request latency under mixed load against one uvicorn worker.
+
+Writers (POST/PUT/DELETE /todos), chat turns, stats readers and a GET /health
+probe run together at fixed request rates for --seconds; per request class it
+reports throughput and p50/p99 latency from each request's scheduled start.
+Endpoints that do blocking database work on the event loop show up as tail
+latency for every class, including /health.
+
+Usage (from the repository root):
+    python scripts/bench_async_db.py [--seconds 15] [--write-rate 30] [--read-rate 50]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from bench_common import setup_backend, seed_auth_users, start_server, stop_server, print_table, HttpConnection
+
+DATABASE_URL = setup_backend("bench-async-db")
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from database import engine, create_db_and_tables
+from models import Todo
+
+
+def seed_todos(user_ids: list, per_user: int):
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        for user_id in user_ids:
+            session.execute(insert(Todo), [
+                {"id": uuid.uuid4(), "user_id": user_id, "title": f"Task {i}", "description": "", "created_at": now}
+                for i in range(per_user)
+            ])
+        session.commit()
+
+
+async def bench(args):
+    create_db_and_tables()
+    users = seed_auth_users(engine, args.users)
+    seed_todos([user_id for user_id, _ in users], args.todos_per_user)
+    server, port = start_server(DATABASE_URL)
+    samples = {"write": [], "chat": [], "read": [], "health": []}
+    errors = dict.fromkeys(samples, 0)
+    # Samples from the warm-up (pool connections, first-query setup) are discarded
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.seconds
+    connections = []
+
+    async def timed(kind: str, connection: HttpConnection, scheduled: float, method: str, path: str, body: dict = None):
+        # Latency counts from the scheduled start, so a stalled server can't hide queued requests
+        status, content = await connection.request(method, path, body)
+        if scheduled >= measure_from:
+            samples[kind].append((time.perf_counter() - scheduled) * 1000)
+            errors[kind] += status != 200
+        if status != 200:
+            return None
+        return json.loads(content)
+
+    async def paced(rate: float, workers: int, n: int, step):
+        """Call step(scheduled) at rate/workers per second, offset per worker"""
+        interval = workers / rate
+        scheduled = time.perf_counter() + interval * n / workers
+        while scheduled < deadline:
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await step(scheduled)
+            # A worker that fell behind issues its backlog back to back
+            scheduled += interval
+
+    def connect(token: str) -> HttpConnection:
+        connection = HttpConnection(port, token)
+        connections.append(connection)
+        return connection
+
+    async def writer(n: int):
+        # POST, PUT and DELETE of one todo: three requests per step
+        connection = connect(users[n % len(users)][1])
+
+        async def step(scheduled):
+            todo = await timed("write", connection, scheduled, "POST", "/todos", {"title": "Bench task"})
+            if todo is not None:
+                await timed("write", connection, time.perf_counter(), "PUT", f"/todos/{todo['id']}", {"is_completed": True})
+                await timed("write", connection, time.perf_counter(), "DELETE", f"/todos/{todo['id']}")
+
+        await paced(args.write_rate / 3, args.writers, n, step)
+
+    async def chatter(n: int):
+        # Users of their own: "delete last task" must not race the writers' deletes
+        user_id, token = users[(args.writers + n) % len(users)]
+        connection = connect(token)
+        messages = itertools.cycle(("add task buy milk", "show my pending tasks", "delete last task"))
+        conversation_id = None
+
+        async def step(scheduled):
+            nonlocal conversation_id
+            response = await timed("chat", connection, scheduled, "POST", f"/chat/{user_id}",
+                                   {"message": next(messages), "conversation_id": conversation_id})
+            if response is not None:
+                conversation_id = response["conversation_id"]
+
+        await paced(args.chat_rate, args.chatters, n, step)
+
+    async def reader(n: int):
+        connection = connect(users[n % len(users)][1])
+        await paced(args.read_rate, args.readers, n, lambda scheduled: timed("read", connection, scheduled, "GET", "/todos/stats"))
+
+    async def probe():
+        connection = connect("")
+        await paced(50, 1, 0, lambda scheduled: timed("health", connection, scheduled, "GET", "/health"))
+
+    try:
+        await asyncio.gather(
+            *(writer(n) for n in range(args.writers)),
+            *(chatter(n) for n in range(args.chatters)),
+            *(reader(n) for n in range(args.readers)),
+            probe(),
+        )
+    finally:
+        for connection in connections:
+            connection.close()
+        stop_server(server)
+
+    rows = []
+    for kind, latencies in samples.items():
+        latencies.sort()
+        rows.append((
+            kind, len(latencies), errors[kind], f"{len(latencies) / args.seconds:.0f}",
+            f"{statistics.median(latencies):.1f}",
+            f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f}",
+            f"{latencies[-1]:.1f}",
+        ))
+    print_table(["class", "requests", "errors", "req/s", "p50 ms", "p99 ms", "max ms"], rows)
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--todos-per-user", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--chatters", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--write-rate", type=float, default=30, help="write requests/s")
+    parser.add_argument("--chat-rate", type=float, default=5, help="chat turns/s")
+    parser.add_argument("--read-rate", type=float, default=50, help="GET /todos/stats/s")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,122 @@
+"""
+Benchmark: reading one long conversation's history (--messages messages)
+three ways, each against a fresh uvicorn worker:
+
+- list: GET .../messages, the whole history in one JSON array
+- pages: GET .../messages/page, following next_cursor (--page-size)
+- export: GET .../messages/export, NDJSON streamed in batches
+
+Reports wall time and the server's peak RSS growth over its idle RSS. On
+SQLite that includes the database pages read through mmap and the page
+cache (see sqlite_profile.py), whichever way the history is read; the
+PostgreSQL numbers isolate the endpoint's own memory.
+
+Runs against a throwaway SQLite file, or BENCH_DATABASE_URL (e.g. PostgreSQL).
+
+Usage (from the repository root):
+    python scripts/bench_chat_history.py [--messages 200000] [--page-size 200]
+"""
+
+import argparse
+import json
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from bench_common import setup_backend, seed_auth_users, start_server, stop_server, print_table
+
+DATABASE_URL = setup_backend("bench-chat-history")
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from database import engine, create_db_and_tables
+from models import Conversation, Message
+
+
+def seed_conversation(user_id: str, messages: int) -> int:
+    start = datetime.utcnow() - timedelta(days=30)
+    with Session(engine) as session:
+        conversation = Conversation(user_id=user_id, created_at=start, updated_at=start)
+        session.add(conversation)
+        session.flush()
+        for offset in range(0, messages, 10000):
+            session.execute(insert(Message), [
+                {"user_id": user_id, "conversation_id": conversation.id, "role": "user" if i % 2 == 0 else "assistant",
+                 "content": f"Message {i}: add task buy milk and bread", "tool_calls": '["add_task"]' if i % 2 else None,
+                 "created_at": start + timedelta(seconds=i // 2)}
+                for i in range(offset, min(messages, offset + 10000))
+            ])
+        session.commit()
+        return conversation.id
+
+
+def rss_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=600) as response:
+        return response.read()
+
+
+def read_list(base: str) -> int:
+    return len(json.loads(fetch(base)))
+
+
+def read_pages(base: str, page_size: int) -> int:
+    count, cursor = 0, None
+    while True:
+        page = json.loads(fetch(f"{base}/page?limit={page_size}" + (f"&cursor={cursor}" if cursor else "")))
+        count += len(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return count
+
+
+def read_export(base: str) -> int:
+    count = 0
+    with urllib.request.urlopen(f"{base}/export", timeout=600) as response:
+        # Line by line, as a client that doesn't keep the history would
+        for line in response:
+            count += 1
+    return count
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    [(user_id, _)] = seed_auth_users(engine, 1)
+    conversation_id = seed_conversation(user_id, args.messages)
+
+    modes = {
+        "list": read_list,
+        "pages": lambda base: read_pages(base, args.page_size),
+        "export": read_export,
+    }
+    rows = []
+    for mode, read in modes.items():
+        server, port = start_server(DATABASE_URL)
+        try:
+            idle = rss_kb(server.pid, "VmRSS")
+            start = time.perf_counter()
+            count = read(f"http://127.0.0.1:{port}/chat/{user_id}/conversations/{conversation_id}/messages")
+            elapsed = time.perf_counter() - start
+            peak = rss_kb(server.pid, "VmHWM")
+        finally:
+            stop_server(server)
+        assert count == args.messages, (mode, count)
+        rows.append((mode, count, f"{elapsed:.2f}", f"{(peak - idle) / 1024:.1f}"))
+    print_table(["mode", "messages", "seconds", "peak RSS growth MB"], rows)
+
+
+if __name__ == "__main__":
+    run()
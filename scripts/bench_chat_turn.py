@@ -0,0 +1,158 @@
+"""
+Benchmark: cost and throughput of chat turns (POST /chat/{user_id}).
+
+Every user starts with --tasks tasks (what complete / delete turns pick from).
+
+1. Per turn kind, in-process: SQL statements and COMMITs per turn (across the
+   sync and async engines) and latency, --turns turns in one conversation.
+2. Throughput against one uvicorn worker: --chatters clients, each with its
+   own user and conversation, send add / list / complete / delete turns back
+   to back for --seconds.
+
+Runs against a throwaway SQLite file, or BENCH_DATABASE_URL (e.g. PostgreSQL).
+
+Usage (from the repository root):
+    python scripts/bench_chat_turn.py [--turns 100] [--tasks 1000] [--chatters 8] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bench_common import setup_backend, seed_auth_users, start_server, stop_server, print_table, HttpConnection
+
+DATABASE_URL = setup_backend("bench-chat-turn")
+
+import httpx
+from sqlalchemy import event, insert
+from sqlmodel import Session
+
+from database import engine, async_engine, create_db_and_tables
+from models import Todo
+import main
+
+TURNS = {
+    "add": "add task buy milk",
+    "list": "show my pending tasks",
+    "complete": "complete the first task",
+    "delete": "delete the last task",
+    "unknown": "hello",
+}
+CYCLE = ("add task buy milk", "show my pending tasks", "complete the first task", "delete the last task")
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = self.commits = 0
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self._execute)
+            event.listen(target, "commit", self._commit)
+
+    def _execute(self, *args):
+        self.statements += 1
+
+    def _commit(self, conn):
+        self.commits += 1
+
+
+def seed_todos(user_ids: list, per_user: int):
+    start = datetime.utcnow() - timedelta(days=1)
+    with Session(engine) as session:
+        for user_id in user_ids:
+            session.execute(insert(Todo), [
+                {"id": uuid.uuid4(), "user_id": user_id, "title": f"Task {i}", "description": "",
+                 "created_at": start + timedelta(milliseconds=i)}
+                for i in range(per_user)
+            ])
+        session.commit()
+
+
+async def per_turn_costs(args, user_ids: list) -> list:
+    counter = StatementCounter()
+    rows = []
+    # In-process without the lifespan, so background workers' statements aren't counted
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for (kind, message), user_id in zip(TURNS.items(), user_ids):
+            conversation_id = (await client.post(f"/chat/{user_id}", json={"message": "hello"})).json()["conversation_id"]
+            counter.statements = counter.commits = 0
+            latencies = []
+            for _ in range(args.turns):
+                start = time.perf_counter()
+                response = await client.post(f"/chat/{user_id}", json={"message": message, "conversation_id": conversation_id})
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.text
+            rows.append((
+                kind, f"{counter.statements / args.turns:.1f}", f"{counter.commits / args.turns:.1f}",
+                f"{statistics.median(latencies):.2f}",
+            ))
+    await async_engine.dispose()
+    return rows
+
+
+async def throughput(args, user_ids: list) -> tuple:
+    server, port = start_server(DATABASE_URL)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.warmup + args.seconds
+    measure_from = time.perf_counter() + args.warmup
+
+    async def chatter(user_id: str):
+        nonlocal errors
+        connection = HttpConnection(port)
+        conversation_id = None
+        try:
+            for message in itertools.cycle(CYCLE):
+                start = time.perf_counter()
+                if start >= deadline:
+                    break
+                status, body = await connection.request(
+                    "POST", f"/chat/{user_id}", {"message": message, "conversation_id": conversation_id}
+                )
+                if start >= measure_from:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    errors += status != 200
+                if status == 200:
+                    conversation_id = json.loads(body)["conversation_id"]
+        finally:
+            connection.close()
+
+    try:
+        await asyncio.gather(*(chatter(user_id) for user_id in user_ids))
+    finally:
+        stop_server(server)
+    latencies.sort()
+    return (
+        args.chatters, len(latencies), errors, f"{len(latencies) / args.seconds:.0f}",
+        f"{statistics.median(latencies):.1f}", f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f}",
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=1000, help="tasks per user before the turns")
+    parser.add_argument("--chatters", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    user_ids = [user_id for user_id, _ in seed_auth_users(engine, len(TURNS) + args.chatters)]
+    seed_todos(user_ids, args.tasks)
+
+    print_table(["turn", "statements/turn", "commits/turn", "p50 ms"], asyncio.run(per_turn_costs(args, user_ids[:len(TURNS)])))
+    print()
+    print_table(
+        ["chatters", "turns", "errors", "turns/s", "p50 ms", "p99 ms"],
+        [asyncio.run(throughput(args, user_ids[len(TURNS):]))],
+    )
+
+
+if __name__ == "__main__":
+    run()
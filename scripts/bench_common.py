@@ -0,0 +1,207 @@
+"""
+Shared setup for the backend benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite database (or BENCH_DATABASE_URL
+if set) and imports the backend modules the same way the app does, so
+`import models` resolves relative to backend/.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import statistics
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def setup_backend(name: str = "bench") -> str:
+    """Point DATABASE_URL at a fresh database and put backend/ on sys.path"""
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        db_dir = tempfile.mkdtemp(prefix=f"{name}-")
+        url = f"sqlite:///{os.path.join(db_dir, 'todo.db')}"
+    # Must be set before `database` is imported; load_dotenv() does not override it
+    os.environ["DATABASE_URL"] = url
+    if BACKEND_PATH not in sys.path:
+        sys.path.insert(0, BACKEND_PATH)
+    return url
+
+
+def seed_user(session, user_id: str = None) -> str:
+    """Insert a User row and return its id"""
+    from models import User
+
+    user_id = user_id or str(uuid.uuid4())
+    now = datetime.utcnow()
+    session.add(User(id=user_id, email=f"{user_id}@bench.local", createdAt=now, updatedAt=now))
+    session.commit()
+    return user_id
+
+
+def seed_auth_users(engine, count: int) -> list:
+    """Insert users with Better Auth sessions; returns (user_id, token) pairs"""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from models import Session as DbSession, User
+
+    now = datetime.utcnow()
+    users = [(str(uuid.uuid4()), uuid.uuid4().hex) for _ in range(count)]
+    with Session(engine) as session:
+        session.execute(insert(User), [
+            {"id": user_id, "email": f"{user_id}@bench.local", "createdAt": now, "updatedAt": now}
+            for user_id, _ in users
+        ])
+        session.execute(insert(DbSession), [
+            {"id": token, "userId": user_id, "token": token, "expiresAt": now + timedelta(days=1),
+             "createdAt": now, "updatedAt": now}
+            for user_id, token in users
+        ])
+        session.commit()
+    return users
+
+
+def start_server(database_url: str, *uvicorn_args: str):
+    """Run main:app in a uvicorn subprocess (one worker); returns (process, port) once /health answers"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", *uvicorn_args],
+        cwd=BACKEND_PATH, env={**os.environ, "DATABASE_URL": database_url},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not become ready")
+
+
+def stop_server(process, timeout: float = 30):
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client (Content-Length bodies only)"""
+
+    def __init__(self, port: int, token: str = ""):
+        self.port = port
+        self.token = token
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: dict = None) -> tuple:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {self.token}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def time_call(fn, repeat: int = 20) -> dict:
+    """Run fn repeatedly and return latency percentiles in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "min": samples[0],
+    }
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubSidecar:
+    """
+    Minimal stand-in for the Dapr sidecar's HTTP API: keep-alive HTTP/1.1,
+    answers every request with 204 after `delay` seconds. Counts connections,
+    requests and events (bulk-publish requests carry one event per entry).
+    """
+
+    def __init__(self, port: int, delay: float = 0.0):
+        self.port = port
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.events = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self):
+        """Stop listening and drop open keep-alive connections, like a restarting sidecar"""
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = await reader.readexactly(length)
+                self.requests += 1
+                if b"/publish/bulk/" in head.split(b"\r\n", 1)[0]:
+                    self.events += len(json.loads(body))
+                elif b"/publish/" in head.split(b"\r\n", 1)[0]:
+                    self.events += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(b"HTTP/1.1 204 No Content\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
@@ -0,0 +1,67 @@
+"""
+Benchmark: DaprClient.publish_event with a short-lived vs. a pooled HTTP client.
+
+Starts a stub Dapr sidecar (keep-alive HTTP/1.1, answers every request with
+204) on a local port and publishes --requests events with --concurrency in
+flight, first without calling dapr.start() (a new client and TCP connection
+per call, the old behaviour) and then with the pooled client.
+
+Usage (from the repository root):
+    python scripts/bench_dapr_client.py [--requests 2000] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from bench_common import setup_backend, free_port, StubSidecar, print_table
+
+setup_backend("bench-dapr")
+
+# Must be set before dapr_client is imported
+os.environ["DAPR_HTTP_PORT"] = str(free_port())
+
+from dapr_client import DaprClient, DAPR_HTTP_PORT
+
+
+async def run(client: DaprClient, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await client.publish_event("pubsub", "task-events", {"type": "task_created", "task_id": str(i)})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Per-request success logging would dominate the timings
+    logging.disable(logging.INFO)
+
+    rows = []
+    for label, pooled in [("new client per call", False), ("pooled client", True)]:
+        sidecar = StubSidecar(int(DAPR_HTTP_PORT))
+        await sidecar.start()
+        client = DaprClient()
+        if pooled:
+            await client.start()
+        elapsed = await run(client, args.requests, args.concurrency)
+        await client.close()
+        await sidecar.stop()
+        rows.append((label, args.requests, sidecar.connections, f"{elapsed:.2f}", f"{args.requests / elapsed:.0f}"))
+
+    print(f"{args.requests} publishes, concurrency {args.concurrency}")
+    print_table(["mode", "requests", "TCP connections", "seconds", "req/sec"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Benchmark: dashboard polling of GET /todos and GET /todos/stats, full 200
+responses vs. 304 revalidation with If-None-Match, through the FastAPI app.
+
+Usage (from the repository root):
+    python scripts/bench_etag.py [--sizes 100,1000,10000]
+"""
+
+import argparse
+import logging
+import uuid
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, time_call, print_table
+
+setup_backend("bench-etag")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session
+
+import main
+from auth import get_current_user
+from database import engine, create_db_and_tables
+from models import Todo, User
+
+
+def seed_todos(session: Session, user_id: str, count: int):
+    now = datetime.utcnow()
+    rows = [
+        {"id": uuid.uuid4(), "user_id": user_id, "title": f"Task {i}", "description": "", "created_at": now}
+        for i in range(count)
+    ]
+    session.execute(insert(Todo), rows)
+    session.commit()
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    create_db_and_tables()
+    client = TestClient(main.app)
+    results = []
+    with Session(engine) as session:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            user_id = seed_user(session)
+            seed_todos(session, user_id, size)
+            now = datetime.utcnow()
+            main.app.dependency_overrides[get_current_user] = lambda: User(id=user_id, email="bench", createdAt=now, updatedAt=now)
+
+            for url in ("/todos", "/todos/stats"):
+                etag = client.get(url).headers["etag"]
+                full = time_call(lambda: client.get(url), args.repeat)
+                cached = time_call(lambda: client.get(url, headers={"If-None-Match": etag}), args.repeat)
+                assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+                results.append((
+                    size, url,
+                    f"{full['p50']:.2f}",
+                    f"{cached['p50']:.2f}",
+                    f"{full['p50'] / cached['p50']:.1f}x",
+                ))
+
+    print_table(["todos", "endpoint", "200 p50 ms", "304 p50 ms", "speedup"], results)
+
+
+if __name__ == "__main__":
+    run()
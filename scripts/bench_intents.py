@@ -0,0 +1,70 @@
+"""
+Benchmark: MockAI intent detection over the utterance corpus
+(scripts/intent_corpus.txt), English and Urdu.
+
+Times detect_language + detect_intent per utterance, the work the chat
+endpoint does before it runs a tool, and reports the mean per group.
+
+Usage (from the repository root):
+    python scripts/bench_intents.py [--rounds 2000]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from bench_common import setup_backend, print_table
+
+setup_backend("bench-intents")
+
+from routers.chat import MockAI
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.txt")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    """One utterance per line; \\n stands for a line break, # starts a comment"""
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n").replace("\\n", "\n") for line in f if line.strip() and not line.startswith("#")]
+
+
+def classify(text: str) -> list:
+    language = MockAI.detect_language(text)
+    intent, _ = MockAI.detect_intent(text, language)
+    groups = ["all", language, "add_task" if intent == "add_task" else ("unknown" if intent == "unknown" else "other intents")]
+    if len(text) >= 80:
+        groups.append("long (80+ chars)")
+    return groups
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000, help="passes over each group")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per group; the median is reported")
+    args = parser.parse_args()
+
+    groups = {}
+    for text in load_corpus():
+        for group in classify(text):
+            groups.setdefault(group, []).append(text)
+
+    def detect(texts):
+        for text in texts:
+            MockAI.detect_intent(text, MockAI.detect_language(text))
+
+    rows = []
+    for group, texts in groups.items():
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                detect(texts)
+            runs.append((time.perf_counter() - start) / (args.rounds * len(texts)))
+        per_call = statistics.median(runs)
+        rows.append((group, len(texts), f"{per_call * 1e6:.2f}", f"{1 / per_call:,.0f}"))
+    print_table(["utterances", "count", "us/utterance", "utterances/s"], rows)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,116 @@
+"""
+Benchmark: POST /todos with the transactional outbox, through a sidecar outage.
+
+Runs the FastAPI app in-process with the outbox relay and a stub Dapr sidecar
+that takes --sidecar-delay-ms per request, in three phases:
+
+1. sidecar up: API latency and commit-to-publish latency
+2. sidecar down: API latency stays flat while events pile up in the outbox
+3. sidecar restarted: time until the relay has delivered the backlog
+
+Every committed todo must end up as exactly one delivered event (duplicates
+are possible in general, at-least-once, but not without a crash mid-batch).
+
+Usage (from the repository root):
+    python scripts/bench_outbox.py [--requests 300] [--sidecar-delay-ms 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, free_port, StubSidecar, print_table
+
+setup_backend("bench-outbox")
+
+# Must be set before the backend modules are imported
+os.environ["DAPR_HTTP_PORT"] = str(free_port())
+os.environ.setdefault("OUTBOX_RETRY_BASE_SECONDS", "0.2")
+os.environ.setdefault("OUTBOX_RETRY_MAX_SECONDS", "1")
+
+import httpx
+from sqlmodel import Session
+
+import main
+from auth import get_current_user
+from dapr_client import dapr, DAPR_HTTP_PORT
+from database import engine, create_db_and_tables
+from models import User
+from outbox import outbox_relay
+
+
+async def create_todos(client: httpx.AsyncClient, n: int, label: str) -> list:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        response = await client.post("/todos", json={"title": f"{label} {i}"})
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return sorted(samples)
+
+
+async def wait_until_drained(timeout: float = 120) -> float:
+    start = time.perf_counter()
+    while outbox_relay.stats()["pending"] and time.perf_counter() - start < timeout:
+        await asyncio.sleep(0.05)
+    return time.perf_counter() - start
+
+
+def pct(samples: list, p: float) -> str:
+    return f"{samples[min(len(samples) - 1, int(len(samples) * p))]:.1f}"
+
+
+async def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--sidecar-delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    create_db_and_tables()
+    with Session(engine) as session:
+        user_id = seed_user(session)
+    now = datetime.utcnow()
+    main.app.dependency_overrides[get_current_user] = lambda: User(id=user_id, email="bench", createdAt=now, updatedAt=now)
+
+    delay = args.sidecar_delay_ms / 1000
+    sidecar = StubSidecar(int(DAPR_HTTP_PORT), delay=delay)
+    await sidecar.start()
+    await dapr.start()
+    await outbox_relay.start()
+
+    rows = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        samples = await create_todos(client, args.requests, "up")
+        drained = await wait_until_drained()
+        stats = outbox_relay.stats()
+        rows.append(("sidecar up", pct(samples, 0.5), pct(samples, 0.99), f"{drained:.2f}",
+                     f"{stats['commit_to_publish_ms_p50']}", sidecar.events))
+        delivered_before = sidecar.events
+
+        await sidecar.stop()
+        samples = await create_todos(client, args.requests, "down")
+        pending = outbox_relay.stats()["pending"]
+        rows.append(("sidecar down", pct(samples, 0.5), pct(samples, 0.99), "-", "-", f"0 ({pending} pending)"))
+
+        sidecar = StubSidecar(int(DAPR_HTTP_PORT), delay=delay)
+        await sidecar.start()
+        drained = await wait_until_drained()
+        rows.append(("sidecar restarted", "-", "-", f"{drained:.2f}", "-", sidecar.events))
+
+    await outbox_relay.close()
+    await dapr.close()
+    await sidecar.stop()
+
+    print(f"{args.requests} x POST /todos per phase, sidecar answers in {args.sidecar_delay_ms:.0f} ms")
+    print_table(["phase", "API p50 ms", "API p99 ms", "drain s", "commit-to-publish p50 ms", "events delivered"], rows)
+    total = delivered_before + sidecar.events
+    print(f"delivered {total} of {2 * args.requests} committed events")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
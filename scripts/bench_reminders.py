@@ -0,0 +1,112 @@
+"""
+Benchmark: reminder scheduler with a large number of pending reminders.
+
+Seeds --reminders pending reminders spread over --days days, then measures,
+with a fake clock:
+
+1. startup: loading the first window (time and traced memory of the heap)
+2. firing: advancing the clock so --burst reminders come due at once and
+   sending them through the outbox in batches
+3. incremental: track() calls per second for rescheduled reminders
+
+Usage (from the repository root):
+    python scripts/bench_reminders.py [--reminders 1000000] [--days 30] [--burst 20000]
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from bench_common import setup_backend, seed_user, print_table
+
+setup_backend("bench-reminders")
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from database import engine, create_db_and_tables
+from models import Todo, priority_rank
+from reminders import ReminderScheduler, REMINDER_WINDOW_SECONDS
+
+SEED_CHUNK = 50000
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def seed(user_id: str, count: int, start: datetime, days: float):
+    step = timedelta(days=days) / count
+    for offset in range(0, count, SEED_CHUNK):
+        rows = [
+            {
+                "id": uuid.uuid4(), "user_id": user_id, "title": f"Reminder {i}", "description": "",
+                "is_completed": False, "priority": "medium", "priority_rank": priority_rank("medium"),
+                "recurrence": "none", "tags": "", "created_at": start, "reminder_time": start + step * (i + 1),
+            }
+            for i in range(offset, min(count, offset + SEED_CHUNK))
+        ]
+        with Session(engine) as session:
+            session.execute(insert(Todo), rows)
+            session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reminders", type=int, default=1000000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--burst", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    create_db_and_tables()
+    with Session(engine) as session:
+        user_id = seed_user(session)
+    start = datetime(2026, 10, 18, 9, 0)
+    began = time.perf_counter()
+    seed(user_id, args.reminders, start, args.days)
+    print(f"seeded {args.reminders:,} pending reminders over {args.days:g} days in {time.perf_counter() - began:.1f}s")
+
+    clock = FakeClock(start)
+    scheduler = ReminderScheduler(clock=clock, resync_interval=10 ** 9)
+    rows = []
+
+    tracemalloc.start()
+    began = time.perf_counter()
+    scheduler.tick()
+    elapsed = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    loaded = scheduler.stats()["loaded"]
+    rows.append(("startup load", f"{loaded:,} loaded (window {REMINDER_WINDOW_SECONDS:g}s)",
+                 f"{elapsed * 1000:.0f} ms", f"{peak / 2 ** 20:.1f} MiB peak"))
+
+    # Jump ahead so the next --burst reminders are due at once
+    clock.now = start + timedelta(days=args.days) * (args.burst / args.reminders)
+    began = time.perf_counter()
+    sent = scheduler.tick()
+    elapsed = time.perf_counter() - began
+    rows.append(("burst fire", f"{sent:,} sent", f"{elapsed:.2f} s", f"{sent / elapsed:,.0f} reminders/s"))
+
+    todos = [
+        Todo(id=uuid.uuid4(), user_id=user_id, title="t", reminder_time=clock.now + timedelta(seconds=i % 3000))
+        for i in range(100000)
+    ]
+    began = time.perf_counter()
+    for todo in todos:
+        scheduler.track(todo)
+    elapsed = time.perf_counter() - began
+    rows.append(("track()", f"{len(todos):,} calls", f"{elapsed:.2f} s", f"{len(todos) / elapsed:,.0f} calls/s"))
+
+    print_table(["phase", "volume", "time", "rate / memory"], rows)
+
+
+if __name__ == "__main__":
+    main()
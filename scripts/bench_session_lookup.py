@@ -0,0 +1,101 @@
+"""
+Benchmark: session token resolution on a large Better Auth session table.
+
+Compares the old two-query lookup without an index on session.token against
+the single indexed join used by auth.get_current_user.
+
+Usage (from the repository root):
+    python scripts/bench_session_lookup.py [--sessions 100000]
+"""
+
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from bench_common import setup_backend, time_call, print_table
+
+setup_backend("bench-session")
+
+from sqlalchemy import insert, text
+from sqlmodel import Session, select
+
+from database import engine, create_db_and_tables
+from models import Session as DbSession, User
+
+
+def two_queries(session: Session, token: str):
+    db_session = session.exec(select(DbSession).where(DbSession.token == token)).first()
+    return session.exec(select(User).where(User.id == db_session.userId)).first()
+
+
+def single_join(session: Session, token: str):
+    statement = (
+        select(DbSession.expiresAt, DbSession.userId, User)
+        .outerjoin(User, User.id == DbSession.userId)
+        .where(DbSession.token == token)
+    )
+    return session.exec(statement).first()
+
+
+def seed(count: int) -> list:
+    now = datetime.utcnow()
+    users = [
+        {"id": str(uuid.uuid4()), "email": f"user{i}@bench.local", "emailVerified": False, "createdAt": now, "updatedAt": now}
+        for i in range(max(1, count // 10))
+    ]
+    sessions = [
+        {
+            "id": str(uuid.uuid4()),
+            "userId": random.choice(users)["id"],
+            "token": uuid.uuid4().hex,
+            "expiresAt": now + timedelta(days=7),
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        for _ in range(count)
+    ]
+    with Session(engine) as session:
+        session.execute(insert(User), users)
+        session.execute(insert(DbSession), sessions)
+        session.commit()
+    return [s["token"] for s in sessions]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    tokens = seed(args.sessions)
+    rows = []
+
+    with Session(engine) as session:
+        def run(fn):
+            return time_call(lambda: (fn(session, random.choice(tokens)), session.expunge_all()), args.repeat)
+
+        indexed_two = run(two_queries)
+        indexed_join = run(single_join)
+
+        session.exec(text("DROP INDEX ix_session_token"))
+        unindexed_two = time_call(
+            lambda: (two_queries(session, random.choice(tokens)), session.expunge_all()),
+            max(5, args.repeat // 20),
+        )
+        session.rollback()
+
+    for label, r in [
+        ("two queries, no index (old)", unindexed_two),
+        ("two queries, indexed", indexed_two),
+        ("single join, indexed (new)", indexed_join),
+    ]:
+        rows.append((label, f"{r['p50']:.3f}", f"{r['p99']:.3f}"))
+
+    print(f"{args.sessions} sessions")
+    print_table(["lookup", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: SQLite write and read throughput under concurrent writers, per
+SQLite performance profile and with / without the writer queue.
+
+Each run gets a fresh database file. --writers writers create todos (ORM
+insert + data-version bump, one transaction each), either as threads on the
+sync engine (like the MCP tools) or as tasks on the async engine (like the
+todo endpoints). Meanwhile --readers threads compute /todos/stats and load a
+page of todos. Each run lasts --seconds.
+
+Usage (from the repository root):
+    python scripts/bench_sqlite_profile.py [--writers 8] [--readers 4] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, print_table
+
+setup_backend("bench-sqlite-profile")
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import create_engines
+from models import Todo
+from stats import compute_todo_stats
+
+CONFIGS = [
+    ("standard", False),
+    ("performance", False),
+    ("performance", True),
+    ("ephemeral", True),
+]
+
+
+def seed(engine, users: int, todos_per_user: int) -> list:
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        user_ids = [seed_user(session) for _ in range(users)]
+        for user_id in user_ids:
+            session.execute(insert(Todo), [
+                {"id": uuid.uuid4(), "user_id": user_id, "title": f"Task {i}", "description": "",
+                 "is_completed": random.random() < 0.4, "priority": random.choice(["low", "medium", "high"]),
+                 "created_at": now}
+                for i in range(todos_per_user)
+            ])
+        session.commit()
+    return user_ids
+
+
+def run_config(profile: str, writer_queue: bool, writer_kind: str, args) -> tuple:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-sqlite-'), 'todo.db')}"
+    engine, async_engine = create_engines(url, sqlite_profile=profile, writer_queue=writer_queue)
+    SQLModel.metadata.create_all(engine)
+    user_ids = seed(engine, args.users, args.todos_per_user)
+    write_latencies, read_latencies = [], []
+    errors = []
+    stop = threading.Event()
+
+    def writer(n: int):
+        rng = random.Random(n)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.add(Todo(user_id=rng.choice(user_ids), title="Bench task", description=""))
+                    session.commit()
+            except OperationalError as e:
+                errors.append(e)
+                continue
+            write_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def async_writer(n: int):
+        rng = random.Random(100 + n)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                async with AsyncSession(async_engine) as session:
+                    session.add(Todo(user_id=rng.choice(user_ids), title="Bench task", description=""))
+                    await session.commit()
+            except OperationalError as e:
+                errors.append(e)
+                continue
+            write_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def async_writers():
+        await asyncio.gather(*(async_writer(n) for n in range(args.writers)))
+        await async_engine.dispose()
+
+    def reader(n: int):
+        rng = random.Random(1000 + n)
+        while not stop.is_set():
+            user_id = rng.choice(user_ids)
+            start = time.perf_counter()
+            with Session(engine) as session:
+                compute_todo_stats(session, user_id)
+                session.exec(select(Todo).where(Todo.user_id == user_id).order_by(Todo.created_at.desc()).limit(50)).all()
+            read_latencies.append((time.perf_counter() - start) * 1000)
+
+    if writer_kind == "sync":
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    else:
+        threads = [threading.Thread(target=asyncio.run, args=(async_writers(),))]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    def p99(samples):
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else 0.0
+
+    return (
+        writer_kind, profile, "on" if writer_queue else "off",
+        f"{len(write_latencies) / args.seconds:.0f}", f"{statistics.median(write_latencies or [0]):.1f}", f"{p99(write_latencies):.1f}",
+        f"{len(read_latencies) / args.seconds:.0f}", f"{statistics.median(read_latencies or [0]):.1f}", f"{p99(read_latencies):.1f}",
+        len(errors),
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--todos-per-user", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = [
+        run_config(profile, writer_queue, writer_kind, args)
+        for writer_kind in ("sync", "async")
+        for profile, writer_queue in CONFIGS
+    ]
+    print_table(
+        ["writers", "profile", "writer queue", "writes/s", "write p50 ms", "write p99 ms",
+         "reads/s", "read p50 ms", "read p99 ms", "locked errors"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,82 @@
+"""
+Benchmark: per-item todo endpoints vs. POST /todos/batch.
+
+Drives the FastAPI app in-process. Each scenario creates N todos, completes
+them and deletes them. Dapr calls are replaced with no-op stubs so the
+numbers measure the API and database work, not a missing sidecar.
+
+Usage (from the repository root):
+    python scripts/bench_todo_batch.py [--items 500]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, print_table
+
+setup_backend("bench-batch")
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+import main
+from auth import get_current_user
+from dapr_client import dapr
+from database import engine, create_db_and_tables
+from models import User
+
+
+async def _noop(*args, **kwargs):
+    return []
+
+
+def per_item(client: TestClient, n: int):
+    ids = [client.post("/todos", json={"title": f"Task {i}"}).json()["id"] for i in range(n)]
+    for todo_id in ids:
+        client.put(f"/todos/{todo_id}", json={"is_completed": True})
+    for todo_id in ids:
+        client.delete(f"/todos/{todo_id}")
+
+
+def batched(client: TestClient, n: int):
+    created = client.post("/todos/batch", json={
+        "operations": [{"op": "create", "data": {"title": f"Task {i}"}} for i in range(n)]
+    }).json()["results"]
+    ids = [r["id"] for r in created]
+    client.post("/todos/batch", json={
+        "operations": [{"op": "update", "id": todo_id, "data": {"is_completed": True}} for todo_id in ids]
+    })
+    client.post("/todos/batch", json={
+        "operations": [{"op": "delete", "id": todo_id} for todo_id in ids]
+    })
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=500)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    for name in ("publish_event", "publish_events_bulk", "invoke_service"):
+        setattr(dapr, name, _noop)
+
+    with Session(engine) as session:
+        user_id = seed_user(session)
+    now = datetime.utcnow()
+    main.app.dependency_overrides[get_current_user] = lambda: User(id=user_id, email="bench", createdAt=now, updatedAt=now)
+
+    rows = []
+    with TestClient(main.app) as client:
+        for label, fn in [("per-item endpoints", per_item), ("POST /todos/batch", batched)]:
+            start = time.perf_counter()
+            fn(client, args.items)
+            elapsed = time.perf_counter() - start
+            ops = args.items * 3
+            rows.append((label, ops, f"{elapsed:.2f}", f"{ops / elapsed:.0f}"))
+
+    print_table(["mode", "operations", "seconds", "ops/sec"], rows)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,89 @@
+"""
+Benchmark: noticing changes by reloading the full list vs. polling the delta
+sync feed (GET /todos/changes) with the previous token.
+
+Usage (from the repository root):
+    python scripts/bench_todo_changes.py [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import uuid
+from datetime import datetime, timedelta
+
+from bench_common import setup_backend, seed_user, time_call, print_table
+
+setup_backend("bench-changes")
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from database import engine, create_db_and_tables
+from models import Todo, TodoRead
+import sync
+
+
+def seed_todos(session: Session, user_id: str, count: int):
+    # Old enough to sit behind the settle lag
+    then = datetime.utcnow() - timedelta(hours=2)
+    rows = [
+        {"id": uuid.uuid4(), "user_id": user_id, "title": f"Task {i}", "description": "",
+         "created_at": then, "updated_at": then + timedelta(milliseconds=i)}
+        for i in range(count)
+    ]
+    session.execute(insert(Todo), rows)
+    session.commit()
+
+
+def full_reload(session: Session, user_id: str) -> list:
+    """What the frontend does today: fetch every todo and diff client-side"""
+    todos = [TodoRead.model_validate(t) for t in session.exec(select(Todo).where(Todo.user_id == user_id))]
+    session.expunge_all()
+    return todos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    results = []
+    with Session(engine) as session:
+        noise_user = seed_user(session)
+        seed_todos(session, noise_user, 5000)
+
+        for size in [int(s) for s in args.sizes.split(",")]:
+            user_id = seed_user(session)
+            seed_todos(session, user_id, size)
+
+            token = None
+            while True:
+                page = sync.changes_since(session, user_id, token, 1000)
+                token = page.next_token
+                if not page.has_more:
+                    break
+            session.expunge_all()
+
+            reload = time_call(lambda: full_reload(session, user_id), args.repeat)
+            quiet = time_call(lambda: sync.changes_since(session, user_id, token, 500), args.repeat)
+
+            # Ten edits since the token
+            ids = session.exec(select(Todo.id).where(Todo.user_id == user_id).limit(10)).all()
+            session.execute(update(Todo).where(Todo.id.in_(ids)).values(updated_at=datetime.utcnow() - timedelta(minutes=1)))
+            session.commit()
+            changed = time_call(lambda: (sync.changes_since(session, user_id, token, 500), session.expunge_all()), args.repeat)
+
+            results.append((
+                size,
+                f"{reload['p50']:.2f}",
+                f"{quiet['p50']:.3f}",
+                f"{changed['p50']:.3f}",
+                f"{reload['p50'] / quiet['p50']:.0f}x",
+            ))
+
+    print_table(["rows", "full reload p50 ms", "quiet poll p50 ms", "10 changes p50 ms", "speedup (quiet)"], results)
+
+
+if __name__ == "__main__":
+    main()
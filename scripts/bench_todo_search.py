@@ -0,0 +1,119 @@
+"""
+Benchmark: todo search, LIKE '%term%' vs. the full-text search backend.
+
+Seeds --rows todos split between one power user (--power-share of the rows)
+and many ordinary users, then times prefix searches for both kinds of user,
+newest-first (the default sort) and by relevance (sort_by=relevance).
+Seeding 1M rows takes a few minutes on SQLite because the FTS triggers run
+per row.
+
+Usage (from the repository root):
+    python scripts/bench_todo_search.py [--rows 1000000]
+    BENCH_DATABASE_URL=postgresql://... python scripts/bench_todo_search.py
+"""
+
+import argparse
+import itertools
+import random
+import string
+import uuid
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, time_call, print_table
+
+setup_backend("bench-search")
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from database import engine, create_db_and_tables
+from models import Todo
+from search import LikeSearchBackend
+import search as search_module
+
+random.seed(7)
+VOCABULARY = ["".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))) for _ in range(20000)]
+# Zipf word frequencies: VOCABULARY[0] behaves like a stop word, later ones are selective
+ZIPF_CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+QUERIES = [
+    VOCABULARY[0],                                  # in most todos: worst case for FTS
+    VOCABULARY[60],                                 # a few percent of todos
+    VOCABULARY[800][:4],                            # prefix match
+    f"{VOCABULARY[30]} {VOCABULARY[300][:4]}",      # two words, AND
+    "zzzzz",                                        # no match
+]
+
+
+def sentence(words: int) -> str:
+    return " ".join(random.choices(VOCABULARY, cum_weights=ZIPF_CUM_WEIGHTS, k=words))
+
+
+def seed(session: Session, user_ids: list, weights: list, rows: int, batch: int = 20000):
+    now = datetime.utcnow()
+    for start in range(0, rows, batch):
+        chunk = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": random.choices(user_ids, weights)[0],
+                "title": sentence(4).capitalize(),
+                "description": sentence(12),
+                "priority": "medium",
+                "created_at": now,
+            }
+            for _ in range(min(batch, rows - start))
+        ]
+        session.execute(insert(Todo), chunk)
+        session.commit()
+        print(f"  seeded {start + len(chunk)}/{rows}", end="\r", flush=True)
+    print()
+
+
+def run_search(session: Session, backend, user_id: str, query: str, ranked: bool = False):
+    statement, rank = backend.apply(select(Todo).where(Todo.user_id == user_id), query, user_id, ranked)
+    statement = statement.order_by(rank if rank is not None else Todo.created_at.desc()).limit(100)
+    result = session.exec(statement).all()
+    session.expunge_all()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--power-share", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    like = LikeSearchBackend()
+    fts = search_module.search_backend
+    print(f"Full-text backend: {fts.name}")
+
+    with Session(engine) as session:
+        power_user = seed_user(session)
+        others = [seed_user(session) for _ in range(args.users - 1)]
+        weights = [args.power_share] + [(1 - args.power_share) / len(others)] * len(others)
+        seed(session, [power_user] + others, weights, args.rows)
+
+        rows = []
+        for label, user_id in [("power user", power_user), ("typical user", others[0])]:
+            for query in QUERIES:
+                like_t = time_call(lambda: run_search(session, like, user_id, query), args.repeat)
+                fts_t = time_call(lambda: run_search(session, fts, user_id, query), args.repeat)
+                ranked_t = time_call(lambda: run_search(session, fts, user_id, query, ranked=True), args.repeat)
+                rows.append((
+                    label,
+                    query,
+                    len(run_search(session, fts, user_id, query)),
+                    f"{like_t['p50']:.2f}",
+                    f"{fts_t['p50']:.2f}",
+                    f"{like_t['p50'] / fts_t['p50']:.1f}x",
+                    f"{ranked_t['p50']:.2f}",
+                ))
+
+    print(f"{args.rows} todos, {args.users} users")
+    print_table(["user", "query", "hits", "LIKE p50 ms", "FTS p50 ms", "speedup", "FTS ranked p50 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
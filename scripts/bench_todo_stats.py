@@ -0,0 +1,95 @@
+"""
+Benchmark: GET /todos/stats computation, row-loading vs. SQL aggregate.
+
+Usage (from the repository root):
+    python scripts/bench_todo_stats.py [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import random
+import uuid
+from datetime import datetime
+
+from bench_common import setup_backend, seed_user, time_call, print_table
+
+setup_backend("bench-stats")
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from database import engine, create_db_and_tables
+from models import Todo, TodoStats
+from stats import compute_todo_stats
+
+
+def legacy_stats(session: Session, user_id: str) -> TodoStats:
+    """The pre-aggregate implementation: load every row and count in Python"""
+    todos = session.exec(select(Todo).where(Todo.user_id == user_id)).all()
+    total = len(todos)
+    completed = len([t for t in todos if t.is_completed])
+    priority_map = {"high": 0, "medium": 0, "low": 0}
+    for t in todos:
+        p = t.priority.lower() if t.priority else "medium"
+        if p in priority_map:
+            priority_map[p] += 1
+    rate = (completed / total * 100) if total > 0 else 0
+    return TodoStats(
+        total_tasks=total,
+        completed_tasks=completed,
+        pending_tasks=total - completed,
+        completion_rate=round(rate, 2),
+        priority_breakdown=priority_map
+    )
+
+
+def seed_todos(session: Session, user_id: str, count: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "title": f"Task {i}",
+            "description": "",
+            "is_completed": random.random() < 0.4,
+            "priority": random.choice(["low", "medium", "high"]),
+            "created_at": now,
+        }
+        for i in range(count)
+    ]
+    session.execute(insert(Todo), rows)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    results = []
+    with Session(engine) as session:
+        # A second user keeps the per-user filter honest
+        noise_user = seed_user(session)
+        seed_todos(session, noise_user, 5000)
+
+        for size in [int(s) for s in args.sizes.split(",")]:
+            user_id = seed_user(session)
+            seed_todos(session, user_id, size)
+
+            assert legacy_stats(session, user_id) == compute_todo_stats(session, user_id)
+
+            legacy = time_call(lambda: (legacy_stats(session, user_id), session.expunge_all()), args.repeat)
+            aggregate = time_call(lambda: compute_todo_stats(session, user_id), args.repeat)
+            results.append((
+                size,
+                f"{legacy['p50']:.2f}",
+                f"{aggregate['p50']:.2f}",
+                f"{legacy['p50'] / aggregate['p50']:.1f}x",
+            ))
+
+    print_table(["rows", "legacy p50 ms", "aggregate p50 ms", "speedup"], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Load test: idle GET /todos/stream connections against one uvicorn worker.
+
+Starts the app in a uvicorn subprocess (one worker, real Bearer-token auth)
+against a seeded SQLite database, opens --connections SSE streams from this
+process, and reports the worker's memory per connection, its idle CPU while
+holding them, and push latency from POST /todos to every stream of that user.
+
+Usage (from the repository root):
+    python scripts/bench_todo_stream.py [--connections 10000] [--per-user 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from bench_common import setup_backend, seed_auth_users, start_server, stop_server, print_table
+
+DATABASE_URL = setup_backend("bench-stream")
+
+from database import engine, create_db_and_tables
+
+
+def proc_status(pid: int) -> dict:
+    with open(f"/proc/{pid}/status") as f:
+        return dict(line.split(":", 1) for line in f)
+
+
+def rss_kib(pid: int) -> int:
+    return int(proc_status(pid)["VmRSS"].split()[0])
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class StreamClient:
+    """One raw-socket SSE connection; records when each `task` event arrives"""
+
+    def __init__(self, port: int, token: str):
+        self.port = port
+        self.token = token
+        self.task_event = asyncio.Event()
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(
+            f"GET /todos/stream HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {self.token}\r\n\r\n".encode()
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200"), head[:200]
+        while b"event: ready" not in await self.reader.readline():
+            pass
+
+    async def listen(self):
+        try:
+            while line := await self.reader.readline():
+                if b"event: task" in line:
+                    self.task_event.set()
+        except ConnectionError:
+            pass
+
+    def close(self):
+        self.writer.close()
+
+
+async def post_todo(port: int, token: str, title: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"title": title}).encode()
+    writer.write(
+        f"POST /todos HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    assert (await reader.readline()).startswith(b"HTTP/1.1 200"), "create failed"
+    await reader.read()
+    writer.close()
+
+
+async def bench(args):
+    create_db_and_tables()
+    users = seed_auth_users(engine, args.connections // args.per_user)
+    server, port = start_server(DATABASE_URL, "--timeout-keep-alive", "60")
+    clients = []
+    listeners = []
+    try:
+        # Warm up imports, the auth cache path and the streaming code before the baseline
+        warm = [StreamClient(port, users[0][1]) for _ in range(10)]
+        await asyncio.gather(*(c.connect() for c in warm))
+        for c in warm:
+            c.close()
+        await asyncio.sleep(1)
+        base_rss = rss_kib(server.pid)
+
+        start = time.perf_counter()
+        for i in range(0, args.connections, 500):
+            batch = [StreamClient(port, users[j // args.per_user][1]) for j in range(i, min(i + 500, args.connections))]
+            await asyncio.gather(*(c.connect() for c in batch))
+            clients.extend(batch)
+        connect_seconds = time.perf_counter() - start
+        listeners = [asyncio.create_task(c.listen()) for c in clients]
+        await asyncio.sleep(2)
+        held_rss = rss_kib(server.pid)
+
+        cpu_before = cpu_seconds(server.pid)
+        await asyncio.sleep(args.idle_seconds)
+        idle_cpu = (cpu_seconds(server.pid) - cpu_before) / args.idle_seconds
+
+        latencies = []
+        for n in range(args.pushes):
+            user_index = (n * 97) % len(users)
+            streams = clients[user_index * args.per_user:(user_index + 1) * args.per_user]
+            start = time.perf_counter()
+            await post_todo(port, users[user_index][1], f"Push {n}")
+            await asyncio.wait_for(asyncio.gather(*(c.task_event.wait() for c in streams)), 10)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+    finally:
+        for task in listeners:
+            task.cancel()
+        for c in clients:
+            c.close()
+        await asyncio.sleep(0.5)
+        stop_server(server)
+
+    per_connection = (held_rss - base_rss) * 1024 / args.connections
+    print_table(
+        ["connections", "users", "connect s", "worker RSS base MiB", "RSS held MiB", "KiB/conn",
+         "idle CPU %", "push p50 ms", "push p99 ms"],
+        [(
+            args.connections, len(users), f"{connect_seconds:.1f}",
+            f"{base_rss / 1024:.0f}", f"{held_rss / 1024:.0f}", f"{per_connection / 1024:.1f}",
+            f"{idle_cpu * 100:.1f}",
+            f"{statistics.median(latencies):.1f}", f"{latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f}",
+        )],
+    )
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--idle-seconds", type=float, default=10)
+    parser.add_argument("--pushes", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+"""
+Shared setup for the scripts/test_*.py checks: a throwaway SQLite database,
+backend/ on sys.path (database.py builds its engines at import, so this runs
+before any test module is collected), and signed-in users for the API.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'todo.db')}"
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from database import engine, create_db_and_tables
+from models import User
+from auth import get_current_user
+import main
+
+create_db_and_tables()
+
+
+@pytest.fixture
+def make_user():
+    """Adds a user row and returns it"""
+    def make_user() -> User:
+        now = datetime.utcnow()
+        user_id = str(uuid.uuid4())
+        user = User(id=user_id, email=f"{user_id}@test.local", createdAt=now, updatedAt=now)
+        with Session(engine) as session:
+            session.add(User.model_validate(user))
+            session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def user(make_user) -> User:
+    return make_user()
+
+
+@pytest.fixture
+def client(user):
+    """A TestClient signed in as `user`"""
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
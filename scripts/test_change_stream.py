@@ -0,0 +1,124 @@
+"""
+Change stream checks: the hub's local and version-watch feeds, bounded
+buffers, and GET /todos/stream end to end over a real uvicorn server.
+
+Run with `python -m pytest scripts/test_change_stream.py`.
+"""
+
+import asyncio
+import json
+import socket
+
+import httpx
+from sqlmodel import Session
+
+from database import engine
+from models import bump_data_version
+from change_stream import change_hub, Subscription, RESYNC
+from mcp_server import mcp_tools
+
+
+def parse(message: bytes) -> tuple:
+    event, data = message.decode().strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def with_hub(test, poll_interval: float = 60):
+    change_hub.poll_interval = poll_interval
+    await change_hub.start()
+    try:
+        await test()
+    finally:
+        await change_hub.close()
+
+
+def test_local_writes_arrive_as_task_events_with_version(user):
+    async def test():
+        subscription = change_hub.subscribe(user.id, 0)
+        await asyncio.to_thread(mcp_tools.add_task, user.id, "Buy milk")
+        event, data = parse(await subscription.get(2))
+        assert event == "task" and data["type"] == "task_created_mcp" and data["version"] == 1
+        # The watcher later sees version 1 as already announced
+        assert await subscription.get(0.2) is None
+        change_hub.unsubscribe(subscription)
+
+    asyncio.run(with_hub(test))
+
+
+def test_writes_without_task_events_are_caught_by_the_version_watch(user):
+    async def test():
+        subscription = change_hub.subscribe(user.id, 0)
+        with Session(engine) as session:
+            bump_data_version(session.connection(), user.id, "todos")
+            session.commit()
+        event, data = parse(await subscription.get(2))
+        assert (event, data) == ("changed", {"version": 1})
+        change_hub.unsubscribe(subscription)
+
+    asyncio.run(with_hub(test, poll_interval=0.05))
+
+
+def test_slow_client_gets_one_resync_instead_of_unbounded_buffering():
+    async def test():
+        subscription = Subscription("u", size=2)
+        for i in range(5):
+            subscription.push(f"m{i}".encode())
+        assert await subscription.get(0) is RESYNC
+        subscription.push(b"after")
+        assert await subscription.get(0) == b"after"
+        assert await subscription.get(0.01) is None
+
+    asyncio.run(test())
+
+
+def test_stream_ends_at_max_age_and_unsubscribes():
+    async def test():
+        subscription = change_hub.subscribe("aged", 0)
+        messages = [m async for m in change_hub.stream(subscription, 0, heartbeat=0.05, max_age=0.3)]
+        assert messages[0].startswith(b"event: ready") and len(messages) > 1
+        assert "aged" not in change_hub._subscribers
+
+    asyncio.run(test())
+
+
+def test_stream_endpoint_over_http(user):
+    import uvicorn
+    import main
+    from auth import get_current_user
+
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async def test():
+        server = uvicorn.Server(uvicorn.Config(main.app, port=port, log_level="error"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+                async with client.stream("GET", "/todos/stream") as response:
+                    assert response.headers["content-type"].startswith("text/event-stream")
+                    lines = response.aiter_lines()
+                    assert await anext(lines) == "event: ready"
+                    assert json.loads((await anext(lines)).removeprefix("data: ")) == {"version": 0}
+                    assert change_hub.stats()["connections"] == 1
+
+                    await client.post("/todos", json={"title": "From another tab"})
+                    while (line := await anext(lines)) != "event: task":
+                        pass
+                    data = json.loads((await anext(lines)).removeprefix("data: "))
+                    assert data["type"] == "task_created" and data["version"] == 1
+
+            for _ in range(100):
+                if change_hub.stats()["connections"] == 0:
+                    break
+                await asyncio.sleep(0.02)
+            assert change_hub.stats()["connections"] == 0
+        finally:
+            server.should_exit = True
+            await serving
+            main.app.dependency_overrides.clear()
+
+    asyncio.run(test())
@@ -0,0 +1,149 @@
+"""
+Chat history endpoints: cursor-paginated conversations and messages, and the
+NDJSON export, against the unpaginated listings; tool usage per day.
+
+Run with `python -m pytest scripts/test_chat_history.py`.
+"""
+
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from database import engine
+from migrations import MIGRATIONS, Progress
+from models import Conversation, Message, MessageToolCall
+from pagination import encode_cursor
+from routers import chat
+import main
+
+
+@pytest.fixture
+def user_id(user) -> str:
+    return user.id
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def seed_conversation(user_id: str, messages: int, updated_at: datetime) -> int:
+    start = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        conversation = Conversation(user_id=user_id, created_at=start, updated_at=updated_at)
+        session.add(conversation)
+        session.flush()
+        # Pairs share a timestamp, like a turn's messages, so ids break the ties
+        rows = [
+            {"user_id": user_id, "conversation_id": conversation.id, "role": "user" if i % 2 == 0 else "assistant",
+             "content": f"Message {i}", "tool_calls": '["list_tasks"]' if i % 2 else None,
+             "created_at": start + timedelta(seconds=i // 2)}
+            for i in range(messages)
+        ]
+        if rows:
+            session.execute(insert(Message), rows)
+        session.commit()
+        return conversation.id
+
+
+def walk(client, url: str, **params) -> list:
+    items, cursor = [], None
+    while True:
+        page = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_conversation_pages(client, user_id):
+    now = datetime.utcnow()
+    for i in range(7):
+        # Two share an updated_at
+        seed_conversation(user_id, 0, now - timedelta(minutes=min(i, 5)))
+    everything = client.get(f"/chat/{user_id}/conversations").json()
+    paged = walk(client, f"/chat/{user_id}/conversations/page", limit=3)
+    assert sorted(c["id"] for c in paged) == sorted(c["id"] for c in everything)
+    assert [c["updated_at"] for c in paged] == [c["updated_at"] for c in everything]
+
+
+def test_message_pages_and_export(client, user_id, monkeypatch):
+    conversation_id = seed_conversation(user_id, 25, datetime.utcnow())
+    url = f"/chat/{user_id}/conversations/{conversation_id}/messages"
+    everything = client.get(url).json()
+    assert len(everything) == 25 and everything[1]["tool_calls"] == ["list_tasks"]
+
+    assert walk(client, f"{url}/page", limit=4) == everything
+    assert walk(client, f"{url}/page", limit=4, order="newest") == everything[::-1]
+
+    monkeypatch.setattr(chat, "CHAT_EXPORT_BATCH_SIZE", 4)
+    response = client.get(f"{url}/export")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == everything
+
+
+def test_tool_calls_come_from_message_tool_call(client, user_id):
+    legacy = seed_conversation(user_id, 4, datetime.utcnow())
+    conversation_id = client.post(f"/chat/{user_id}", json={"message": "add task milk"}).json()["conversation_id"]
+    with Session(engine) as session:
+        turn = session.exec(select(Message).where(Message.conversation_id == conversation_id)).all()
+        assert [msg.tool_calls for msg in turn] == [None, None]
+    url = f"/chat/{user_id}/conversations/{conversation_id}/messages"
+    assert [msg["tool_calls"] for msg in client.get(url).json()] == [None, ["add_task"]]
+    assert [msg["tool_calls"] for msg in walk(client, f"{url}/page", limit=1)] == [None, ["add_task"]]
+
+    # Legacy messages read the same before and after the backfill clears the column
+    legacy_url = f"/chat/{user_id}/conversations/{legacy}/messages"
+    before = client.get(legacy_url).json()
+    for migration in MIGRATIONS:
+        if migration.version in (13, 19):
+            migration.apply(engine, Progress(migration, threading.Event()))
+    with Session(engine) as session:
+        assert session.exec(select(Message).where(Message.tool_calls.is_not(None))).all() == []
+    assert client.get(legacy_url).json() == before and before[1]["tool_calls"] == ["list_tasks"]
+    assert [json.loads(line) for line in client.get(f"{legacy_url}/export").text.splitlines()] == before
+
+
+def test_bad_cursors_and_other_users(client, user_id):
+    conversation_id = seed_conversation(user_id, 3, datetime.utcnow())
+    url = f"/chat/{user_id}/conversations/{conversation_id}/messages/page"
+    cursor = client.get(url, params={"limit": 1}).json()["next_cursor"]
+    # A cursor only works with the order it was issued for
+    assert client.get(url, params={"cursor": cursor, "order": "newest"}).status_code == 400
+    assert client.get(url, params={"cursor": "not-a-cursor"}).status_code == 400
+    # Well-formed but not a position in these keys
+    for values in [[datetime(2024, 1, 1)], [datetime(2024, 1, 1), 1, 2], [datetime(2024, 1, 1), "1"], ["2024-01-01", 1]]:
+        assert client.get(url, params={"cursor": encode_cursor("oldest", values)}).status_code == 400
+    conversations = f"/chat/{user_id}/conversations/page"
+    assert client.get(conversations, params={"cursor": encode_cursor("updated_at", [datetime(2024, 1, 1), uuid.uuid4()])}).status_code == 400
+
+    other = f"/chat/someone-else/conversations/{conversation_id}/messages"
+    assert client.get(f"{other}/page").status_code == 404
+    assert client.get(f"{other}/export").status_code == 404
+
+
+def test_tool_usage_per_day(client, user_id):
+    for message in ["add task milk", "add task bread", "complete the first task", "hello"]:
+        client.post(f"/chat/{user_id}", json={"message": message})
+    with Session(engine) as session:
+        for position, age in [(1, timedelta(days=1)), (2, timedelta(days=40))]:
+            session.add(MessageToolCall(message_id=2, user_id=user_id, tool="add_task", position=position, created_at=datetime.utcnow() - age))
+        session.commit()
+    today = datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+
+    usage = client.get(f"/chat/{user_id}/tool-usage").json()
+    assert usage == [
+        {"day": yesterday.isoformat(), "tool": "add_task", "count": 1},
+        {"day": today.isoformat(), "tool": "add_task", "count": 2},
+        {"day": today.isoformat(), "tool": "complete_task", "count": 1},
+    ]
+    assert client.get(f"/chat/{user_id}/tool-usage", params={"tool": "add_task", "days": 1}).json() == [
+        {"day": today.isoformat(), "tool": "add_task", "count": 2},
+    ]
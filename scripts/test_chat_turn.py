@@ -0,0 +1,128 @@
+"""
+Chat turn unit of work: the conversation, both messages and the tool's
+changes commit together, once, or not at all. And the ordinal tools behind
+"complete the first task" / "delete the last task".
+
+Run with `python -m pytest scripts/test_chat_turn.py`.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+import mcp_server
+from database import engine, async_engine
+from models import Conversation, Message, OutboxEvent, Todo, UserDataVersion
+import main
+
+
+@pytest.fixture
+def commits():
+    counted = []
+    listener = lambda conn: counted.append(conn)
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "commit", listener)
+    yield counted
+    for target in (engine, async_engine.sync_engine):
+        event.remove(target, "commit", listener)
+
+
+def rows(model, user_id: str) -> list:
+    with Session(engine) as session:
+        return session.exec(select(model).where(model.user_id == user_id)).all()
+
+
+def test_turns_commit_once(user, commits):
+    client = TestClient(main.app)
+    response = client.post(f"/chat/{user.id}", json={"message": "add task buy milk"})
+    assert response.status_code == 200 and response.json()["tool_calls"] == ["add_task"]
+    conversation_id = response.json()["conversation_id"]
+    assert len(commits) == 1
+
+    response = client.post(f"/chat/{user.id}", json={"message": "complete the first task", "conversation_id": conversation_id})
+    assert response.json()["tool_calls"] == ["complete_task"]
+    assert len(commits) == 2
+
+    assert [(t.title, t.is_completed) for t in rows(Todo, user.id)] == [("buy milk", True)]
+    assert [m.role for m in rows(Message, user.id)] == ["user", "assistant"] * 2
+    assert response.json()["message_id"] == max(m.id for m in rows(Message, user.id))
+    with Session(engine) as session:
+        assert len(session.exec(select(OutboxEvent)).all()) >= 2
+        # One bump per scope per turn, however many rows the turn wrote
+        versions = session.get(UserDataVersion, user.id)
+        assert (versions.todos_version, versions.chat_version) == (2, 2)
+
+
+def test_turn_runs_off_the_event_loop(user):
+    on_loop = []
+
+    def listener(conn, cursor, statement, *args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(statement)
+        except RuntimeError:
+            pass
+
+    event.listen(engine, "before_cursor_execute", listener)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        client = TestClient(main.app)
+        assert client.post(f"/chat/{user.id}", json={"message": "add task buy milk"}).status_code == 200
+        assert client.post(f"/chat/{user.id}", json={"message": "show my tasks"}).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    # One threadpool call per turn on the sync engine, not the async driver via the loop
+    assert on_loop == []
+
+
+def test_failed_tool_rolls_back_the_turn(user, monkeypatch):
+    def failing_add_event(session, topic, data):
+        raise RuntimeError("outbox unavailable")
+
+    monkeypatch.setattr(mcp_server, "add_event", failing_add_event)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    assert client.post(f"/chat/{user.id}", json={"message": "add task buy milk"}).status_code == 500
+    assert rows(Conversation, user.id) == [] and rows(Message, user.id) == [] and rows(Todo, user.id) == []
+
+    # Outside a chat turn the tool still reports the error itself
+    assert mcp_server.mcp_tools.add_task(user.id, "buy milk")["status"] == "error"
+
+
+def test_nth_task_follows_list_order(user):
+    created_at = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        # Inserted out of order; positions follow created_at
+        for day, title, done in [(2, "second", False), (0, "done", True), (3, "last", False), (1, "first", False)]:
+            session.add(Todo(user_id=user.id, title=title, is_completed=done, created_at=created_at + timedelta(days=day)))
+        session.commit()
+    tools = mcp_server.mcp_tools
+
+    assert [t["title"] for t in tools.list_tasks(user.id, "pending")["tasks"]] == ["first", "second", "last"]
+    assert tools.complete_nth_task(user.id, 2)["title"] == "second"
+    assert tools.complete_nth_task(user.id, -1)["title"] == "last"
+    assert tools.delete_nth_task(user.id, 1)["title"] == "done"
+    assert tools.delete_nth_task(user.id, 5)["message"] == "No tasks found"
+    assert tools.complete_nth_task(user.id, 0)["status"] == "error"
+    assert sorted((t.title, t.is_completed) for t in rows(Todo, user.id)) == [("first", False), ("last", True), ("second", True)]
+
+
+def test_ordinal_turn_reads_one_row(user):
+    with Session(engine) as session:
+        for i in range(50):
+            session.add(Todo(user_id=user.id, title=f"Task {i}", created_at=datetime(2024, 1, 1) + timedelta(minutes=i)))
+        session.commit()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = TestClient(main.app).post(f"/chat/{user.id}", json={"message": "delete the last task"})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert response.json()["response"] == "🗑️ Deleted task: Task 49"
+    lookups = [s for s in statements if s.lstrip().startswith("SELECT") and "FROM todo" in s]
+    assert len(lookups) == 1 and "LIMIT" in lookups[0]
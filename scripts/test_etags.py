@@ -0,0 +1,88 @@
+"""
+ETag / If-None-Match checks for the todo and chat read endpoints.
+
+Run with `python -m pytest scripts/test_etags.py`.
+"""
+
+import re
+import uuid
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from database import engine
+from models import Todo
+from auth import get_current_user
+from mcp_server import mcp_tools
+from recurrence import materialize_next
+import main
+
+
+def revalidate(client, url: str, etag: str) -> int:
+    return client.get(url, headers={"If-None-Match": etag}).status_code
+
+
+def test_unchanged_data_is_304_without_reading_todos(client):
+    client.post("/todos", json={"title": "a"})
+    for url in ("/todos", "/todos/stats", "/todos/page"):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"') and first.headers["cache-control"] == "private, no-cache"
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get(url, headers={"If-None-Match": f'"other", {etag}'})
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+        assert not [s for s in statements if re.search(r"\bFROM todo\b", s)]
+
+
+def test_every_write_path_changes_the_etag(client, user):
+    todo_id = client.post("/todos", json={"title": "a", "recurrence": "daily", "due_date": "2026-01-01T09:00:00"}).json()["id"]
+    writes = [
+        lambda: client.post("/todos", json={"title": "b"}),
+        lambda: client.put(f"/todos/{todo_id}", json={"title": "a2"}),
+        lambda: client.post("/todos/batch", json={"operations": [{"op": "create", "data": {"title": "c"}}]}),
+        lambda: mcp_tools.complete_task(user.id, todo_id),
+        lambda: _materialize(todo_id),
+        lambda: client.delete(f"/todos/{todo_id}"),
+    ]
+    for write in writes:
+        etag = client.get("/todos").headers["etag"]
+        write()
+        assert revalidate(client, "/todos", etag) == 200
+
+
+def _materialize(todo_id: str):
+    with Session(engine) as session:
+        assert materialize_next(session, session.get(Todo, uuid.UUID(todo_id))) == 1
+        session.commit()
+
+
+def test_etag_is_per_user_and_per_url(client, user, make_user):
+    etag = client.get("/todos").headers["etag"]
+    assert revalidate(client, "/todos?priority=high", etag) == 200
+
+    other = make_user()
+    main.app.dependency_overrides[get_current_user] = lambda: other
+    assert revalidate(client, "/todos", etag) == 200
+
+
+def test_chat_endpoints(client, user):
+    conversations = f"/chat/{user.id}/conversations"
+    etag = client.get(conversations).headers["etag"]
+    assert revalidate(client, conversations, etag) == 304
+
+    conversation_id = client.post(f"/chat/{user.id}", json={"message": "hello"}).json()["conversation_id"]
+    assert revalidate(client, conversations, etag) == 200
+
+    messages = f"/chat/{user.id}/conversations/{conversation_id}/messages"
+    etag = client.get(messages).headers["etag"]
+    assert revalidate(client, messages, etag) == 304
+    client.post(f"/chat/{user.id}", json={"message": "show my tasks", "conversation_id": conversation_id})
+    assert revalidate(client, messages, etag) == 200
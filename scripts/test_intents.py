@@ -0,0 +1,67 @@
+"""
+Intent engine checks: MockAI's outputs on the utterance corpus against golden
+outputs recorded from the original pattern-list implementation
+(intent_golden.json), and the keyword automaton against plain substring
+search.
+
+Run with `python -m pytest scripts/test_intents.py` (needs the hypothesis
+dev dependency).
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from hypothesis import given, strategies as st
+
+from intent_engine import KeywordAutomaton, intent_engine
+from routers.chat import MockAI
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.path.join(SCRIPTS_PATH, "intent_golden.json"), encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+def test_golden_covers_the_corpus():
+    with open(os.path.join(SCRIPTS_PATH, "intent_corpus.txt"), encoding="utf-8") as f:
+        corpus = [line.rstrip("\n").replace("\\n", "\n") for line in f if line.strip() and not line.startswith("#")]
+    assert [case["text"] for case in GOLDEN] == corpus
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda case: case["text"][:40])
+def test_matches_golden_output(case):
+    text = case["text"]
+    today = datetime.utcnow().date()
+    expected = dict(case["params"])
+    if "due_date" in expected:
+        days = {"<today>": 0, "<tomorrow>": 1}[expected["due_date"]]
+        expected["due_date"] = (today + timedelta(days=days)).isoformat()
+
+    language = MockAI.detect_language(text)
+    assert language == case["language"]
+    assert MockAI.detect_intent(text, language) == (case["intent"], expected)
+    for lang, title in case["titles"].items():
+        assert MockAI.extract_task_title(text, lang) == title
+
+
+keywords = [(flag, word) for flag, words in intent_engine.keywords.items() for word in words]
+# Text built from keyword fragments, so matches, near misses and overlaps are common
+fragments = st.sampled_from([word[:cut] for _, word in keywords for cut in (1, 2, len(word))] + [" ", "x", "Ü"])
+
+
+@given(st.lists(fragments, max_size=12).map("".join))
+def test_automaton_finds_exactly_the_contained_keywords(text):
+    expected = 0
+    for flag, word in keywords:
+        if word in text:
+            expected |= flag
+    assert intent_engine.automaton.scan(text) == expected
+
+
+def test_nested_and_overlapping_keywords():
+    automaton = KeywordAutomaton({1: ["she", "he"], 2: ["hers"], 4: ["is"], 8: ["his"]})
+    assert automaton.scan("ushers") == 1 | 2
+    assert automaton.scan("this") == 4 | 8
+    assert automaton.scan("sh") == 0
@@ -0,0 +1,179 @@
+"""
+Migration runner checks: a database with the original todo table is brought
+up to date (schema phase, then batched backfills and index builds), a fresh
+one is stamped, and the background phase doesn't hold up startup.
+
+Run with `python -m pytest scripts/test_migrations.py`.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+
+import migrations
+from database import create_engines
+from migrations import MIGRATIONS, Migration, MigrationRunner
+
+
+@pytest.fixture
+def engine():
+    engine, _ = create_engines(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'migrate.db')}")
+    yield engine
+    engine.dispose()
+
+
+def create_legacy_todo_table(engine, rows: int):
+    """The todo table as the first release created it"""
+    created_at = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE todo (id CHAR(32) PRIMARY KEY, user_id VARCHAR, description VARCHAR, "
+            "is_completed BOOLEAN, created_at DATETIME)"
+        )
+        conn.execute(
+            text("INSERT INTO todo VALUES (:id, 'user-1', :description, 0, :created_at)"),
+            [{"id": uuid.uuid4().hex, "description": f"Task {i}", "created_at": created_at} for i in range(rows)],
+        )
+
+
+def test_legacy_database_is_upgraded(engine, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATION_BATCH_SIZE", 4)
+    monkeypatch.setattr(migrations, "MIGRATION_BATCH_PAUSE_SECONDS", 0)
+    create_legacy_todo_table(engine, rows=10)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE todo SET description = 'Urgent' WHERE rowid = 1")
+
+    runner = MigrationRunner()
+    runner.migrate_schema(engine)
+    with engine.connect() as conn:
+        # Schema phase: columns added, titles and priority ranks backfilled inline; the rest waits for the background phase
+        assert conn.execute(text("SELECT count(*) FROM todo WHERE title = description")).scalar() == 10
+        assert conn.execute(text("SELECT priority_rank, count(*) FROM todo GROUP BY priority_rank")).all() == [(1, 10)]
+    assert runner.stats()["pending"] == [m.label for m in MIGRATIONS if m.phase == "background"]
+    assert "ix_todo_user_updated_id" not in {i["name"] for i in inspect(engine).get_indexes("todo")}
+
+    runner.run_background(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM todo WHERE updated_at = created_at")).scalar() == 10
+        versions = conn.execute(text("SELECT version FROM schema_migration ORDER BY version")).scalars().all()
+    assert versions == [m.version for m in MIGRATIONS]
+    assert "ix_todo_user_updated_id" in {i["name"] for i in inspect(engine).get_indexes("todo")}
+    assert runner.stats()["pending"] == [] and runner.stats()["failed"] is None
+
+    # Nothing left for the next start
+    rerun = MigrationRunner()
+    rerun.migrate_schema(engine)
+    assert rerun.pending() == []
+
+
+def test_past_reminders_are_marked_sent(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE todo (id CHAR(32) PRIMARY KEY, description VARCHAR, reminder_time DATETIME)")
+        conn.execute(text("INSERT INTO todo VALUES (:id, '', :at)"), [
+            {"id": uuid.uuid4().hex, "at": datetime.utcnow() - timedelta(days=1)},
+            {"id": uuid.uuid4().hex, "at": datetime.utcnow() + timedelta(days=1)},
+        ])
+    MigrationRunner().migrate_schema(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM todo WHERE reminder_sent_at IS NULL")).scalar() == 1
+
+
+def test_tool_calls_are_backfilled_once(engine):
+    MigrationRunner().migrate_schema(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, email, emailVerified, createdAt, updatedAt) VALUES ('u', 'u@test.local', 0, :now, :now)"), {"now": now})
+        conn.execute(text("INSERT INTO conversation (id, user_id, title, created_at, updated_at) VALUES (1, 'u', '', :now, :now)"), {"now": now})
+        conn.execute(
+            text("INSERT INTO message (user_id, conversation_id, role, content, tool_calls, created_at) VALUES ('u', 1, 'assistant', '', :calls, :now)"),
+            [{"calls": calls, "now": now} for calls in ['["list_tasks", "complete_task"]', None, "not json", '["add_task"]']],
+        )
+        # Written by a chat turn while the backfill runs
+        conn.exec_driver_sql("INSERT INTO message_tool_call (message_id, user_id, tool, position, created_at) VALUES (4, 'u', 'add_task', 0, '2024-01-01')")
+
+    for _ in range(2):
+        migrations._backfill_message_tool_calls(engine, migrations.Progress(MIGRATIONS[-1], threading.Event()))
+    with engine.connect() as conn:
+        calls = conn.execute(text("SELECT message_id, position, tool FROM message_tool_call ORDER BY message_id, position")).all()
+    assert calls == [(1, 0, "list_tasks"), (1, 1, "complete_task"), (4, 0, "add_task")]
+
+
+def test_occurrence_guard_is_built_before_startup(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE todo (id CHAR(32) PRIMARY KEY, user_id VARCHAR, description VARCHAR, is_completed BOOLEAN, "
+            "created_at DATETIME, due_date DATETIME, recurrence_parent_id CHAR(32))"
+        )
+        # Delivered twice before the unique index existed: one instance of 10/02 was completed
+        root, due = uuid.uuid4().hex, datetime(2024, 10, 2)
+        rows = [(root, None, None, 1, 0), (uuid.uuid4().hex, root, due, 0, 1), (uuid.uuid4().hex, root, due, 1, 2),
+                (uuid.uuid4().hex, root, due + timedelta(days=1), 0, 3)]
+        conn.execute(
+            text("INSERT INTO todo VALUES (:id, 'user-1', '', :done, :created_at, :due, :parent)"),
+            [{"id": id, "parent": parent, "due": due, "done": done, "created_at": datetime(2024, 1, 1, minute=minute)}
+             for id, parent, due, done, minute in rows],
+        )
+
+    MigrationRunner().migrate_schema(engine)
+    assert "ux_todo_recurrence_occurrence" in {i["name"] for i in inspect(engine).get_indexes("todo")}
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT id FROM todo WHERE recurrence_parent_id IS NOT NULL ORDER BY due_date")).scalars().all()
+        tombstones = conn.execute(text("SELECT todo_id FROM todo_tombstone")).scalars().all()
+    assert kept == [rows[2][0], rows[3][0]] and tombstones == [rows[1][0]]
+
+
+def test_fresh_database_is_stamped(engine):
+    runner = MigrationRunner()
+    runner.migrate_schema(engine)
+    assert runner.pending() == [] and runner.stats()["applied"] == len(MIGRATIONS)
+    assert "ix_todo_user_updated_id" in {i["name"] for i in inspect(engine).get_indexes("todo")}
+
+
+def test_fresh_database_runs_only_fresh_migrations(engine):
+    ran = []
+    runner = MigrationRunner([
+        Migration(1, "column", "schema", lambda engine, progress: ran.append(1)),
+        Migration(2, "objects outside the models", "schema", lambda engine, progress: ran.append(2), fresh=True),
+        Migration(3, "backfill", "background", lambda engine, progress: ran.append(3)),
+        Migration(4, "index outside the models", "background", lambda engine, progress: ran.append(4), fresh=True),
+    ])
+    runner.migrate_schema(engine)
+    assert ran == [2, 4] and runner.pending() == []
+
+
+def test_background_phase_runs_after_startup_and_resumes_after_close(engine):
+    create_legacy_todo_table(engine, rows=1)
+    started = asyncio.Event()
+
+    def slow_backfill(engine, progress):
+        progress.total = 100
+        loop.call_soon_threadsafe(started.set)
+        while True:
+            progress.check_stopping()
+            progress.advance(1, 1)
+            progress.stopping.wait(0.01)
+
+    async def test():
+        runner = MigrationRunner(MIGRATIONS + [Migration(1000, "slow backfill", "background", slow_backfill)])
+        runner.migrate_schema(engine)
+        await runner.start(engine)
+        # start() returns right away; the backfill reports progress while it runs
+        await asyncio.wait_for(started.wait(), 10)
+        await asyncio.sleep(0.05)
+        running = runner.stats()["running"]
+        assert running["version"] == 1000 and 0 < running["done"] < 100
+        await runner.close()
+        return runner
+
+    loop = asyncio.new_event_loop()
+    runner = loop.run_until_complete(test())
+    loop.close()
+    # Interrupted, not failed: the migration stays pending for the next start
+    assert runner.stats()["pending"] == ["1000 (slow backfill)"] and runner.stats()["failed"] is None
+    assert runner.stats()["running"] is None
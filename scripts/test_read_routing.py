@@ -0,0 +1,79 @@
+"""
+Read replica routing checks: two SQLite files stand in for the primary and
+the replica (no replication, so each read shows which one served it).
+
+Run with `python -m pytest scripts/test_read_routing.py`.
+"""
+
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlmodel import SQLModel
+
+from database import create_engines, pool_options, read_router
+from models import Conversation, Todo
+from mcp_server import mcp_tools
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    engines = create_engines(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'replica.db')}")
+    SQLModel.metadata.create_all(engines[0])
+    monkeypatch.setattr(read_router, "replica", engines)
+    monkeypatch.setattr(read_router, "sticky_seconds", 0.3)
+    yield engines[0]
+    engines[0].dispose()
+
+
+def titles(response) -> list:
+    assert response.status_code == 200
+    return [todo["title"] for todo in response.json()]
+
+
+def test_reads_use_the_replica_except_right_after_the_users_writes(replica, client, user, make_user):
+    # Core insert: an ORM write would mark the user as a writer
+    with replica.begin() as connection:
+        connection.execute(Todo.__table__.insert().values(
+            id=uuid.uuid4(), user_id=user.id, title="On replica", description="", created_at=datetime.utcnow(),
+        ))
+
+    assert titles(client.get("/todos")) == ["On replica"]
+    assert client.get("/todos/stats").json()["total_tasks"] == 1
+    assert [t["title"] for t in mcp_tools.list_tasks(user.id)["tasks"]] == ["On replica"]
+
+    client.post("/todos", json={"title": "On primary"})
+    assert titles(client.get("/todos")) == ["On primary"]
+    assert [t["title"] for t in client.get("/todos/page").json()["items"]] == ["On primary"]
+    assert [t["title"] for t in mcp_tools.list_tasks(user.id)["tasks"]] == ["On primary"]
+
+    # Another user's write doesn't pin this user, and the window lapses
+    mcp_tools.add_task(make_user().id, "Someone else")
+    time.sleep(0.35)
+    assert titles(client.get("/todos")) == ["On replica"]
+    assert read_router.stats()["replica_reads"] > 0 and read_router.stats()["primary_reads"] > 0
+
+
+def test_conversation_listing_follows_the_path_user(replica, client, user):
+    now = datetime.utcnow()
+    with replica.begin() as connection:
+        connection.execute(Conversation.__table__.insert().values(
+            user_id=user.id, title="Replica chat", created_at=now, updated_at=now,
+        ))
+
+    listed = client.get(f"/chat/{user.id}/conversations").json()
+    assert [c["title"] for c in listed] == ["Replica chat"]
+
+    response = client.post(f"/chat/{user.id}", json={"message": "show my tasks"})
+    assert response.status_code == 200
+    listed = client.get(f"/chat/{user.id}/conversations").json()
+    assert [c["id"] for c in listed] == [response.json()["conversation_id"]]
+
+
+def test_pool_options():
+    assert pool_options("sqlite://") == {}
+    assert pool_options("postgresql://db/app")["pool_size"] == 5
+    assert read_router.replica is None
@@ -1,111 +1,288 @@
-import requests
+"""
+Recurrence checks: property-based tests for the rule engine in recurrence.py,
+materialization and the sweeper against SQLite, and the task-lifecycle
+consumer end to end.
+
+Run with `python -m pytest scripts/test_recurrence_logic.py` (needs the
+hypothesis dev dependency); the benchmark is scripts/bench_recurrence.py.
+"""
+
+import calendar
+import threading
 import uuid
-from sqlmodel import Session, select, create_engine
-import sys
-import os
-
-# Create consistency with app's runtime environment
-# We need 'backend' folder in sys.path so 'import models' works as it does in the app
-backend_path = os.path.join(os.getcwd(), "backend")
-if backend_path not in sys.path:
-    sys.path.append(backend_path)
-
-# Verify imports work relative to backend/
-try:
-    from models import Todo, User
-    from database import engine, create_db_and_tables
-except ImportError as e:
-    # If falling back to root import
-    print(f"Direct import failed: {e}. Trying absolute...")
+from datetime import datetime, timedelta
+
+from hypothesis import given, settings, strategies as st
+from sqlmodel import Session, select
+
+from database import engine
+from models import RecurrenceSeries, Todo, User
+from recurrence import (
+    WEEKDAYS, LEGACY_SERIES_MIGRATION, parse_rule, iter_occurrences, next_occurrences, materialize_next, sweep,
+)
+
+
+dtstarts = st.datetimes(min_value=datetime(2000, 1, 1), max_value=datetime(2100, 1, 1)).map(
+    lambda d: d.replace(microsecond=0)
+)
+intervals = st.integers(min_value=1, max_value=12)
+weekday_sets = st.sets(st.sampled_from(WEEKDAYS), min_size=1, max_size=7)
+
+
+def take(iterator, n):
+    return [o for _, o in zip(range(n), iterator)]
+
+
+# --- Rule parsing ---
+
+def test_legacy_keywords():
+    assert parse_rule("none") is None
+    assert parse_rule("") is None
+    assert parse_rule(None) is None
+    for keyword in ("daily", "weekly", "monthly", "yearly"):
+        assert parse_rule(keyword) == parse_rule(f"FREQ={keyword.upper()}")
+    assert parse_rule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR").interval == 2
+
+
+@given(st.text(max_size=60))
+def test_parse_rejects_garbage_with_value_error(text):
     try:
-        from backend.models import Todo, User
-        from backend.database import engine, create_db_and_tables
-    except ImportError as e2:
-        print(f"Absolute import failed: {e2}")
-        raise e
+        parse_rule(text)
+    except ValueError:
+        pass
 
-from datetime import datetime, timedelta
-import time
-
-BASE_URL = "http://localhost:8000"
-
-def test_recurrence():
-    print("--- Verifying Recurrence Logic ---")
-    
-    # Ensure tables exist
-    create_db_and_tables()
-
-    # 1. Create a dummy user and task directly in DB
-    user_id = str(uuid.uuid4()) # User ID is string in model
-    task_id = uuid.uuid4()
-    
-    # We need a user because Todo needs a user_id (though foreign key constraints might not be enforced in simple sqlite setup depending on config, but let's be safe if we can, or just try inserting Todo)
-    # Actually, let's just insert the Todo. The current model definition might just require a UUID for user_id.
-    
-    recurring_task = Todo(
-        id=task_id,
-        user_id=user_id,
-        title="Test Recurring Task",
-        description="This should respawn",
-        is_completed=False,
-        priority="medium",
-        recurrence="daily",
-        due_date=datetime.utcnow()
-    )
-    
+
+# --- Occurrence properties ---
+
+@given(dtstarts, st.sampled_from(["daily", "weekly", "monthly", "yearly"]), intervals)
+def test_occurrences_ascend_from_dtstart_and_keep_time(dtstart, freq, interval):
+    rule = parse_rule(f"FREQ={freq.upper()};INTERVAL={interval}")
+    occurrences = take(iter_occurrences(rule, dtstart), 20)
+    assert occurrences[0] == dtstart
+    assert all(a < b for a, b in zip(occurrences, occurrences[1:]))
+    assert all(o.time() == dtstart.time() for o in occurrences)
+
+
+@given(dtstarts, intervals)
+def test_daily_spacing(dtstart, interval):
+    occurrences = take(iter_occurrences(parse_rule(f"FREQ=DAILY;INTERVAL={interval}"), dtstart), 30)
+    assert all(b - a == timedelta(days=interval) for a, b in zip(occurrences, occurrences[1:]))
+
+
+@given(dtstarts, intervals, weekday_sets)
+def test_weekly_byday(dtstart, interval, weekdays):
+    rule = parse_rule(f"FREQ=WEEKLY;INTERVAL={interval};BYDAY={','.join(weekdays)}")
+    occurrences = take(iter_occurrences(rule, dtstart), 30)[1:]
+    allowed = {WEEKDAYS.index(w) for w in weekdays}
+    assert all(o.weekday() in allowed for o in occurrences)
+    # Never skips more than the interval's worth of weeks
+    assert all(b - a <= timedelta(weeks=interval) for a, b in zip([dtstart] + occurrences, occurrences))
+
+
+@given(dtstarts, intervals)
+def test_monthly_clamps_to_month_end_without_drift(dtstart, interval):
+    occurrences = take(iter_occurrences(parse_rule(f"FREQ=MONTHLY;INTERVAL={interval}"), dtstart), 24)
+    for a, b in zip(occurrences, occurrences[1:]):
+        assert (b.year - a.year) * 12 + b.month - a.month == interval
+    for o in occurrences:
+        assert o.day == min(dtstart.day, calendar.monthrange(o.year, o.month)[1])
+
+
+@given(dtstarts, st.sampled_from([1, 2, 3, 4, -1, -2]), st.sampled_from(WEEKDAYS))
+def test_monthly_nth_weekday(dtstart, nth, weekday):
+    rule = parse_rule(f"FREQ=MONTHLY;BYDAY={nth}{weekday}")
+    for o in take(iter_occurrences(rule, dtstart), 13)[1:]:
+        assert o.weekday() == WEEKDAYS.index(weekday)
+        last = calendar.monthrange(o.year, o.month)[1]
+        if nth > 0:
+            assert (o.day - 1) // 7 + 1 == nth
+        else:
+            assert (last - o.day) // 7 + 1 == -nth
+
+
+@given(dtstarts, st.integers(min_value=1, max_value=40), st.sampled_from(["DAILY", "WEEKLY", "MONTHLY"]))
+def test_count_includes_first_task(dtstart, count, freq):
+    assert len(list(iter_occurrences(parse_rule(f"FREQ={freq};COUNT={count}"), dtstart))) == count
+
+
+@given(dtstarts, st.integers(min_value=0, max_value=400))
+def test_until_is_inclusive_bound(dtstart, days):
+    until = dtstart + timedelta(days=days)
+    rule = parse_rule(f"FREQ=DAILY;UNTIL={until:%Y%m%dT%H%M%SZ}")
+    occurrences = list(iter_occurrences(rule, dtstart))
+    assert occurrences[-1] == until
+    assert len(occurrences) == days + 1
+
+
+@settings(max_examples=200)
+@given(
+    dtstarts,
+    st.sampled_from(["FREQ=DAILY", "FREQ=WEEKLY;BYDAY=TU,SA", "FREQ=MONTHLY", "FREQ=MONTHLY;BYMONTHDAY=31,15",
+                     "FREQ=MONTHLY;BYDAY=-1FR", "FREQ=YEARLY", "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR"]),
+    intervals,
+    st.integers(min_value=0, max_value=3 * 366),
+    st.integers(min_value=1, max_value=5),
+)
+def test_skip_ahead_matches_full_scan(dtstart, rule_text, interval, offset_days, n):
+    rule = parse_rule(f"{rule_text};INTERVAL={interval}")
+    after = dtstart + timedelta(days=offset_days, hours=offset_days % 24)
+    expected = take((o for o in iter_occurrences(rule, dtstart) if o > after), n)
+    assert next_occurrences(rule, dtstart, after, n) == expected
+
+
+# --- Materialization, sweeper and event consumer ---
+
+def make_task(**fields) -> Todo:
+    now = datetime.utcnow()
+    user_id = str(uuid.uuid4())
     with Session(engine) as session:
-        session.add(recurring_task)
+        session.add(User(id=user_id, email=f"{user_id}@test.local", createdAt=now, updatedAt=now))
+        task = Todo(user_id=user_id, title="Recurring", **fields)
+        session.add(task)
         session.commit()
-        print(f"✅ Created test task: {task_id}")
-
-    # 2. Simulate Dapr Event
-    payload = {
-        "data": {
-            "type": "task_updated",
-            "user_id": str(user_id),
-            "task_id": str(task_id),
-            "is_completed": True
-        }
-    }
-    
-    print("Simulating Dapr event...")
-    response = requests.post(f"{BASE_URL}/dapr/events/task-lifecycle", json=payload)
-    
-    if response.status_code != 200:
-        print(f"❌ API Request failed: {response.text}")
-        return
-
-    print("✅ Event sent successfully.")
-    
-    # 3. Verify new task creation
-    print("Waiting for async processing (if any)...")
-    time.sleep(2)
-    
+        session.refresh(task)
+        return task
+
+
+def series_dates(root_id) -> list:
     with Session(engine) as session:
-        # Look for tasks with same title but different ID
-        statement = select(Todo).where(Todo.title == "Test Recurring Task").where(Todo.id != task_id)
-        results = session.exec(statement).all()
-        
-        if len(results) > 0:
-            new_task = results[0]
-            print(f"✅ Recurrence Success! New task created: {new_task.id}")
-            print(f"   Due Date: {new_task.due_date}")
-            print(f"   Recurrence: {new_task.recurrence}")
-            
-            # Clean up
-            session.delete(new_task)
-            original_task = session.get(Todo, task_id)
-            if original_task:
-                 session.delete(original_task)
-            session.commit()
-            print("Cleanup complete.")
-        else:
-            print("❌ Recurrence Failed: No new task found.")
-            # Debug: check if original task was found by ID in the router logic
-            # (Requires checking logs, but here we just report failure)
+        statement = select(Todo.due_date).where(Todo.recurrence_parent_id == root_id).order_by(Todo.due_date)
+        return list(session.exec(statement).all())
 
-if __name__ == "__main__":
-    try:
-        test_recurrence()
-    except Exception as e:
-        print(f"❌ Error: {e}")
+
+def test_materialize_inserts_lookahead_once():
+    task = make_task(recurrence="monthly", due_date=datetime(2026, 1, 31, 9))
+    with Session(engine) as session:
+        assert materialize_next(session, session.get(Todo, task.id), count=3) == 3
+        session.commit()
+        assert materialize_next(session, session.get(Todo, task.id), count=3) == 0
+        session.commit()
+    assert series_dates(task.id) == [datetime(2026, 2, 28, 9), datetime(2026, 3, 31, 9), datetime(2026, 4, 30, 9)]
+
+
+def test_sweeper_restarts_stalled_series_but_respects_deletes():
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    monday = today + timedelta(days=7 - today.weekday(), hours=8)
+    thursday, next_monday = monday + timedelta(days=3), monday + timedelta(days=7)
+    root = make_task(recurrence="FREQ=WEEKLY;BYDAY=MO,TH", due_date=monday, is_completed=True)
+    sweep(engine)
+    assert series_dates(root.id) == [thursday]
+
+    # Completed without the event being handled: the sweeper picks it up
+    with Session(engine) as session:
+        instance = session.exec(select(Todo).where(Todo.recurrence_parent_id == root.id)).one()
+        instance.is_completed = True
+        session.add(instance)
+        session.commit()
+    sweep(engine)
+    assert series_dates(root.id) == [thursday, next_monday]
+
+    # Deleting the pending occurrence ends the series; the sweeper leaves it deleted
+    with Session(engine) as session:
+        session.delete(session.exec(select(Todo).where(Todo.recurrence_parent_id == root.id, Todo.due_date == next_monday)).one())
+        session.commit()
+    sweep(engine)
+    assert series_dates(root.id) == [thursday]
+
+
+def test_sweeper_starts_stalled_series_from_today():
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    root = make_task(recurrence="daily", due_date=today - timedelta(days=10, hours=-9), is_completed=True)
+    sweep(engine)
+    assert series_dates(root.id) == [today + timedelta(hours=9)]
+
+
+def make_legacy_chain(user_id: str, days: list, completed: int) -> list:
+    """Recurring tasks as the old completion handler left them: unlinked copies"""
+    with Session(engine) as session:
+        tasks = [Todo(user_id=user_id, title="Water plants", recurrence="daily", due_date=datetime(2026, 10, day, 9),
+                      is_completed=i < completed, created_at=datetime(2024, 1, 1)) for i, day in enumerate(days)]
+        session.add_all(tasks)
+        session.commit()
+        return [task.id for task in tasks]
+
+
+def user_tasks(user_id: str) -> list:
+    with Session(engine) as session:
+        return sorted(session.exec(select(Todo.due_date).where(Todo.user_id == user_id, Todo.due_date != None)).all())
+
+
+def test_legacy_chains_are_not_swept(monkeypatch):
+    import migrations
+    owner = make_task().user_id
+    make_legacy_chain(owner, [10, 11, 12], completed=2)
+    before = user_tasks(owner)
+
+    # Before the legacy series migration only linked series are swept
+    monkeypatch.setattr(migrations.migration_runner, "applied", migrations.migration_runner.applied - {LEGACY_SERIES_MIGRATION})
+    sweep(engine)
+    assert user_tasks(owner) == before
+
+    migration = next(m for m in migrations.MIGRATIONS if m.version == LEGACY_SERIES_MIGRATION)
+    migration.apply(engine, migrations.Progress(migration, threading.Event()))
+    monkeypatch.undo()
+    sweep(engine)
+    assert user_tasks(owner) == before
+
+
+def test_completing_a_continued_legacy_task_adds_nothing():
+    owner = make_task().user_id
+    first, _, last = make_legacy_chain(owner, [10, 11, 12], completed=0)
+    with Session(engine) as session:
+        assert materialize_next(session, session.get(Todo, first)) == 0
+        assert materialize_next(session, session.get(Todo, last)) == 1
+        session.commit()
+    assert user_tasks(owner)[-2:] == [datetime(2026, 10, 12, 9), datetime(2026, 10, 13, 9)]
+
+
+def test_same_title_series_are_independent():
+    # Created after the legacy series migration: two series, not one legacy chain
+    owner = make_task().user_id
+    with Session(engine) as session:
+        flat, office = [Todo(user_id=owner, title="Pay rent", recurrence="monthly", due_date=datetime(2026, 10, day, 9))
+                        for day in (1, 15)]
+        session.add_all([flat, office])
+        session.commit()
+        assert materialize_next(session, flat) == 1
+        session.commit()
+        assert not session.get(RecurrenceSeries, flat.id).finished
+    assert series_dates(flat.id) == [datetime(2026, 11, 1, 9)]
+
+
+def test_lifecycle_event_creates_next_instance_once():
+    from fastapi.testclient import TestClient
+    import main
+
+    task = make_task(recurrence="daily", due_date=datetime(2026, 5, 1, 7))
+    client = TestClient(main.app)
+    payload = {"data": {
+        "type": "task_updated", "task_id": str(task.id), "is_completed": True, "event_id": str(uuid.uuid4()),
+    }}
+    for _ in range(3):  # redelivered
+        assert client.post("/dapr/events/task-lifecycle", json=payload).status_code == 200
+    assert series_dates(task.id) == [datetime(2026, 5, 2, 7)]
+
+
+def test_lifecycle_event_is_redelivered_after_other_conflicts(monkeypatch):
+    from fastapi.testclient import TestClient
+    from event_dedupe import event_dedupe
+    from routers import events
+    import main
+
+    task = make_task(recurrence="daily", due_date=datetime(2026, 6, 1, 7))
+    event_id = str(uuid.uuid4())
+    payload = {"data": {"type": "task_updated", "task_id": str(task.id), "is_completed": True, "event_id": event_id}}
+
+    def conflicting_materialize(session, task):
+        # A unique violation that has nothing to do with processed_event
+        session.add(Todo(id=task.id, user_id=task.user_id, title="Clash"))
+        return 1
+
+    monkeypatch.setattr(events, "materialize_next", conflicting_materialize)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    assert client.post("/dapr/events/task-lifecycle", json=payload).status_code == 500
+    assert not event_dedupe.seen(event_id)
+
+    monkeypatch.setattr(events, "materialize_next", materialize_next)
+    assert client.post("/dapr/events/task-lifecycle", json=payload).status_code == 200
+    assert series_dates(task.id) == [datetime(2026, 6, 2, 7)]
@@ -0,0 +1,156 @@
+"""
+Reminder scheduler checks, driven by a fake clock against SQLite.
+
+Run with `python -m pytest scripts/test_reminder_scheduler.py`.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from database import engine
+from models import OutboxEvent, Todo, User
+from reminders import ReminderScheduler
+
+
+T0 = datetime(2026, 10, 18, 9, 0)
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+@pytest.fixture
+def user_id(user):
+    with Session(engine) as session:
+        session.execute(delete(Todo))
+        session.execute(delete(OutboxEvent))
+        session.commit()
+    return user.id
+
+
+def add_todos(user_id: str, reminder_times: list) -> list:
+    with Session(engine) as session:
+        todos = [Todo(user_id=user_id, title=f"Task {i}", reminder_time=when) for i, when in enumerate(reminder_times)]
+        session.add_all(todos)
+        session.commit()
+        for todo in todos:
+            session.refresh(todo)
+        return todos
+
+
+def sent_task_ids() -> list:
+    with Session(engine) as session:
+        rows = session.exec(select(OutboxEvent).where(OutboxEvent.topic == "reminders").order_by(OutboxEvent.id))
+        return [json.loads(row.payload)["task_id"] for row in rows]
+
+
+def test_fires_due_reminders_in_order_exactly_once(user_id):
+    clock = FakeClock(T0)
+    todos = add_todos(user_id, [T0 + timedelta(minutes=m) for m in (30, 10, 20)])
+    scheduler = ReminderScheduler(clock=clock, resync_interval=3600)
+
+    assert scheduler.tick() == 0
+    assert scheduler.seconds_until_next() == 600
+    clock.advance(minutes=20)
+    assert scheduler.tick() == 2
+    clock.advance(minutes=30)
+    assert scheduler.tick() == 1
+    assert scheduler.tick() == 0
+    assert sent_task_ids() == [str(todos[1].id), str(todos[2].id), str(todos[0].id)]
+
+    # A second scheduler (another replica, or a restart) does not send them again
+    assert ReminderScheduler(clock=clock).tick() == 0
+
+
+def test_track_reschedules_and_cancels(user_id):
+    clock = FakeClock(T0)
+    scheduler = ReminderScheduler(clock=clock)
+    scheduler.tick()
+    moved, completed, deleted = add_todos(user_id, [T0 + timedelta(minutes=5)] * 3)
+    for todo in (moved, completed, deleted):
+        scheduler.track(todo)
+    assert scheduler.stats()["loaded"] == 3
+
+    with Session(engine) as session:
+        todo = session.get(Todo, moved.id)
+        todo.reminder_time = T0 + timedelta(minutes=15)
+        session.add(todo)
+        done = session.get(Todo, completed.id)
+        done.is_completed = True
+        session.add(done)
+        session.delete(session.get(Todo, deleted.id))
+        session.commit()
+        session.refresh(todo)
+        session.refresh(done)
+        scheduler.track(todo)
+        scheduler.track(done)
+    scheduler.cancel([deleted.id])
+
+    clock.advance(minutes=10)
+    assert scheduler.tick() == 0
+    clock.advance(minutes=10)
+    assert scheduler.tick() == 1
+    assert sent_task_ids() == [str(moved.id)]
+
+
+def test_memory_is_bounded_by_max_loaded(user_id):
+    clock = FakeClock(T0)
+    todos = add_todos(user_id, [T0 + timedelta(seconds=i) for i in range(1, 36)])
+    scheduler = ReminderScheduler(clock=clock, max_loaded=10, batch_size=4)
+    scheduler.tick()
+    assert scheduler.stats()["loaded"] == 10
+
+    clock.advance(minutes=1)
+    assert scheduler.tick() == 35
+    assert sent_task_ids() == [str(todo.id) for todo in todos]
+
+
+def test_resync_picks_up_other_writers_and_skips_stale_reminders(user_id):
+    clock = FakeClock(T0)
+    add_todos(user_id, [T0 - timedelta(days=3)])  # missed long ago: not sent
+    scheduler = ReminderScheduler(clock=clock, resync_interval=60)
+    assert scheduler.tick() == 0
+
+    # Written without track(), e.g. by another replica
+    other = add_todos(user_id, [T0 + timedelta(seconds=30)])[0]
+    clock.advance(seconds=45)
+    assert scheduler.tick() == 0
+    clock.advance(seconds=15)
+    assert scheduler.tick() == 1
+    assert sent_task_ids() == [str(other.id)]
+
+
+def test_api_update_resets_sent_reminder(user_id):
+    from fastapi.testclient import TestClient
+    from auth import get_current_user
+    from reminders import reminder_scheduler
+    import main
+
+    main.app.dependency_overrides[get_current_user] = lambda: User(id=user_id, email="test", createdAt=T0, updatedAt=T0)
+    clock = FakeClock(T0)
+    reminder_scheduler.clock = clock
+    try:
+        client = TestClient(main.app)
+        todo_id = client.post("/todos", json={"title": "Call", "reminder_time": (T0 + timedelta(minutes=1)).isoformat()}).json()["id"]
+        clock.advance(minutes=1)
+        assert reminder_scheduler.tick() == 1
+
+        later = (T0 + timedelta(minutes=5)).isoformat()
+        assert client.put(f"/todos/{todo_id}", json={"reminder_time": later}).status_code == 200
+        clock.advance(minutes=4)
+        assert reminder_scheduler.tick() == 1
+        assert sent_task_ids() == [todo_id, todo_id]
+    finally:
+        reminder_scheduler.clock = datetime.utcnow
+        main.app.dependency_overrides.clear()
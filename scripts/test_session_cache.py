@@ -0,0 +1,139 @@
+"""
+Session cache checks for auth.get_current_user.
+
+Run with `python -m pytest scripts/test_session_cache.py`.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from starlette.requests import Request
+
+from database import engine
+from models import Session as DbSession, User
+from session_cache import session_cache
+import auth
+
+
+def make_session(expires_in: timedelta) -> str:
+    """Insert a user plus a Better Auth session and return the session token"""
+    now = datetime.utcnow()
+    user_id = str(uuid.uuid4())
+    token = uuid.uuid4().hex
+    with Session(engine) as session:
+        session.add(User(id=user_id, email=f"{user_id}@test.local", createdAt=now, updatedAt=now))
+        session.add(DbSession(
+            id=str(uuid.uuid4()),
+            userId=user_id,
+            token=token,
+            expiresAt=now + expires_in,
+            createdAt=now,
+            updatedAt=now,
+        ))
+        session.commit()
+    return token
+
+
+def authenticate(token: str) -> User:
+    request = Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/todos",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+    return asyncio.run(auth.get_current_user(request))
+
+
+def test_second_lookup_is_a_cache_hit():
+    session_cache.clear()
+    token = make_session(timedelta(hours=1))
+    hits = session_cache.hits
+
+    first = authenticate(token)
+    second = authenticate(token)
+
+    assert second.id == first.id
+    assert session_cache.hits == hits + 1
+
+
+def test_expired_session_is_rejected_even_when_cached(monkeypatch):
+    session_cache.clear()
+    token = make_session(timedelta(seconds=30))
+    authenticate(token)
+
+    # Jump past the session's expiresAt while the cache TTL is still running
+    real_datetime = datetime
+
+    class FutureDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return real_datetime.now(tz) + timedelta(minutes=5)
+
+    monkeypatch.setattr("session_cache.datetime", FutureDatetime)
+    monkeypatch.setattr(auth, "datetime", FutureDatetime)
+
+    with pytest.raises(HTTPException) as exc:
+        authenticate(token)
+    assert exc.value.status_code == 401
+    assert exc.value.detail == "Session expired"
+
+
+def test_invalidate_forces_database_lookup():
+    session_cache.clear()
+    token = make_session(timedelta(hours=1))
+    authenticate(token)
+
+    session_cache.invalidate(token)
+    misses = session_cache.misses
+    authenticate(token)
+
+    assert session_cache.misses == misses + 1
+
+
+def test_lookup_without_an_async_driver(monkeypatch):
+    # DATABASE_URL for a database with no async driver: async_engine is None
+    monkeypatch.setattr(auth, "async_engine", None)
+    session_cache.clear()
+    token = make_session(timedelta(hours=1))
+    assert authenticate(token).id == authenticate(token).id
+    with pytest.raises(HTTPException) as exc:
+        authenticate("unknown-token")
+    assert exc.value.detail == "Invalid session"
+
+
+def delete_session(token: str):
+    with Session(engine) as session:
+        session.delete(session.exec(select(DbSession).where(DbSession.token == token)).one())
+        session.commit()
+
+
+def test_deleted_session_is_rejected_once_the_ttl_passes(monkeypatch):
+    session_cache.clear()
+    token = make_session(timedelta(hours=1))
+    authenticate(token)
+    # Better Auth signs the user out by deleting the row; this instance isn't told
+    delete_session(token)
+    assert authenticate(token) is not None
+
+    real_monotonic = time.monotonic
+    monkeypatch.setattr("session_cache.time.monotonic", lambda: real_monotonic() + session_cache.ttl_seconds + 1)
+    with pytest.raises(HTTPException) as exc:
+        authenticate(token)
+    assert exc.value.detail == "Invalid session"
+
+
+def test_zero_ttl_disables_the_cache(monkeypatch):
+    monkeypatch.setattr(session_cache, "ttl_seconds", 0)
+    session_cache.clear()
+    token = make_session(timedelta(hours=1))
+    authenticate(token)
+    delete_session(token)
+    with pytest.raises(HTTPException) as exc:
+        authenticate(token)
+    assert exc.value.detail == "Invalid session"
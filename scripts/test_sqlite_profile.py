@@ -0,0 +1,117 @@
+"""
+SQLite profile checks: PRAGMAs per profile, and the writer queue ordering
+sync and async writers on one database file.
+
+Run with `python -m pytest scripts/test_sqlite_profile.py`.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from database import create_engines
+from sqlite_profile import SqliteWriterQueue, default_profile, optimize
+
+
+@pytest.fixture
+def engines():
+    sync_engine, async_engine = create_engines(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'queue.db')}", sqlite_profile="performance", writer_queue=True
+    )
+    with sync_engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE item (name TEXT)")
+    yield sync_engine, async_engine
+    sync_engine.dispose()
+
+
+def pragma(engine, name: str):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_profiles_set_their_pragmas():
+    path = os.path.join(tempfile.mkdtemp(), "profile.db")
+    standard, _ = create_engines(f"sqlite:///{path}", sqlite_profile="standard")
+    ephemeral, _ = create_engines(f"sqlite:///{path}", sqlite_profile="ephemeral")
+    assert pragma(standard, "journal_mode") == "wal" and pragma(standard, "synchronous") == 1
+    assert pragma(ephemeral, "cache_size") == -65536 and pragma(ephemeral, "mmap_size") == 268435456
+    assert pragma(ephemeral, "temp_store") == 2 and pragma(ephemeral, "busy_timeout") == 5000
+    assert pragma(ephemeral, "synchronous") == 0
+    optimize(ephemeral)
+
+
+def test_default_profile(monkeypatch):
+    monkeypatch.delenv("SQLITE_PROFILE", raising=False)
+    assert default_profile("sqlite:///./todo.db") == "performance"
+    monkeypatch.setenv("VERCEL", "1")
+    assert default_profile("sqlite:////tmp/todo.db") == "ephemeral"
+    monkeypatch.setenv("SQLITE_PROFILE", "fast")
+    with pytest.raises(ValueError):
+        default_profile("sqlite:///./todo.db")
+
+
+def test_writers_queue_behind_an_open_write_and_readers_do_not(engines):
+    sync_engine, async_engine = engines
+    finished = []
+
+    def write(name: str):
+        with sync_engine.begin() as connection:
+            connection.execute(text("INSERT INTO item VALUES (:name)"), {"name": name})
+        finished.append(name)
+
+    async def test():
+        holder = sync_engine.connect()
+        holder.execute(text("INSERT INTO item VALUES ('first')"))
+        second = threading.Thread(target=write, args=("second",))
+        second.start()
+        await asyncio.sleep(0.05)
+        third = asyncio.create_task(async_insert(async_engine, "third"))
+        # The loop keeps running while the async writer waits its turn
+        await asyncio.sleep(0.2)
+        assert finished == [] and not third.done()
+        # Readers are not queued
+        with sync_engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM item")).scalar() == 0
+
+        holder.commit()
+        holder.close()
+        await third
+        await asyncio.to_thread(second.join)
+        await async_engine.dispose()
+
+    asyncio.run(test())
+    # Writers got the lock in arrival order
+    with sync_engine.connect() as connection:
+        names = connection.execute(text("SELECT name FROM item ORDER BY rowid")).scalars().all()
+    assert names == ["first", "second", "third"]
+
+
+async def async_insert(async_engine, name: str):
+    async with async_engine.begin() as connection:
+        await connection.execute(text("INSERT INTO item VALUES (:name)"), {"name": name})
+
+
+def test_cancelled_and_timed_out_waiters_leave_the_queue():
+    queue = SqliteWriterQueue(timeout=0.05)
+    assert queue.acquire()
+    assert not queue.acquire()
+
+    async def test():
+        waiter = asyncio.create_task(queue.acquire_async())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert queue.stats()["queued"] == 0
+        queue.release()
+        assert await queue.acquire_async()
+
+    asyncio.run(test())
+    queue.release()
+    start = time.monotonic()
+    assert queue.acquire() and time.monotonic() - start < 0.05
+    assert queue.stats()["timeouts"] == 1
@@ -0,0 +1,118 @@
+"""
+Bulk todo operations (POST /todos/batch): mixed creates, updates and deletes
+apply in one transaction with one statement per kind, and invalid operations
+are reported per item without affecting the rest.
+
+Run with `python -m pytest scripts/test_todo_batch.py`.
+"""
+
+import json
+import uuid
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from database import engine, async_engine
+from models import OutboxEvent, Todo, TodoTombstone, UserDataVersion
+from routers import todos
+
+
+@pytest.fixture
+def statements():
+    seen = []
+    listener = lambda conn, cursor, statement, *args: seen.append(" ".join(statement.split()))
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", listener)
+    yield seen
+    for target in (engine, async_engine.sync_engine):
+        event.remove(target, "before_cursor_execute", listener)
+
+
+def todos_of(user_id: str) -> dict:
+    with Session(engine) as session:
+        return {todo.title: todo for todo in session.exec(select(Todo).where(Todo.user_id == user_id))}
+
+
+def batch(client, operations: list) -> list:
+    response = client.post("/todos/batch", json={"operations": operations})
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+def test_mixed_operations_apply_together(client, user, statements):
+    first, second, third = (client.post("/todos", json={"title": t}).json()["id"] for t in ("first", "second", "third"))
+    with Session(engine) as session:
+        last_event = max(e.id for e in session.exec(select(OutboxEvent)))
+    statements.clear()
+
+    results = batch(client, [
+        {"op": "create", "data": {"title": "new", "priority": "high"}},
+        {"op": "update", "id": first, "data": {"is_completed": True, "title": "first done"}},
+        {"op": "delete", "id": second},
+        {"op": "create", "data": {"title": "newer"}},
+        {"op": "update", "id": third, "data": {}},
+    ])
+
+    assert [(r["op"], r["status"]) for r in results] == [
+        ("create", "ok"), ("update", "ok"), ("delete", "ok"), ("create", "ok"), ("update", "ok"),
+    ]
+    assert results[0]["todo"]["title"] == "new" and results[0]["id"] == results[0]["todo"]["id"]
+    assert results[1]["todo"]["is_completed"] is True
+
+    rows = todos_of(user.id)
+    assert sorted(rows) == ["first done", "new", "newer", "third"]
+    assert rows["first done"].is_completed and rows["new"].priority_rank == 2
+    assert str(rows["new"].id) == results[0]["id"]
+
+    # One statement per kind of write, whatever the number of operations
+    assert len([s for s in statements if s.startswith("INSERT INTO todo ")]) == 1
+    assert len([s for s in statements if s.startswith("UPDATE todo SET")]) == 1
+    assert len([s for s in statements if s.startswith("DELETE FROM todo ")]) == 1
+    with Session(engine) as session:
+        assert session.get(TodoTombstone, uuid.UUID(second)) is not None
+        events = session.exec(select(OutboxEvent).where(OutboxEvent.id > last_event).order_by(OutboxEvent.id)).all()
+    assert [json.loads(e.payload)["type"] for e in events] == [
+        "task_created", "task_created", "task_updated", "task_updated", "task_deleted",
+    ]
+
+def test_invalid_operations_are_reported_per_item(client, user, make_user):
+    mine = client.post("/todos", json={"title": "mine"}).json()["id"]
+    other = make_user()
+    with Session(engine) as session:
+        theirs = Todo(user_id=other.id, title="theirs")
+        session.add(theirs)
+        session.commit()
+        theirs_id = str(theirs.id)
+
+    results = batch(client, [
+        {"op": "create", "data": {"description": "no title"}},
+        {"op": "update", "data": {"title": "no id"}},
+        {"op": "archive", "id": mine},
+        {"op": "update", "id": str(uuid.uuid4()), "data": {"title": "missing"}},
+        {"op": "delete", "id": theirs_id},
+        {"op": "update", "id": mine, "data": {"title": "renamed"}},
+        {"op": "delete", "id": mine},
+        {"op": "create", "data": {"title": "valid"}},
+    ])
+
+    assert [r["status"] for r in results] == ["error"] * 5 + ["ok", "error", "ok"]
+    assert [r["detail"] for r in results[1:5]] == ["id is required", "Unknown op: archive", "Todo not found", "Todo not found"]
+    assert results[6]["detail"] == "Duplicate id in batch"
+    assert sorted(todos_of(user.id)) == ["renamed", "valid"]
+    assert sorted(todos_of(other.id)) == ["theirs"]
+
+
+def test_no_op_updates_keep_the_data_version(client, user):
+    mine = client.post("/todos", json={"title": "mine"}).json()["id"]
+    with Session(engine) as session:
+        version = session.get(UserDataVersion, user.id).todos_version
+    assert [r["status"] for r in batch(client, [{"op": "update", "id": mine, "data": {}}])] == ["ok"]
+    with Session(engine) as session:
+        assert session.get(UserDataVersion, user.id).todos_version == version
+
+
+def test_batch_size_limit(client, monkeypatch):
+    monkeypatch.setattr(todos, "MAX_BATCH_OPERATIONS", 2)
+    operations = [{"op": "create", "data": {"title": f"t{i}"}} for i in range(3)]
+    assert client.post("/todos/batch", json={"operations": operations}).status_code == 413
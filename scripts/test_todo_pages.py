@@ -0,0 +1,113 @@
+"""
+Keyset pagination checks for GET /todos/page: every sort walks the list with
+no gaps or repeats across tied sort values, and malformed cursors are a 400.
+
+Run with `python -m pytest scripts/test_todo_pages.py`.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session
+
+from database import engine
+from models import Todo, priority_rank
+from pagination import encode_cursor
+
+
+@pytest.fixture
+def client(client, user):
+    with Session(engine) as session:
+        # Few distinct values per column, so most page boundaries fall inside a tie
+        created_at = datetime(2024, 1, 1)
+        for i in range(23):
+            session.add(Todo(
+                user_id=user.id,
+                title=f"Task {i}",
+                created_at=created_at + timedelta(hours=i % 3),
+                due_date=None if i % 4 == 0 else created_at + timedelta(days=i % 2),
+                priority=["low", "medium", "high"][i % 3 if i % 5 else 2],
+            ))
+        session.commit()
+    return client
+
+
+def walk(client, sort_by: str, limit: int) -> list:
+    items, cursor = [], None
+    while True:
+        params = {"sort_by": sort_by, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/todos/page", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items
+
+
+def expected_order(items: list, sort_by: str) -> list:
+    def key(item):
+        created_at = datetime.fromisoformat(item["created_at"])
+        todo_id = uuid.UUID(item["id"])
+        if sort_by == "due_date":
+            due = item["due_date"]
+            return (due is None, datetime.fromisoformat(due) if due else datetime.min, todo_id)
+        if sort_by == "priority":
+            return (-priority_rank(item["priority"]), -created_at.timestamp(), -todo_id.int)
+        return (-created_at.timestamp(), -todo_id.int)
+    return [item["id"] for item in sorted(items, key=key)]
+
+
+@pytest.mark.parametrize("sort_by", ["created_at", "due_date", "priority"])
+@pytest.mark.parametrize("limit", [1, 4, 7])
+def test_pages_cover_ties_without_gaps_or_repeats(client, sort_by, limit):
+    items = walk(client, sort_by, limit)
+    assert len(items) == 23
+    assert [item["id"] for item in items] == expected_order(items, sort_by)
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+MALFORMED = {
+    "not base64": "!!!",
+    "not json": base64.urlsafe_b64encode(b"not json").decode(),
+    "not an object": raw_cursor([1, 2]),
+    "no values": raw_cursor({"s": "created_at"}),
+    "values not a list": raw_cursor({"s": "created_at", "v": "x"}),
+    "another sort": encode_cursor("due_date", [datetime(2024, 1, 1), uuid.uuid4()]),
+    "too short": encode_cursor("created_at", [datetime(2024, 1, 1)]),
+    "too long": encode_cursor("created_at", [datetime(2024, 1, 1), uuid.uuid4(), 3]),
+    "string for a datetime": encode_cursor("created_at", ["2024-01-01", uuid.uuid4()]),
+    "int for a uuid": encode_cursor("created_at", [datetime(2024, 1, 1), 7]),
+    "bad uuid": raw_cursor({"s": "created_at", "v": [{"dt": "2024-01-01T00:00:00"}, {"uuid": "nope"}]}),
+    "bad datetime": raw_cursor({"s": "created_at", "v": [{"dt": "yesterday"}, {"uuid": str(uuid.uuid4())}]}),
+    "unknown tagged value": raw_cursor({"s": "created_at", "v": [{"x": 1}, {"uuid": str(uuid.uuid4())}]}),
+    "null for a required key": encode_cursor("created_at", [None, uuid.uuid4()]),
+}
+
+
+@pytest.mark.parametrize("name", MALFORMED)
+def test_malformed_cursor_is_a_bad_request(client, name):
+    response = client.get("/todos/page", params={"cursor": MALFORMED[name]})
+    assert response.status_code == 400, response.text
+
+
+@pytest.mark.parametrize("values", [
+    ["high", datetime(2024, 1, 1), uuid.uuid4()],  # priority_rank is an int
+    [True, datetime(2024, 1, 1), uuid.uuid4()],  # and a bool isn't one
+])
+def test_wrongly_typed_priority_cursor_is_a_bad_request(client, values):
+    response = client.get("/todos/page", params={"sort_by": "priority", "cursor": encode_cursor("priority", values)})
+    assert response.status_code == 400, response.text
+
+
+def test_null_due_date_cursor_is_valid(client):
+    cursor = encode_cursor("due_date", [None, uuid.UUID(int=0)])
+    response = client.get("/todos/page", params={"sort_by": "due_date", "cursor": cursor})
+    assert response.status_code == 200, response.text
+    assert all(item["due_date"] is None for item in response.json()["items"])
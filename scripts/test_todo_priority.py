@@ -0,0 +1,52 @@
+"""
+Priority sort checks: todo.priority_rank follows every write path, and
+GET /todos?sort_by=priority orders by it through ix_todo_user_priority_rank.
+
+Run with `python -m pytest scripts/test_todo_priority.py`.
+"""
+
+
+from sqlmodel import Session, select
+
+from database import engine
+from models import Todo
+from routers.todos import _todo_query
+from pagination import apply_sort
+
+
+def ranks(user_id: str) -> dict:
+    with Session(engine) as session:
+        return {todo.title: todo.priority_rank for todo in session.exec(select(Todo).where(Todo.user_id == user_id))}
+
+
+def sorted_titles(client) -> list:
+    response = client.get("/todos", params={"sort_by": "priority"})
+    assert response.status_code == 200, response.text
+    return [todo["title"] for todo in response.json()]
+
+
+def test_rank_follows_every_write_path(client, user):
+    ids = {title: client.post("/todos", json={"title": title, "priority": priority}).json()["id"]
+           for title, priority in [("a", "low"), ("b", "HIGH"), ("c", "medium"), ("d", "someday")]}
+    # Case-insensitive; unknown priorities rank as medium
+    assert ranks(user.id) == {"a": 0, "b": 2, "c": 1, "d": 1}
+
+    client.put(f"/todos/{ids['a']}", json={"priority": "high"})
+    client.post("/todos/batch", json={"operations": [
+        {"op": "update", "id": ids["b"], "data": {"priority": "low"}},
+        {"op": "create", "data": {"title": "e", "priority": "high"}},
+    ]})
+    assert ranks(user.id) == {"a": 2, "b": 0, "c": 1, "d": 1, "e": 2}
+
+
+def test_priority_sort_order(client, user):
+    for title, priority in [("low", "low"), ("high 1", "high"), ("medium", "medium"), ("high 2", "high")]:
+        client.post("/todos", json={"title": title, "priority": priority})
+    # Ties on rank go newest first
+    assert sorted_titles(client) == ["high 2", "high 1", "medium", "low"]
+
+    statement, keys, _ = _todo_query(user.id, None, None, None, "priority")
+    sql = str(apply_sort(statement, keys).compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "ix_todo_user_priority_rank" in plan and "TEMP B-TREE" not in plan
@@ -0,0 +1,117 @@
+"""
+SQLite FTS5 search checks for GET /todos?search=: the index follows inserts,
+updates and deletes, and survives VACUUM renumbering todo's rowids.
+
+Run with `python -m pytest scripts/test_todo_search.py`.
+"""
+
+
+import pytest
+from sqlmodel import select
+
+from database import engine
+from models import Todo
+import search
+
+
+@pytest.fixture
+def client(client):
+    assert search.search_backend.name == "sqlite-fts5"
+    return client
+
+
+def titles(client, query: str, sort_by: str = "created_at") -> list:
+    response = client.get("/todos", params={"search": query, "sort_by": sort_by})
+    assert response.status_code == 200, response.text
+    return sorted(todo["title"] for todo in response.json())
+
+
+def create(client, title: str, description: str = None) -> str:
+    return client.post("/todos", json={"title": title, "description": description}).json()["id"]
+
+
+@pytest.mark.parametrize("sort_by", ["created_at", "relevance"])
+def test_index_follows_writes(client, sort_by):
+    milk = create(client, "Buy milk", "semi-skimmed")
+    create(client, "Buy bread")
+    assert titles(client, "buy", sort_by) == ["Buy bread", "Buy milk"]
+    assert titles(client, "skim", sort_by) == ["Buy milk"]
+
+    client.put(f"/todos/{milk}", json={"title": "Buy oat drink", "description": None})
+    assert titles(client, "milk", sort_by) == []
+    assert titles(client, "oat", sort_by) == ["Buy oat drink"]
+
+    client.delete(f"/todos/{milk}")
+    assert titles(client, "buy", sort_by) == ["Buy bread"]
+
+
+def test_batch_writes_are_indexed(client):
+    results = client.post("/todos/batch", json={"operations": [
+        {"op": "create", "data": {"title": "Water plants"}},
+        {"op": "create", "data": {"title": "Water garden"}},
+    ]}).json()["results"]
+    assert titles(client, "water") == ["Water garden", "Water plants"]
+    client.post("/todos/batch", json={"operations": [{"op": "delete", "id": results[0]["id"]}]})
+    assert titles(client, "water") == ["Water garden"]
+
+
+def test_results_survive_vacuum(client):
+    # Deleting the oldest rows leaves gaps that VACUUM closes by renumbering rowids
+    doomed = [create(client, f"Scratch {i}") for i in range(5)]
+    kept = create(client, "Call the dentist")
+    create(client, "Email the plumber")
+    for todo_id in doomed:
+        client.delete(f"/todos/{todo_id}")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+    # VACUUM only renumbers when it can't copy pages verbatim; force what it may do
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE todo SET rowid = rowid + 1000")
+        conn.exec_driver_sql("UPDATE todo SET rowid = rowid - 1005")
+
+    assert titles(client, "dentist") == ["Call the dentist"]
+    assert titles(client, "plumber") == ["Email the plumber"]
+    assert titles(client, "scratch") == []
+    client.put(f"/todos/{kept}", json={"title": "Call the vet"})
+    assert titles(client, "dentist") == [] and titles(client, "vet") == ["Call the vet"]
+    client.delete(f"/todos/{kept}")
+    assert titles(client, "vet") == [] and titles(client, "plumber") == ["Email the plumber"]
+
+
+def test_rebuild_keeps_results(client):
+    create(client, "Renew passport")
+    search.search_backend.rebuild(engine)
+    assert titles(client, "passport") == ["Renew passport"]
+
+
+def test_install_replaces_the_rowid_keyed_index(client):
+    create(client, "Pay rent")
+    with engine.begin() as conn:
+        for trigger in ("todo_fts_ai", "todo_fts_ad", "todo_fts_au"):
+            conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+        conn.exec_driver_sql("DROP TABLE todo_fts")
+        conn.exec_driver_sql("DROP TABLE todo_fts_key")
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE todo_fts USING fts5(user_id, title, description, content='todo', content_rowid='rowid')"
+        )
+    search.install_search_backend(engine)
+    assert titles(client, "rent") == ["Pay rent"]
+    create(client, "Pay tax")
+    assert titles(client, "pay") == ["Pay rent", "Pay tax"]
+
+
+def test_postgres_backend_waits_for_its_index(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_READY_CHECK_SECONDS", 0)
+    backend = search.PostgresFTSBackend()
+    backend.install(engine)
+    # A fresh SQLite database stamps migration 18 too; pretend it hasn't run
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DELETE FROM schema_migration WHERE version = {backend.INDEX_MIGRATION}")
+    backend.ready = False
+    statement, rank = backend.apply(select(Todo), "milk", "u", ranked=True)
+    assert rank is None and "LIKE" in str(statement)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"INSERT INTO schema_migration (version, name, applied_at) VALUES ({backend.INDEX_MIGRATION}, 'index', '2026-01-01')")
+    statement, rank = backend.apply(select(Todo), "milk", "u", ranked=True)
+    assert rank is not None and "search_vector" in str(statement) and backend.ready
@@ -0,0 +1,136 @@
+"""
+Delta sync checks for GET /todos/changes against SQLite.
+
+Run with `python -m pytest scripts/test_todo_sync.py`.
+"""
+
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session
+
+from database import engine, create_engines
+from mcp_server import mcp_tools
+from migrations import MigrationRunner
+from pagination import encode_cursor
+import sync
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    # No settle lag unless a test asks for it, so tokens sit exactly after the last change
+    monkeypatch.setattr(sync, "SYNC_SETTLE_SECONDS", 0)
+    return client
+
+
+def poll(client, since=None, limit=500) -> dict:
+    params = {"limit": limit}
+    if since:
+        params["since"] = since
+    response = client.get("/todos/changes", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_initial_snapshot_pages_then_goes_quiet(client):
+    ids = {client.post("/todos", json={"title": f"Task {i}"}).json()["id"] for i in range(7)}
+
+    seen, token = set(), None
+    while True:
+        page = poll(client, token, limit=3)
+        seen |= {item["id"] for item in page["items"]}
+        token = page["next_token"]
+        if not page["has_more"]:
+            break
+    assert seen == ids
+
+    quiet = poll(client, token)
+    assert quiet["items"] == [] and quiet["deleted"] == []
+    assert sync.decode_token(quiet["next_token"]) >= sync.decode_token(token)
+
+
+def test_updates_and_deletes_from_every_path(client, user):
+    first, second, third, fourth = (client.post("/todos", json={"title": t}).json()["id"] for t in "abcd")
+    token = poll(client)["next_token"]
+
+    client.put(f"/todos/{first}", json={"is_completed": True})
+    client.delete(f"/todos/{second}")
+    client.post("/todos/batch", json={"operations": [
+        {"op": "update", "id": third, "data": {"title": "c2"}},
+        {"op": "delete", "id": fourth},
+    ]})
+    created = client.post("/todos", json={"title": "e"}).json()["id"]
+    assert mcp_tools.delete_task(user.id, created)["status"] == "deleted"
+
+    changes = poll(client, token)
+    assert {item["id"]: item["title"] for item in changes["items"]} == {first: "a", third: "c2"}
+    assert set(changes["deleted"]) == {second, fourth, created}
+    assert poll(client, changes["next_token"])["items"] == []
+
+
+def test_settle_lag_resends_recent_changes(client, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_SETTLE_SECONDS", 60)
+    todo_id = client.post("/todos", json={"title": "fresh"}).json()["id"]
+    token = poll(client)["next_token"]
+    # Still inside the settle window: sent again, and the token does not move past it
+    again = poll(client, token)
+    assert [item["id"] for item in again["items"]] == [todo_id]
+    assert sync.decode_token(token) <= sync.decode_token(again["next_token"]) < (datetime.utcnow(), uuid.UUID(int=0))
+
+
+def test_bad_and_expired_tokens(client):
+    assert client.get("/todos/changes", params={"since": "garbage"}).status_code == 400
+    old = encode_cursor(sync.TOKEN_KIND, [datetime.utcnow() - timedelta(days=365), uuid.uuid4()])
+    assert client.get("/todos/changes", params={"since": old}).status_code == 410
+
+
+def test_rows_awaiting_the_updated_at_backfill(monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_SETTLE_SECONDS", 0)
+    legacy, _ = create_engines(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'legacy.db')}")
+    with legacy.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE todo (id CHAR(32) PRIMARY KEY, user_id VARCHAR, description VARCHAR, "
+            "is_completed BOOLEAN, created_at DATETIME)"
+        )
+        ids = [uuid.uuid4() for _ in range(5)]
+        conn.execute(text("INSERT INTO todo VALUES (:id, 'u', 'Task', 0, :created_at)"),
+                     [{"id": todo_id.hex, "created_at": datetime(2024, 1, 1)} for todo_id in ids])
+    # Schema phase only: updated_at exists but migration 9 hasn't filled it yet
+    MigrationRunner().migrate_schema(legacy)
+    with legacy.begin() as conn:
+        conn.execute(text("UPDATE todo SET updated_at = :at WHERE id = :id"),
+                     {"at": datetime.utcnow() - timedelta(days=1), "id": ids[2].hex})
+
+    # Page boundaries fall on NULL rows; every token decodes and moves forward
+    seen, token = [], None
+    with Session(legacy) as session:
+        while True:
+            page = sync.changes_since(session, "u", token, limit=1)
+            seen += [item.id for item in page.items]
+            assert token is None or sync.decode_token(page.next_token) >= sync.decode_token(token)
+            token = page.next_token
+            if not page.has_more:
+                break
+        assert sorted(seen) == sorted(ids) and len(seen) == 5
+        assert sync.changes_since(session, "u", token, limit=10).items == []
+
+    # Backfilled rows come back with their new timestamp
+    with legacy.begin() as conn:
+        conn.execute(text("UPDATE todo SET updated_at = :at WHERE updated_at IS NULL"), {"at": datetime.utcnow() - timedelta(hours=1)})
+    with Session(legacy) as session:
+        assert len(sync.changes_since(session, "u", token, limit=10).items) == 4
+    legacy.dispose()
+
+
+def test_poll_uses_the_updated_at_index():
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM todo WHERE user_id = 'u' "
+            "AND (updated_at > '2026-01-01' OR (updated_at = '2026-01-01' AND id > 'x')) "
+            "ORDER BY updated_at, id LIMIT 501"
+        )).all()
+    assert any("ix_todo_user_updated_id" in row[-1] for row in plan), plan